@@ -45,6 +45,51 @@ USAGE:
   python app.py --gui     Launch GUI mode explicitly
   python app.py --cli     Launch CLI mode (command line)
   python app.py --help    Show this help message
+  python app.py --daemon  Run the background service that keeps models loaded
+  python app.py --stop-daemon
+                          Stop the background service
+
+CLI OPTIONS:
+  --decoding PROFILE      Decoding profile: fast, balanced (default), accurate
+  --language CODE         Pin the spoken language (e.g. en) to skip detection
+  --model NAME            Use this model instead of asking (tiny, base, small)
+  --dir FOLDER            Transcribe this folder instead of the app folder
+  --distributed           Share the folder with workers on other machines;
+                          each file is claimed via lease files in FOLDER/.claims
+  --worker-id NAME        Worker name recorded in lease files
+  --lease-seconds N       Take over files whose worker stopped heartbeating
+  --split-long-files      Cut long recordings at pauses and transcribe the
+                          parts in parallel on all CPU cores
+  --chunk-workers N       Number of worker processes for --split-long-files
+  --chunk-minutes N       Target part length for --split-long-files (default 10)
+  --jobs N                Transcribe N files at once, admitted within the
+                          memory budget so the machine never swaps
+  --memory-budget-mb MB   RAM budget for --jobs (default: 70% of RAM)
+  --tail FILE             Transcribe a recording while it is still being
+                          written; re-run to resume where it left off
+  --tail-idle-seconds N   Treat --tail FILE as finished after N idle seconds
+  --engine NAME           eager (default), torchscript or compile; compiled
+                          parts are cached and must match eager output exactly
+  --backend NAME          Inference backend: whisper (default), stub (fake
+                          transcripts without model weights, for testing) or
+                          one installed by another package
+  --no-repetition-guard   Don't cut repetition loops (music, noise) short
+  --pack-short-clips      Transcribe voice notes of up to 10 s several to a
+                          30 s window; each still gets its own transcript
+  --multichannel          Transcribe each channel of a recording separately
+                          and in parallel (one speaker per channel), skipping
+                          silent channels; lines are labelled by channel
+  --profile               Profile each file (one at a time): cProfile dump,
+                          torch operator trace and a per-stage hot-spot
+                          summary in the 'profiles' folder
+  --start-daemon          Keep models loaded in a background service so later
+                          launches start transcribing at once; a running
+                          service is always used unless --no-daemon is given
+  --no-daemon             Transcribe in this process, ignoring the service
+  --daemon-idle-minutes N Stop the service after N minutes without jobs
+                          (default 15; 0 keeps it running until --stop-daemon)
+  --events-log FILE       Append every progress event to FILE as JSON lines
+  --metrics-file FILE     Keep run counters in FILE (Prometheus text format)
 
 GUI MODE (Default):
   - Friendly interface perfect for non-technical users
@@ -83,6 +128,9 @@ def main():
     parser.add_argument('--gui', action='store_true', help='Launch GUI mode (default)')
     parser.add_argument('--cli', action='store_true', help='Launch CLI mode')
     parser.add_argument('--help', action='store_true', help='Show help information')
+    parser.add_argument('--daemon', action='store_true', help='Run the background service in the foreground')
+    parser.add_argument('--stop-daemon', action='store_true', help='Stop the background service')
+    parser.add_argument('--daemon-idle-minutes', type=float, default=None)
     
     args, unknown = parser.parse_known_args()
     
@@ -91,6 +139,16 @@ def main():
         show_help()
         return
     
+    # The background service doesn't need (or start) a user interface
+    if args.daemon:
+        from transcription_daemon import run_daemon, DEFAULT_IDLE_MINUTES
+        run_daemon(DEFAULT_IDLE_MINUTES if args.daemon_idle_minutes is None else args.daemon_idle_minutes)
+        return
+    if args.stop_daemon:
+        from transcription_daemon import stop_daemon
+        print("Background service stopped." if stop_daemon() else "No background service is running.")
+        return
+    
     # Determine mode
     if args.cli:
         launch_mode = 'cli'
@@ -0,0 +1,322 @@
+"""
+Audio decoding for transcription.
+
+Uncompressed WAV (and FLAC, when the optional soundfile package is
+installed) is decoded in-process: samples are read as NumPy views over the
+memory-mapped file, then downmixed and resampled to 16 kHz with vectorized
+operations. Everything else is decoded by an ffmpeg child process that is
+killed straight away if the transcription is cancelled.
+"""
+
+import os
+import re
+import struct
+import subprocess
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from audio_transcriber import get_ffmpeg_path, TranscriptionCancelled
+
+try:
+    import soundfile
+    SOUNDFILE_AVAILABLE = True
+except (ImportError, OSError):  # OSError: libsndfile itself is missing
+    SOUNDFILE_AVAILABLE = False
+
+try:
+    from scipy.signal import resample_poly
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+
+
+SAMPLE_RATE = 16000
+
+# WAVE format tags
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# Bytes read from ffmpeg between cancellation checks (~2 s of 16 kHz audio)
+READ_CHUNK_BYTES = 64 * 1024
+
+# Taps per side of the windowed-sinc low-pass used when scipy isn't available
+RESAMPLE_HALF_TAPS = 32
+
+# A channel is silent if no half second of it is louder than this
+SILENT_CHANNEL_DBFS = -45.0
+SILENCE_FRAME_SECONDS = 0.5
+
+# Channel counts of the layouts ffmpeg names rather than numbers
+_LAYOUT_CHANNELS = {
+    'mono': 1, 'stereo': 2, '2.1': 3, '3.0': 3, 'quad': 4, '4.0': 4,
+    '5.0': 5, '5.1': 6, '6.0': 6, '6.1': 7, '7.0': 7, '7.1': 8,
+}
+_AUDIO_STREAM_RE = re.compile(r"Stream #\S+.*?Audio: [^,]+, \d+ Hz, ([^,]+)")
+
+
+class UnsupportedAudioFormat(Exception):
+    """The file can't be decoded in-process and has to go through ffmpeg."""
+
+
+def _read_wav_header(f) -> Tuple[int, int, int, int, int, int]:
+    """Parse a RIFF/WAVE header into (format, channels, rate, bits, data_offset, data_size)."""
+    riff, _, wave_id = struct.unpack("<4sI4s", f.read(12))
+    if riff != b"RIFF" or wave_id != b"WAVE":
+        raise UnsupportedAudioFormat("not a RIFF/WAVE file")
+
+    fmt = None
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            raise UnsupportedAudioFormat("no data chunk")
+        chunk_id, chunk_size = struct.unpack("<4sI", header)
+        if chunk_id == b"fmt ":
+            body = f.read(chunk_size)
+            format_tag, channels, rate, _, _, bits = struct.unpack("<HHIIHH", body[:16])
+            if format_tag == WAVE_FORMAT_EXTENSIBLE and len(body) >= 26:
+                # The real format is the first two bytes of the SubFormat GUID
+                format_tag = struct.unpack("<H", body[24:26])[0]
+            fmt = (format_tag, channels, rate, bits)
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise UnsupportedAudioFormat("data chunk before fmt chunk")
+            return fmt + (f.tell(), chunk_size)
+        else:
+            f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+
+
+def read_wav(file_path: str) -> Tuple[np.ndarray, int]:
+    """
+    Read a WAV file as a (frames, channels) array without copying the samples.
+    The array is a view over the memory-mapped file in its stored sample type.
+    """
+    with open(file_path, "rb") as f:
+        format_tag, channels, rate, bits, data_offset, data_size = _read_wav_header(f)
+
+    dtypes = {
+        (WAVE_FORMAT_PCM, 8): np.uint8,
+        (WAVE_FORMAT_PCM, 16): np.dtype("<i2"),
+        (WAVE_FORMAT_PCM, 32): np.dtype("<i4"),
+        (WAVE_FORMAT_IEEE_FLOAT, 32): np.dtype("<f4"),
+        (WAVE_FORMAT_IEEE_FLOAT, 64): np.dtype("<f8"),
+    }
+    dtype = dtypes.get((format_tag, bits))
+    if dtype is None or channels < 1:
+        # e.g. 24-bit PCM or compressed WAV payloads
+        raise UnsupportedAudioFormat(f"WAV format {format_tag:#x} with {bits}-bit samples")
+
+    # Streaming writers leave the size at 0 or 0xFFFFFFFF; use what is on disk
+    available = os.path.getsize(file_path) - data_offset
+    if data_size == 0 or data_size > available:
+        data_size = available
+    frame_bytes = np.dtype(dtype).itemsize * channels
+    frames = data_size // frame_bytes
+    if frames == 0:
+        return np.zeros((0, channels), np.float32), rate
+
+    samples = np.memmap(file_path, dtype=dtype, mode="r", offset=data_offset, shape=(frames, channels))
+    return samples, rate
+
+
+def read_native(file_path: str) -> Tuple[np.ndarray, int]:
+    """Read a WAV or FLAC file in-process as a (frames, channels) array and its sample rate."""
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension == ".wav":
+        return read_wav(file_path)
+    if extension == ".flac" and SOUNDFILE_AVAILABLE:
+        samples, rate = soundfile.read(file_path, dtype="float32", always_2d=True)
+        return samples, rate
+    raise UnsupportedAudioFormat(f"no in-process decoder for {extension}")
+
+
+def to_float32(samples: np.ndarray) -> np.ndarray:
+    """Scale samples to a new, writable float32 array in [-1, 1)."""
+    if samples.dtype == np.uint8:
+        return (samples.astype(np.float32) - 128.0) / 128.0
+    if samples.dtype.kind == "i":
+        return samples.astype(np.float32) / float(np.iinfo(samples.dtype).max + 1)
+    # Always copy, so callers never hold on to the read-only file mapping
+    return np.array(samples, dtype=np.float32)
+
+
+def downmix(samples: np.ndarray) -> np.ndarray:
+    """Average a (frames, channels) array down to mono float32."""
+    channels = samples.shape[1]
+    if channels == 1:
+        return to_float32(samples[:, 0])
+    # Accumulate one channel column at a time so only the mono result is allocated;
+    # a reduction along the short channel axis is several times slower
+    mono = samples[:, 0].astype(np.float32)
+    for channel in range(1, channels):
+        mono += samples[:, channel]
+    if samples.dtype == np.uint8:
+        return (mono / channels - 128.0) / 128.0
+    scale = float(np.iinfo(samples.dtype).max + 1) if samples.dtype.kind == "i" else 1.0
+    mono *= 1.0 / (scale * channels)
+    return mono
+
+
+def resample(audio: np.ndarray, orig_sr: int, target_sr: int = SAMPLE_RATE) -> np.ndarray:
+    """Resample mono float32 audio with an anti-aliasing low-pass filter."""
+    if orig_sr == target_sr or len(audio) == 0:
+        return audio
+    if SCIPY_AVAILABLE:
+        from math import gcd
+        g = gcd(orig_sr, target_sr)
+        return resample_poly(audio, target_sr // g, orig_sr // g).astype(np.float32, copy=False)
+
+    if target_sr < orig_sr:
+        # Windowed-sinc low-pass at the new Nyquist frequency before decimating
+        cutoff = target_sr / orig_sr
+        n = np.arange(-RESAMPLE_HALF_TAPS, RESAMPLE_HALF_TAPS + 1)
+        taps = (cutoff * np.sinc(cutoff * n) * np.hanning(len(n))).astype(np.float32)
+        taps /= taps.sum()
+        audio = np.convolve(audio, taps, mode="same")
+
+    if orig_sr % target_sr == 0:
+        # Integer ratio (e.g. 48 kHz -> 16 kHz): the filtered signal can simply be decimated
+        return np.ascontiguousarray(audio[::orig_sr // target_sr])
+
+    # Positions of the output samples measured in input samples
+    positions = np.arange(int(len(audio) * target_sr / orig_sr)) * (orig_sr / target_sr)
+    return np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+
+
+def load_audio_native(file_path: str, sr: int = SAMPLE_RATE) -> np.ndarray:
+    """Decode a WAV/FLAC file in-process to mono float32 at the given rate."""
+    samples, rate = read_native(file_path)
+    return resample(downmix(samples), rate, sr)
+
+
+def _run_ffmpeg(cmd: List[str], cancel_event: Optional[threading.Event] = None,
+                check: bool = True) -> bytes:
+    """
+    Run an ffmpeg command that writes raw samples to stdout and return them.
+    ffmpeg is killed as soon as cancel_event is set. With check, a failed
+    decode raises RuntimeError; otherwise whatever was decoded is returned.
+    """
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    # Drain stderr on the side so a chatty ffmpeg can't block on a full pipe
+    errors = []
+    stderr_thread = threading.Thread(target=lambda: errors.append(proc.stderr.read()), daemon=True)
+    stderr_thread.start()
+
+    if cancel_event is not None:
+        # A read blocks while ffmpeg is quiet (seeking, a slow network share); kill it from the side
+        def kill_on_cancel():
+            while proc.poll() is None:
+                if cancel_event.wait(0.1):
+                    proc.kill()
+                    return
+        threading.Thread(target=kill_on_cancel, daemon=True).start()
+
+    chunks = []
+    try:
+        while True:
+            chunk = proc.stdout.read(READ_CHUNK_BYTES)
+            if cancel_event is not None and cancel_event.is_set():
+                raise TranscriptionCancelled("Cancelled while decoding audio")
+            if not chunk:
+                break
+            chunks.append(chunk)
+        proc.wait()
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+        stderr_thread.join()
+        proc.stderr.close()
+
+    if check and proc.returncode != 0:
+        message = errors[0].decode(errors='replace').strip() if errors else ""
+        raise RuntimeError(f"Failed to load audio: {message}")
+    return b"".join(chunks)
+
+
+def load_audio_ffmpeg(file_path: str, cancel_event: Optional[threading.Event] = None,
+                      sr: int = SAMPLE_RATE, channels: int = 1) -> np.ndarray:
+    """
+    Decode a media file to float32 samples at the given rate using ffmpeg:
+    mono by default, or a (frames, channels) array for more channels.
+    """
+    cmd = [
+        get_ffmpeg_path(), "-nostdin", "-v", "error", "-threads", "0",
+        "-i", file_path,
+        "-f", "s16le", "-ac", str(channels), "-acodec", "pcm_s16le", "-ar", str(sr), "-"
+    ]
+    samples = np.frombuffer(_run_ffmpeg(cmd, cancel_event), np.int16).astype(np.float32) / 32768.0
+    if channels == 1:
+        return samples
+    return samples[:len(samples) // channels * channels].reshape(-1, channels)
+
+
+def load_audio_region(file_path: str, start_seconds: float, duration_seconds: float,
+                      cancel_event: Optional[threading.Event] = None, sr: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Decode part of a media file to mono float32 samples with ffmpeg. The file
+    may still be being written and end mid-frame, so ffmpeg's errors are
+    expected; whatever it could decode is returned.
+    """
+    cmd = [
+        get_ffmpeg_path(), "-nostdin", "-v", "error",
+        "-ss", f"{start_seconds:.3f}", "-i", file_path,
+        "-t", f"{duration_seconds:.3f}",
+        "-f", "s16le", "-ac", "1", "-ar", str(sr), "-"
+    ]
+    return np.frombuffer(_run_ffmpeg(cmd, cancel_event, check=False), np.int16).astype(np.float32) / 32768.0
+
+
+def load_audio(file_path: str, cancel_event: Optional[threading.Event] = None,
+               sr: int = SAMPLE_RATE) -> np.ndarray:
+    """Decode a media file to mono float32 samples, in-process when possible."""
+    try:
+        return load_audio_native(file_path, sr)
+    except (UnsupportedAudioFormat, struct.error, ValueError, OSError):
+        # Anything unusual (or unreadable) goes through ffmpeg, which reports real errors
+        return load_audio_ffmpeg(file_path, cancel_event, sr)
+
+
+def probe_channels(file_path: str) -> int:
+    """Number of channels in a media file's first audio stream, as reported by ffmpeg."""
+    proc = subprocess.run(
+        [get_ffmpeg_path(), "-hide_banner", "-nostdin", "-i", file_path],
+        capture_output=True, text=True, timeout=30
+    )
+    match = _AUDIO_STREAM_RE.search(proc.stderr)
+    if not match:
+        raise RuntimeError(f"No audio stream found in {os.path.basename(file_path)}")
+    layout = match.group(1).strip()
+    counted = re.match(r"(\d+) channels", layout)
+    if counted:
+        return int(counted.group(1))
+    return _LAYOUT_CHANNELS.get(layout.split("(")[0], 1)  # e.g. "5.1(side)"
+
+
+def load_channels(file_path: str, cancel_event: Optional[threading.Event] = None,
+                  sr: int = SAMPLE_RATE) -> List[np.ndarray]:
+    """Decode every channel of a media file separately to float32 samples at the given rate."""
+    try:
+        samples, rate = read_native(file_path)
+        return [resample(to_float32(samples[:, channel]), rate, sr) for channel in range(samples.shape[1])]
+    except (UnsupportedAudioFormat, struct.error, ValueError, OSError):
+        channels = probe_channels(file_path)
+        samples = load_audio_ffmpeg(file_path, cancel_event, sr, channels)
+        if channels == 1:
+            return [samples]
+        return [np.ascontiguousarray(samples[:, channel]) for channel in range(channels)]
+
+
+def is_silent(audio: np.ndarray, sr: int = SAMPLE_RATE, threshold_dbfs: float = SILENT_CHANNEL_DBFS) -> bool:
+    """True if no half-second stretch of the audio gets louder than threshold_dbfs."""
+    frame = int(SILENCE_FRAME_SECONDS * sr)
+    n_frames = max(1, len(audio) // frame)
+    frames = audio[:n_frames * frame]
+    if len(frames) == 0:
+        return True
+    rms = np.sqrt(np.mean(np.square(frames.reshape(n_frames, -1)), axis=1))
+    return float(rms.max()) < 10 ** (threshold_dbfs / 20)
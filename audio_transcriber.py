@@ -1,6 +1,10 @@
 import os
 import sys
 import subprocess
+from functools import partial
+
+from progress_events import Error, WindowDecoded, TranscriptStored
+from segment_array import compact_result
 
 
 def get_ffmpeg_path():
@@ -33,42 +37,112 @@ def setup_ffmpeg_for_whisper():
 setup_ffmpeg_for_whisper()
 
 
-def transcribe_with_retry(file_path, max_retries=3, model=None):
+class TranscriptionCancelled(Exception):
+    """Raised inside a transcription when the user cancels it."""
+
+    def __init__(self, message="Transcription cancelled", windows_decoded=0, audio_offset=0.0):
+        super().__init__(message)
+        self.windows_decoded = windows_decoded
+        self.audio_offset = audio_offset
+
+
+class TranscriptDiscarded(TranscriptionCancelled):
+    """Raised instead of storing a transcript the caller no longer wants (e.g. a lost lease)."""
+
+
+def transcribe_with_retry(file_path, max_retries=3, model=None, decode_options=None, transcribe_fn=None,
+                          cancel_event=None, events=None, guard_repetition=False, backend=None, may_store=None):
+    """
+    Transcribe a file, retrying failures, and return the transcription result.
+    Each failed attempt is published to events as an Error; the last failure
+    is raised once all attempts are used.
+    """
     for attempt in range(1, max_retries + 1):
         try:
-            transcribe_audio(file_path, model=model)
-            print(f"Transcription succeeded for {file_path} on attempt {attempt}")
-            return  # Ensure function exits after success
+            return transcribe_audio(file_path, model=model, decode_options=decode_options,
+                                    transcribe_fn=transcribe_fn, cancel_event=cancel_event, events=events,
+                                    guard_repetition=guard_repetition, backend=backend, may_store=may_store)
+        except TranscriptionCancelled:
+            raise  # Never retry something the user cancelled
         except Exception as e:
-            print(f"Attempt {attempt} failed for {file_path}: {e}")
+            if events is not None:
+                events.publish(Error(str(e), file=os.path.basename(file_path), attempt=attempt,
+                                     final=attempt == max_retries))
             if attempt == max_retries:
-                print(f"Giving up on {file_path} after {max_retries} attempts.")
-
-def transcribe_audio(file_path, model=None):
-    if model is None:
-        raise ValueError("A valid Whisper model instance must be provided.")
+                raise
 
-    print()
-    print("Starting transcription...")
-    result = model.transcribe(file_path)
-    print()
-    print("Transcription completed.")
-    
+def get_output_file(file_path):
+    """Get the transcript path for a media file, creating the transcriptions folder."""
     audio_dir = os.path.dirname(file_path)
     
     transcriptions_dir = os.path.join(audio_dir, "transcriptions")
     os.makedirs(transcriptions_dir, exist_ok=True)
     
     base_name = os.path.splitext(os.path.basename(file_path))[0]
-    output_file = os.path.join(transcriptions_dir, f"{base_name}_transcription.txt")
+    return os.path.join(transcriptions_dir, f"{base_name}_transcription.txt")
+
+def transcribe_audio(file_path, model=None, decode_options=None, transcribe_fn=None, cancel_event=None,
+                     events=None, guard_repetition=False, backend=None, may_store=None):
+    """
+    Transcribe a file, store the transcript next to it and return the result.
+    The file is transcribed by backend (an InferenceBackend), or by a loaded
+    Whisper model passed as model. transcribe_fn replaces both (e.g. to split
+    the file across workers).
+    Setting cancel_event stops the transcription within one decoder step.
+    Progress (each decoded window, the stored transcript) is published to events.
+    Only the hooks the backend reports in capabilities() are passed to it.
+    guard_repetition cuts repetition loops short and marks them as suspect.
+    may_store, if given, is asked just before the transcript is written; if it
+    returns False nothing is written and TranscriptDiscarded is raised.
+    """
+    if transcribe_fn is None:
+        if backend is None:
+            if model is None:
+                raise ValueError("A loaded inference backend or Whisper model must be provided.")
+            # Imported here: inference_backends imports this module
+            from inference_backends import WhisperBackend
+            backend = WhisperBackend.from_model(model)
+        capabilities = backend.capabilities()
+        if not capabilities.cancellable:
+            cancel_event = None  # Such a backend is only stopped between files
+        on_window = None
+        if events is not None and capabilities.window_events:
+            name = os.path.basename(file_path)
+            on_window = lambda window, offset, result: events.publish(
+                WindowDecoded(name, window, offset, result.text)
+            )
+        transcribe_fn = partial(backend.transcribe, cancel_event=cancel_event, on_window=on_window,
+                                guard_repetition=guard_repetition)
+
+    # Keep only the compact columns; the per-segment dicts (with token ids) can go now
+    result = compact_result(transcribe_fn(file_path, **(decode_options or {})))
     
+    output_file = get_output_file(file_path)
+    
+    if may_store is not None and not may_store():
+        raise TranscriptDiscarded(f"Transcript of {os.path.basename(file_path)} discarded")
     store_transcription(result, output_file)
+    if events is not None:
+        events.publish(TranscriptStored(os.path.basename(file_path), output_file, len(result["segments"])))
+    return result
+
+def format_segment(segment, offset=0.0):
+    """Format one segment as a transcript line, shifting its times by offset seconds."""
+    text = segment['text']
+    if segment.get('channel'):
+        # Multichannel recordings: which channel (speaker) this came from
+        text = f" [Channel {segment['channel']}]{text}"
+    if segment.get('suspect'):
+        # Cut short by the repetition guard; likely music, noise or a hallucination
+        text += f" [suspect: {segment['suspect']}]"
+    return f"[{segment['start'] + offset:.2f}s - {segment['end'] + offset:.2f}s] {text}\n"
 
 def store_transcription(result, output_file="transcription.txt"):
-    print()
-    print(f"Storing transcription to {output_file}...")
     with open(output_file, "w") as f:
-        for segment in result["segments"]:
-            f.write(f"[{segment['start']:.2f}s - {segment['end']:.2f}s] {segment['text']}\n")
-    print("Transcription stored successfully.")
-    print()
\ No newline at end of file
+        f.writelines(format_segment(segment) for segment in result["segments"])
+
+def append_segments(segments, output_file, offset=0.0):
+    """Append segments to an existing transcript (used when following a growing recording)."""
+    with open(output_file, "a") as f:
+        for segment in segments:
+            f.write(format_segment(segment, offset))
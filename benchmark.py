@@ -0,0 +1,420 @@
+"""
+Benchmarks for the transcription pipeline.
+
+Usage:
+  python benchmark.py decoding FILE [FILE ...] [--model base] [--language en]
+  python benchmark.py ingest [FILE ...] [--clips 500] [--clip-seconds 5]
+  python benchmark.py segments [--hours 10]
+  python benchmark.py engine [FILE] [--models tiny base small] [--engine torchscript]
+  python benchmark.py pipeline [--backend stub] [--clips 200] [--jobs 1]
+  python benchmark.py packing [--backend stub] [--clips 60] [--clip-seconds 5]
+"""
+
+import argparse
+import os
+import pickle
+import sys
+import tempfile
+import time
+import tracemalloc
+import wave
+from typing import Dict, List
+
+import numpy as np
+
+from transcription_core import (
+    TranscriptionSession, DECODING_PROFILES, WHISPER_MODELS, get_decoding_options
+)
+from throughput_stats import probe_media_duration
+from inference_backends import available_backends
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    """Word error rate of hypothesis against reference (Levenshtein over words)."""
+    ref = reference.lower().split()
+    hyp = hypothesis.lower().split()
+    if not ref:
+        return 0.0 if not hyp else 1.0
+
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(
+                previous[j] + 1,                              # deletion
+                current[j - 1] + 1,                           # insertion
+                previous[j - 1] + (ref_word != hyp_word)      # substitution
+            )
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def load_session_model(model_name: str) -> TranscriptionSession:
+    session = TranscriptionSession(model_name, progress_callback=print)
+    if not session.load_model():
+        sys.exit(1)
+    return session
+
+
+def benchmark_decoding(args) -> Dict[str, Dict[str, float]]:
+    """Transcribe each file with every decoding profile and compare speed and output."""
+    session = load_session_model(args.model)
+    audio_seconds = sum(probe_media_duration(f) or 0.0 for f in args.files)
+
+    texts: Dict[str, List[str]] = {}
+    report: Dict[str, Dict[str, float]] = {}
+    for profile in DECODING_PROFILES:
+        options = get_decoding_options(profile, args.language)
+        start = time.perf_counter()
+        texts[profile] = [session.backend.transcribe(f, **options)['text'] for f in args.files]
+        elapsed = time.perf_counter() - start
+        report[profile] = {
+            'seconds': elapsed,
+            'rtf': elapsed / audio_seconds if audio_seconds else float('nan'),
+        }
+
+    # 'accurate' is the quality reference for the other profiles
+    reference = texts['accurate']
+    for profile in DECODING_PROFILES:
+        errors = [word_error_rate(r, h) for r, h in zip(reference, texts[profile])]
+        report[profile]['wer_vs_accurate'] = sum(errors) / len(errors)
+        report[profile]['speedup_vs_accurate'] = report['accurate']['seconds'] / report[profile]['seconds']
+
+    print()
+    print(f"Decoding profiles, model '{args.model}', {len(args.files)} file(s), {audio_seconds:.1f}s of audio")
+    print(f"{'profile':<10} {'seconds':>9} {'RTF':>7} {'speedup':>8} {'WER vs accurate':>16}")
+    for profile, row in report.items():
+        print(f"{profile:<10} {row['seconds']:>9.2f} {row['rtf']:>7.3f} "
+              f"{row['speedup_vs_accurate']:>7.2f}x {row['wer_vs_accurate']:>15.1%}")
+    return report
+
+
+def write_test_clips(directory: str, count: int, seconds: float, rate: int = 44100) -> List[str]:
+    """Write short stereo 16-bit WAV voice-note stand-ins (tones plus noise)."""
+    rng = np.random.default_rng(0)
+    paths = []
+    t = np.arange(int(seconds * rate)) / rate
+    for i in range(count):
+        tone = 0.3 * np.sin(2 * np.pi * (200 + i % 300) * t)
+        stereo = np.stack([tone, tone], axis=1) + rng.normal(0, 0.02, (len(t), 2))
+        path = os.path.join(directory, f"clip_{i:05d}.wav")
+        with wave.open(path, "wb") as wav_file:
+            wav_file.setnchannels(2)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(rate)
+            wav_file.writeframes((np.clip(stereo, -1, 1) * 32767).astype("<i2").tobytes())
+        paths.append(path)
+    return paths
+
+
+def benchmark_ingest(args) -> Dict[str, float]:
+    """Compare in-process WAV/FLAC decoding against spawning ffmpeg per file."""
+    from audio_io import load_audio_native, load_audio_ffmpeg
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        files = args.files or write_test_clips(tmp_dir, args.clips, args.clip_seconds)
+
+        start = time.perf_counter()
+        native = [load_audio_native(f) for f in files]
+        native_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        via_ffmpeg = [load_audio_ffmpeg(f) for f in files]
+        ffmpeg_seconds = time.perf_counter() - start
+
+    # Resamplers differ slightly, so compare loudness rather than exact samples
+    rms_diff = max(abs(float(np.sqrt(np.mean(a ** 2))) - float(np.sqrt(np.mean(b ** 2))))
+                   for a, b in zip(native, via_ffmpeg) if len(a) and len(b))
+    report = {
+        'files': len(files),
+        'native_seconds': native_seconds,
+        'ffmpeg_seconds': ffmpeg_seconds,
+        'speedup': ffmpeg_seconds / native_seconds if native_seconds else float('inf'),
+        'max_rms_difference': rms_diff,
+    }
+
+    print()
+    print(f"Audio ingest, {len(files)} file(s)")
+    print(f"{'path':<8} {'seconds':>9} {'files/s':>9}")
+    print(f"{'native':<8} {native_seconds:>9.2f} {len(files) / native_seconds:>9.1f}")
+    print(f"{'ffmpeg':<8} {ffmpeg_seconds:>9.2f} {len(files) / ffmpeg_seconds:>9.1f}")
+    print(f"Speedup: {report['speedup']:.1f}x (max RMS difference {rms_diff:.4f})")
+    return report
+
+
+def synthetic_segments(hours: float, seed: int = 0) -> List[Dict]:
+    """Segment dicts shaped like model.transcribe() output for hours of speech."""
+    rng = np.random.default_rng(seed)
+    words = [f"word{i}" for i in range(5000)]
+    fillers = [" Thank you.", " Okay.", " Yeah.", " Mm-hmm.", " ..."]
+    segments = []
+    position = 0.0
+    while position < hours * 3600:
+        length = float(rng.uniform(2.0, 7.0))
+        if rng.random() < 0.1:
+            text = fillers[int(rng.integers(len(fillers)))]
+        else:
+            text = " " + " ".join(words[i] for i in rng.integers(0, len(words), int(length * 2.5)))
+        n_tokens = len(text.split()) + 2
+        segments.append({
+            'id': len(segments),
+            'seek': int(position * 100) // 3000 * 3000,
+            'start': round(position, 2),
+            'end': round(position + length, 2),
+            'text': text,
+            'tokens': [int(t) for t in rng.integers(1000, 50000, n_tokens)],
+            'temperature': 0.0,
+            'avg_logprob': float(rng.uniform(-1.0, -0.1)),
+            'compression_ratio': float(rng.uniform(1.2, 2.0)),
+            'no_speech_prob': float(rng.uniform(0.0, 0.2)),
+        })
+        position += length
+    return segments
+
+
+def _allocated(build):
+    """Bytes still allocated by what build() returns, and the value itself."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    value = build()
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return allocated, value
+
+
+def benchmark_segments(args) -> Dict[str, float]:
+    """Compare the memory and serialization cost of segment dicts and SegmentArray."""
+    from segment_array import SegmentArray
+
+    dict_bytes, segments = _allocated(lambda: synthetic_segments(args.hours))
+    array_bytes, compact = _allocated(lambda: SegmentArray.from_segments(segments))
+
+    start = time.perf_counter()
+    dict_blob = pickle.dumps(segments, protocol=pickle.HIGHEST_PROTOCOL)
+    pickle.loads(dict_blob)
+    dict_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    array_blob = compact.to_bytes()
+    SegmentArray.from_bytes(array_blob)
+    array_seconds = time.perf_counter() - start
+
+    count = len(segments)
+    report = {
+        'segments': count,
+        'dict_bytes': dict_bytes,
+        'array_bytes': array_bytes,
+        'memory_reduction': dict_bytes / array_bytes,
+        'dict_serialized_bytes': len(dict_blob),
+        'array_serialized_bytes': len(array_blob),
+        'dict_roundtrip_seconds': dict_seconds,
+        'array_roundtrip_seconds': array_seconds,
+    }
+
+    print()
+    print(f"Segments of a synthetic {args.hours:g}-hour result ({count} segments)")
+    print(f"{'format':<13} {'memory':>10} {'per seg':>9} {'serialized':>11} {'round trip':>11}")
+    print(f"{'dicts':<13} {dict_bytes / 1e6:>8.1f}MB {dict_bytes / count:>8.0f}B "
+          f"{len(dict_blob) / 1e6:>9.1f}MB {dict_seconds * 1000:>9.1f}ms")
+    print(f"{'SegmentArray':<13} {array_bytes / 1e6:>8.1f}MB {array_bytes / count:>8.0f}B "
+          f"{len(array_blob) / 1e6:>9.1f}MB {array_seconds * 1000:>9.1f}ms")
+    print(f"Memory: {report['memory_reduction']:.1f}x smaller")
+    return report
+
+
+def _time_transcribe(model, audio, options, repeats: int):
+    """Mean seconds per transcription after one untimed run, and the transcript."""
+    text = model.transcribe(audio, **options)['text']
+    start = time.perf_counter()
+    for _ in range(repeats):
+        model.transcribe(audio, **options)
+    return (time.perf_counter() - start) / repeats, text
+
+
+def benchmark_engine(args) -> Dict[str, Dict[str, float]]:
+    """Warm-up cost and steady-state speed of a compiled engine against eager mode, per model."""
+    from compiled_engine import accelerate
+
+    if args.files:
+        from audio_io import load_audio
+        audio = load_audio(args.files[0])
+    else:
+        # A minute of tones and noise; enough to exercise several windows
+        rate = 16000
+        t = np.arange(60 * rate) / rate
+        audio = (0.2 * np.sin(2 * np.pi * 220 * t)
+                 + np.random.default_rng(0).normal(0, 0.05, len(t))).astype(np.float32)
+    options = get_decoding_options('fast', args.language or 'en')
+
+    report: Dict[str, Dict[str, float]] = {}
+    for model_name in args.models:
+        session = load_session_model(model_name)
+        eager_seconds, eager_text = _time_transcribe(session.model, audio, options, args.repeats)
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cold = accelerate(session.model, session.model_path, args.engine, cache_dir)
+            engine_seconds, engine_text = _time_transcribe(session.model, audio, options, args.repeats)
+            # A second launch finds the compiled artifacts on disk
+            cached = accelerate(load_session_model(model_name).model, session.model_path, args.engine, cache_dir)
+
+        for note in cold.notes:
+            print(f"  {model_name}: {note}")
+        report[model_name] = {
+            'parts_compiled': len(cold.compiled_parts),
+            'parts': len(cold.parts),
+            'cold_warmup_seconds': cold.warmup_seconds,
+            'cached_warmup_seconds': cached.warmup_seconds,
+            'eager_seconds': eager_seconds,
+            'engine_seconds': engine_seconds,
+            'speedup': eager_seconds / engine_seconds,
+            'identical': engine_text == eager_text,
+        }
+
+    print()
+    print(f"{args.engine} engine vs eager, {len(audio) / 16000:.0f}s of audio, mean of {args.repeats} run(s)")
+    print(f"{'model':<7} {'compiled':>9} {'warm-up':>8} {'cached':>7} {'eager':>7} {'engine':>7} "
+          f"{'speedup':>8} {'identical':>9}")
+    for model_name, row in report.items():
+        print(f"{model_name:<7} {row['parts_compiled']:>4}/{row['parts']:<4} {row['cold_warmup_seconds']:>7.1f}s "
+              f"{row['cached_warmup_seconds']:>6.1f}s {row['eager_seconds']:>6.2f}s {row['engine_seconds']:>6.2f}s "
+              f"{row['speedup']:>7.2f}x {'yes' if row['identical'] else 'NO':>9}")
+    return report
+
+
+def benchmark_pipeline(args) -> Dict[str, float]:
+    """
+    Time the whole per-file pipeline (probe, decode, transcribe, store, events)
+    on generated clips. With the stub backend no model runs, so this measures
+    the overhead around the model.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        files = [os.path.basename(f) for f in write_test_clips(tmp_dir, args.clips, args.clip_seconds)]
+        session = TranscriptionSession(args.model, backend=args.backend, concurrent_jobs=args.jobs,
+                                       language='en')
+        if not session.load_model():
+            sys.exit(1)
+        start = time.perf_counter()
+        results = session.transcribe_files(files, tmp_dir)
+        elapsed = time.perf_counter() - start
+        session.close()
+
+    audio_seconds = len(files) * args.clip_seconds
+    report = {
+        'files': len(files),
+        'completed': results['completed_files'],
+        'seconds': elapsed,
+        'files_per_second': len(files) / elapsed,
+        'rtf': elapsed / audio_seconds,
+    }
+
+    print()
+    print(f"Pipeline, {args.backend} backend, {len(files)} clip(s) of {args.clip_seconds:.0f}s, {args.jobs} job(s)")
+    print(f"{report['completed']} of {len(files)} transcribed in {elapsed:.2f}s: "
+          f"{report['files_per_second']:.1f} files/s, RTF {report['rtf']:.4f}")
+    return report
+
+
+def _run_session(directory: str, files: List[str], **session_options):
+    """Transcribe files in a fresh session; returns (results, seconds, transcript text per file)."""
+    session = TranscriptionSession(**session_options)
+    if not session.load_model():
+        sys.exit(1)
+    start = time.perf_counter()
+    results = session.transcribe_files(files, directory)
+    elapsed = time.perf_counter() - start
+    session.close()
+    transcripts = {}
+    for name in files:
+        with open(os.path.join(directory, "transcriptions", f"{os.path.splitext(name)[0]}_transcription.txt")) as f:
+            transcripts[name] = [line.split("] ", 1)[-1] for line in f]
+    return results, elapsed, transcripts
+
+
+def benchmark_packing(args) -> Dict[str, float]:
+    """Transcribe the same short clips one by one and packed into shared windows."""
+    from clip_packing import format_packing_stats
+
+    options = {'model_name': args.model, 'backend': args.backend, 'language': 'en'}
+    if args.backend == 'stub':
+        # Stand-in for the model's cost per 30 s window
+        options['backend_options'] = {'seconds_per_window': args.stub_window_seconds}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        files = [os.path.basename(f) for f in write_test_clips(tmp_dir, args.clips, args.clip_seconds, rate=16000)]
+        _, single_seconds, single_text = _run_session(tmp_dir, files, **options)
+        results, packed_seconds, packed_text = _run_session(tmp_dir, files, pack_short_clips=True, **options)
+
+    packing = results.get('packing')
+    report = {
+        'files': len(files),
+        'single_seconds': single_seconds,
+        'packed_seconds': packed_seconds,
+        'speedup': single_seconds / packed_seconds,
+        'windows': packing['windows'] if packing else len(files),
+        'same_text': sum(single_text[f] == packed_text[f] for f in files),
+    }
+
+    print()
+    print(f"Clip packing, {args.backend} backend, {len(files)} clip(s) of {args.clip_seconds:.0f}s")
+    print(f"{'mode':<8} {'seconds':>9} {'files/s':>9}")
+    print(f"{'single':<8} {single_seconds:>9.2f} {len(files) / single_seconds:>9.1f}")
+    print(f"{'packed':<8} {packed_seconds:>9.2f} {len(files) / packed_seconds:>9.1f}")
+    if packing:
+        print(f"Clip packing: {format_packing_stats(packing)}")
+    print(f"Throughput gain: {report['speedup']:.1f}x; "
+          f"{report['same_text']} of {len(files)} transcripts identical to unpacked")
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Audio Transcriber benchmarks")
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    decoding = subparsers.add_parser('decoding', help='Compare decoding profiles')
+    decoding.add_argument('files', nargs='+')
+    decoding.add_argument('--model', default='base')
+    decoding.add_argument('--language', default=None)
+    decoding.set_defaults(func=benchmark_decoding)
+
+    ingest = subparsers.add_parser('ingest', help='Compare native WAV/FLAC decoding with ffmpeg')
+    ingest.add_argument('files', nargs='*', help='WAV/FLAC files (default: generated short clips)')
+    ingest.add_argument('--clips', type=int, default=500)
+    ingest.add_argument('--clip-seconds', type=float, default=5.0)
+    ingest.set_defaults(func=benchmark_ingest)
+
+    segments = subparsers.add_parser('segments', help='Compare segment dicts with SegmentArray on a long result')
+    segments.add_argument('--hours', type=float, default=10.0)
+    segments.set_defaults(func=benchmark_segments)
+
+    engine = subparsers.add_parser('engine', help='Compare a compiled engine with eager mode per model size')
+    engine.add_argument('files', nargs='*', help='Audio to transcribe (default: a generated minute)')
+    engine.add_argument('--models', nargs='+', choices=sorted(WHISPER_MODELS), default=['tiny', 'base'])
+    engine.add_argument('--engine', choices=['torchscript', 'compile'], default='torchscript')
+    engine.add_argument('--language', default=None)
+    engine.add_argument('--repeats', type=int, default=3)
+    engine.set_defaults(func=benchmark_engine)
+
+    pipeline = subparsers.add_parser('pipeline', help='Time the file pipeline end to end with any backend')
+    pipeline.add_argument('--backend', choices=sorted(available_backends()), default='stub')
+    pipeline.add_argument('--model', default='base')
+    pipeline.add_argument('--clips', type=int, default=200)
+    pipeline.add_argument('--clip-seconds', type=float, default=5.0)
+    pipeline.add_argument('--jobs', type=int, default=1)
+    pipeline.set_defaults(func=benchmark_pipeline)
+
+    packing = subparsers.add_parser('packing', help='Compare short clips transcribed one by one and packed')
+    packing.add_argument('--backend', choices=sorted(available_backends()), default='stub')
+    packing.add_argument('--model', default='base')
+    packing.add_argument('--clips', type=int, default=60)
+    packing.add_argument('--clip-seconds', type=float, default=5.0)
+    packing.add_argument('--stub-window-seconds', type=float, default=0.2,
+                         help='Compute time the stub backend spends per window')
+    packing.set_defaults(func=benchmark_packing)
+
+    args = parser.parse_args(argv)
+    if hasattr(args, 'files'):
+        args.files = [os.path.abspath(f) for f in args.files]
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Intra-file parallelism for long recordings.
+
+A long file is cut into chunks at pauses near a target length, the chunks are
+transcribed concurrently by a pool of worker processes (each with its own copy
+of the model), and the results are stitched back together with timestamps
+shifted to the original timeline and duplicated boundary text removed.
+"""
+
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from audio_io import load_audio
+from audio_transcriber import TranscriptionCancelled
+from inference_backends import BackendSpec
+from repetition_guard import merge_guard_stats
+from segment_array import SegmentArrayBuilder
+from worker_pool import create_pool, terminate_pool, transcribe_chunk
+
+
+SAMPLE_RATE = 16000
+
+# Default chunk length and how far from it we look for a pause to cut at
+DEFAULT_CHUNK_SECONDS = 600
+SPLIT_SEARCH_SECONDS = 30
+
+# Audio shared by neighbouring chunks, so a word cut at a boundary is heard whole once
+CHUNK_OVERLAP_SECONDS = 1.0
+
+# Energy is measured on frames of this length when looking for pauses
+FRAME_SECONDS = 0.05
+
+
+def find_split_points(audio: np.ndarray, target_seconds: float = DEFAULT_CHUNK_SECONDS,
+                      search_seconds: float = SPLIT_SEARCH_SECONDS) -> List[int]:
+    """
+    Choose sample positions to cut the audio at, one near every multiple of
+    target_seconds, each placed in the quietest 0.5 s stretch within
+    search_seconds of the target.
+    """
+    frame = int(FRAME_SECONDS * SAMPLE_RATE)
+    n_frames = len(audio) // frame
+    if n_frames == 0 or len(audio) < 1.5 * target_seconds * SAMPLE_RATE:
+        return []
+
+    energy = np.sqrt(np.mean(np.square(audio[:n_frames * frame].reshape(n_frames, frame)), axis=1))
+    # Smooth over 0.5 s so a single quiet frame inside a word doesn't count as a pause
+    window = max(1, int(0.5 / FRAME_SECONDS))
+    smoothed = np.convolve(energy, np.ones(window) / window, mode='same')
+
+    points = []
+    target_frames = int(target_seconds / FRAME_SECONDS)
+    search_frames = int(search_seconds / FRAME_SECONDS)
+    position = target_frames
+    # Don't leave a tiny final chunk; fold anything under half a chunk into the last one
+    while position < n_frames - target_frames // 2:
+        lo = max(position - search_frames, (points[-1] // frame if points else 0) + window)
+        hi = min(position + search_frames, n_frames - window)
+        if hi <= lo:
+            break
+        quietest = lo + int(np.argmin(smoothed[lo:hi]))
+        points.append(quietest * frame)
+        position = quietest + target_frames
+    return points
+
+
+def split_audio(audio: np.ndarray, split_points: List[int]) -> List[Tuple[float, np.ndarray]]:
+    """Cut audio into (offset_seconds, samples) chunks, overlapping slightly at each cut."""
+    overlap = int(CHUNK_OVERLAP_SECONDS * SAMPLE_RATE)
+    bounds = [0] + split_points + [len(audio)]
+    chunks = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        start = max(0, start - overlap) if start else 0
+        chunks.append((start / SAMPLE_RATE, audio[start:end]))
+    return chunks
+
+
+def _words(text: str) -> List[str]:
+    return re.findall(r"[\w']+", text.lower())
+
+
+def _strip_repeated_prefix(previous_text: str, text: str, max_words: int = 8) -> str:
+    """Drop the leading words of text that repeat the end of previous_text."""
+    previous_words = _words(previous_text)
+    words = text.split()
+    for n in range(min(max_words, len(words), len(previous_words)), 0, -1):
+        if _words(" ".join(words[:n])) == previous_words[-n:]:
+            return " " + " ".join(words[n:]) if words[n:] else ""
+    return text
+
+
+def stitch_chunk_results(chunk_results: List[Tuple[float, Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Merge per-chunk transcription results into one result, shifting timestamps
+    by each chunk's offset and dropping text transcribed twice in the overlaps.
+    The merged segments are returned as a SegmentArray.
+    """
+    segments = SegmentArrayBuilder()
+    texts = []
+    last = None
+    language = None
+    guard_stats = None
+    for offset, result in chunk_results:
+        language = language or result.get('language')
+        if 'repetition_guard' in result:
+            guard_stats = merge_guard_stats(guard_stats, result['repetition_guard'])
+        for segment in result['segments']:
+            segment = dict(segment)
+            segment['start'] += offset
+            segment['end'] += offset
+
+            if last is not None:
+                # Entirely inside audio the previous chunk already covered
+                if segment['end'] <= last['end'] + 0.1:
+                    continue
+                if segment['start'] < last['end']:
+                    segment['text'] = _strip_repeated_prefix(last['text'], segment['text'])
+                    segment['start'] = last['end']
+                    if not segment['text'].strip():
+                        continue
+
+            segments.append_segment(segment)
+            texts.append(segment['text'])
+            last = segment
+
+    stitched = {
+        'text': "".join(texts),
+        'segments': segments.build(),
+        'language': language
+    }
+    if guard_stats is not None:
+        stitched['repetition_guard'] = guard_stats
+    return stitched
+
+
+class ChunkedTranscriber:
+    """Pool of worker processes that transcribe chunks of long files concurrently."""
+
+    def __init__(self, backend_spec: BackendSpec, workers: Optional[int] = None,
+                 chunk_seconds: float = DEFAULT_CHUNK_SECONDS,
+                 cancel_event: Optional[threading.Event] = None, guard_repetition: bool = False):
+        self.backend_spec = backend_spec
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.chunk_seconds = chunk_seconds
+        self.cancel_event = cancel_event or threading.Event()
+        self.guard_repetition = guard_repetition
+        self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = create_pool(self.backend_spec, self.workers)
+        return self._executor
+
+    def transcribe(self, file_path: str, **decode_options) -> Dict[str, Any]:
+        """Drop-in replacement for model.transcribe(file_path, **options)."""
+        audio = load_audio(file_path, self.cancel_event)
+        chunks = split_audio(audio, find_split_points(audio, self.chunk_seconds))
+        executor = self._get_executor()
+        futures = [(offset, executor.submit(transcribe_chunk, samples, decode_options, self.guard_repetition))
+                   for offset, samples in chunks]
+
+        pending = [future for _, future in futures]
+        while pending:
+            if self.cancel_event.is_set():
+                done_chunks = len(futures) - len(pending)
+                self.terminate()
+                raise TranscriptionCancelled(
+                    f"Cancelled with {done_chunks} of {len(futures)} chunks done",
+                    windows_decoded=done_chunks
+                )
+            _, not_done = wait(pending, timeout=0.2)
+            pending = list(not_done)
+
+        return stitch_chunk_results([(offset, future.result()) for offset, future in futures])
+
+    def terminate(self):
+        """Kill the workers now, abandoning any chunks in progress."""
+        if self._executor is not None:
+            terminate_pool(self._executor)
+            self._executor = None
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
@@ -6,15 +6,19 @@ This is the command-line version that maintains the original functionality.
 import os
 import sys
 import time
+import argparse
 from transcription_core import (
     TranscriptionSession, find_media_files, get_search_directory,
-    WHISPER_MODELS, get_model_info, validate_model_choice
+    WHISPER_MODELS, get_model_info, validate_model_choice,
+    DECODING_PROFILES, DEFAULT_DECODING_PROFILE, get_profile_info,
+    ENGINE_DESCRIPTIONS, DEFAULT_ENGINE
 )
-
-# Force unbuffered output for stdout and stderr
-os.environ["PYTHONUNBUFFERED"] = "1"
-sys.stdout = os.fdopen(sys.stdout.fileno(), "w", buffering=1)
-sys.stderr = os.fdopen(sys.stderr.fileno(), "w", buffering=1)
+from work_claims import ClaimManager, DEFAULT_LEASE_SECONDS
+from inference_backends import available_backends, DEFAULT_BACKEND
+from progress_events import JsonLinesLog, MetricsExporter, WindowDecoded
+from repetition_guard import format_guard_stats
+from clip_packing import format_packing_stats
+from transcription_daemon import open_session, DEFAULT_IDLE_MINUTES
 
 
 def slow_type(text, delay=0.01):
@@ -62,6 +66,111 @@ def get_model_choice():
             print(f"Invalid choice. Please choose from {WHISPER_MODELS}.")
 
 
+def parse_cli_args(argv=None):
+    """Parse CLI options. Unknown options (e.g. app.py's --cli) are ignored."""
+    parser = argparse.ArgumentParser(description="Audio Transcriber CLI", add_help=False)
+    parser.add_argument('--decoding', choices=sorted(DECODING_PROFILES), default=DEFAULT_DECODING_PROFILE,
+                        help='Decoding profile trading speed for accuracy')
+    parser.add_argument('--language', default=None,
+                        help='Pin the spoken language (e.g. en) and skip language detection')
+    parser.add_argument('--model', choices=sorted(WHISPER_MODELS), default=None,
+                        help='Transcription model (skips the interactive prompt)')
+    parser.add_argument('--dir', default=None,
+                        help='Folder to transcribe instead of the app folder')
+    parser.add_argument('--distributed', action='store_true',
+                        help='Share the folder with other workers via lease files (no prompts)')
+    parser.add_argument('--worker-id', default=None,
+                        help='Worker name used in lease files (default: host-pid-random)')
+    parser.add_argument('--lease-seconds', type=float, default=DEFAULT_LEASE_SECONDS,
+                        help='Seconds without a heartbeat before a claimed file is taken over')
+    parser.add_argument('--split-long-files', action='store_true',
+                        help='Split long recordings at pauses and transcribe the parts in parallel')
+    parser.add_argument('--chunk-workers', type=int, default=None,
+                        help='Worker processes used with --split-long-files (default: CPU count)')
+    parser.add_argument('--chunk-minutes', type=float, default=10,
+                        help='Target length of each part with --split-long-files')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='Transcribe this many files at once (each job loads its own model)')
+    parser.add_argument('--memory-budget-mb', type=float, default=None,
+                        help='RAM that concurrent jobs may use (default: 70%% of physical memory)')
+    parser.add_argument('--tail', metavar='FILE', default=None,
+                        help='Transcribe a recording that is still being written, as it grows')
+    parser.add_argument('--tail-idle-seconds', type=float, default=60,
+                        help='Stop following --tail FILE once it has not grown for this long')
+    parser.add_argument('--engine', choices=sorted(ENGINE_DESCRIPTIONS), default=DEFAULT_ENGINE,
+                        help='Run the model compiled (traced or torch.compile) instead of eager PyTorch')
+    parser.add_argument('--backend', choices=sorted(available_backends()), default=DEFAULT_BACKEND,
+                        help='Inference backend; "stub" produces fake transcripts without model weights')
+    parser.add_argument('--no-repetition-guard', dest='guard_repetition', action='store_false',
+                        help='Let Whisper run repetition loops to the end instead of cutting them short')
+    parser.add_argument('--pack-short-clips', action='store_true',
+                        help='Transcribe clips of up to 10 s several to a 30 s window, then split them back')
+    parser.add_argument('--multichannel', action='store_true',
+                        help='Transcribe each channel (speaker) separately and in parallel, skipping silent ones')
+    parser.add_argument('--profile', action='store_true',
+                        help='Save a cProfile dump, torch operator trace and hot-spot summary per file')
+    parser.add_argument('--start-daemon', action='store_true',
+                        help='Start the background service if it is not running, so the next launch starts at once')
+    parser.add_argument('--no-daemon', dest='use_daemon', action='store_false',
+                        help='Transcribe in this process even if the background service is running')
+    parser.add_argument('--daemon-idle-minutes', type=float, default=DEFAULT_IDLE_MINUTES,
+                        help='Minutes without jobs before a background service started here exits '
+                             '(0: keep it running until app.py --stop-daemon)')
+    parser.add_argument('--events-log', metavar='FILE', default=None,
+                        help='Append every progress event to FILE as JSON lines')
+    parser.add_argument('--metrics-file', metavar='FILE', default=None,
+                        help='Keep run counters in FILE in the Prometheus text format')
+    args, _ = parser.parse_known_args(argv)
+    return args
+
+
+def attach_event_sinks(session, args):
+    """Subscribe the console printer and any requested log/metrics files to the session."""
+    session.events.subscribe(print_progress_event)
+    sinks = []
+    if args.events_log:
+        sinks.append(JsonLinesLog(args.events_log))
+    if args.metrics_file:
+        sinks.append(MetricsExporter(args.metrics_file))
+    for sink in sinks:
+        session.events.subscribe(sink)
+    return sinks
+
+
+def close_event_sinks(session, sinks):
+    session.close()  # Delivers every event still queued
+    for sink in sinks:
+        sink.close()
+
+
+def run_tail_mode(args, model_choice):
+    """Follow a growing recording until it stops growing or Ctrl+C is pressed."""
+    file_path = os.path.abspath(args.tail)
+    session = TranscriptionSession(model_choice, decoding_profile=args.decoding, language=args.language,
+                                   guard_repetition=args.guard_repetition, engine=args.engine,
+                                   backend=args.backend)
+    sinks = attach_event_sinks(session, args)
+    try:
+        if not session.load_model():
+            print("Failed to load model. Exiting...")
+            return
+        result = session.transcribe_growing_file(file_path, idle_seconds=args.tail_idle_seconds)
+    except KeyboardInterrupt:
+        print("\nStopped following the recording. Run the same command again to resume.")
+        return
+    finally:
+        close_event_sinks(session, sinks)
+    print()
+    print(f"Transcribed {result['transcribed_seconds']:.1f}s in {result['increments']} increments")
+    print(f"Transcript: {result['output_file']}")
+
+
+def pause(args, prompt="Press Enter to exit..."):
+    """Wait for Enter, except in non-interactive distributed mode."""
+    if not args.distributed:
+        input(prompt)
+
+
 def display_found_files(files, search_dir):
     """Display found media files to the user."""
     if not files:
@@ -75,47 +184,83 @@ def display_found_files(files, search_dir):
     return True
 
 
-def cli_progress_callback(message):
-    """Progress callback for CLI output."""
-    print(message)
+def print_progress_event(event):
+    """Print progress events to the console (runs on the event dispatcher thread)."""
+    message = event.message()
+    if message is None:
+        return
+    if isinstance(event, WindowDecoded):
+        message = "  " + message
+    # Flush each line so progress shows up promptly even when stdout is a pipe
+    print(message, flush=True)
 
 
 def main():
     """Main CLI application entry point."""
+    args = parse_cli_args()
     try:
         # Get search directory
-        search_dir = get_search_directory()
+        search_dir = os.path.abspath(args.dir) if args.dir else get_search_directory()
         
         # Display banner
         display_banner()
         
         # Get model choice
-        model_choice = get_model_choice()
+        model_choice = args.model or ('base' if args.distributed else get_model_choice())
+        
+        if args.tail:
+            run_tail_mode(args, model_choice)
+            pause(args)
+            return
+        print(f"Decoding profile: {args.decoding} ({get_profile_info()[args.decoding]})")
         print()
         
         # Find media files
         files = find_media_files(search_dir)
         if not display_found_files(files, search_dir):
-            input("Press Enter to exit...")
+            pause(args)
             return
         
-        # Confirm start
+        # Create transcription session (in the background service if one is running) and estimate
+        # how long it will take; distributed mode always runs here
+        session = open_session(
+            model_choice,
+            use_daemon=args.use_daemon and not args.distributed,
+            start_daemon_if_needed=args.start_daemon, idle_minutes=args.daemon_idle_minutes,
+            decoding_profile=args.decoding, language=args.language,
+            split_long_files=args.split_long_files, chunk_workers=args.chunk_workers,
+            chunk_seconds=args.chunk_minutes * 60, concurrent_jobs=args.jobs,
+            memory_budget_mb=args.memory_budget_mb, guard_repetition=args.guard_repetition,
+            engine=args.engine, backend=args.backend, profile=args.profile,
+            pack_short_clips=args.pack_short_clips, multichannel=args.multichannel
+        )
+        sinks = attach_event_sinks(session, args)
+        plan = session.plan([os.path.join(search_dir, f) for f in files])
         print()
-        print("Press Enter to start the transcriptions, or Ctrl+C to cancel...")
-        input()
+        print(f"Planned: {plan.plan_summary()}")
         
-        # Create transcription session
-        session = TranscriptionSession(model_choice, cli_progress_callback)
+        # Confirm start
+        if not args.distributed:
+            print()
+            print("Press Enter to start the transcriptions, or Ctrl+C to cancel...")
+            input()
         
         # Load model
         if not session.load_model():
+            close_event_sinks(session, sinks)
             print("Failed to load model. Exiting...")
-            input("Press Enter to exit...")
+            pause(args)
             return
         
         # Start transcription
         print()
-        results = session.transcribe_files(files, search_dir)
+        if args.distributed:
+            claims = ClaimManager(search_dir, worker_id=args.worker_id, lease_seconds=args.lease_seconds)
+            print(f"Distributed mode: worker '{claims.worker_id}', claims in {claims.claims_dir}")
+            results = session.transcribe_claimed(files, search_dir, claims)
+        else:
+            results = session.transcribe_files(files, search_dir)
+        close_event_sinks(session, sinks)
         
         # Display results
         print()
@@ -124,6 +269,11 @@ def main():
         print(f"  Total files: {results['total_files']}")
         print(f"  Completed: {results['completed_files']}")
         print(f"  Failed: {results['failed_files']}")
+        guard_stats = results.get('repetition_guard')
+        if guard_stats and guard_stats['windows_guarded']:
+            print(f"  Repetition guard: {format_guard_stats(guard_stats)}")
+        if results.get('packing', {}).get('windows'):
+            print(f"  Clip packing: {format_packing_stats(results['packing'])}")
         
         if results['errors']:
             print("\nErrors encountered:")
@@ -132,20 +282,22 @@ def main():
         
         if results['completed_files'] > 0:
             print(f"\nTranscription files saved in: {os.path.join(search_dir, 'transcriptions')}")
+        if results.get('profiles'):
+            print(f"Profiles saved in: {os.path.join(search_dir, 'profiles')}")
         
         print("="*80)
         print()
-        input("Press Enter to exit...")
+        pause(args)
         
     except KeyboardInterrupt:
         print("\n\nTranscription cancelled by user.")
-        input("Press Enter to exit...")
+        pause(args)
     except Exception as e:
         print(f"\nFatal error: {e}", file=sys.stderr)
         import traceback
         traceback.print_exc()
         print("Contact your Matt if you need help.")
-        input("Press Enter to exit...")
+        pause(args)
         sys.exit(1)
 
 
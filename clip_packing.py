@@ -0,0 +1,183 @@
+"""
+Short-clip packing: several voice notes transcribed in one decoding window.
+
+Whisper decodes audio in 30 s windows and pads anything shorter with
+silence, so a 5 s voice note costs as much encoder work as 30 s of speech,
+plus the setup of a whole transcription. With packing, clips of up to
+MAX_CLIP_SECONDS are joined end to end, with a second of silence between
+them, into packs of at most one window. Each pack is transcribed once and
+its segments are handed back to the clip they fall in, on that clip's own
+timeline. A segment that runs across a gap can't be divided between the two
+clips; those clips are reported back so they can be transcribed on their own.
+"""
+
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from audio_io import load_audio
+from segment_array import SegmentArrayBuilder
+
+
+SAMPLE_RATE = 16000
+
+# One Whisper window
+PACK_WINDOW_SECONDS = 30.0
+
+# Silence between clips, so the decoder ends a segment at each clip boundary
+GAP_SECONDS = 1.0
+
+# Longer clips are transcribed on their own
+MAX_CLIP_SECONDS = 10.0
+
+# A segment overlapping two clips by more than this has run across the gap
+STRADDLE_SECONDS = 0.3
+
+
+def is_packable(duration: Optional[float]) -> bool:
+    return duration is not None and 0 < duration <= MAX_CLIP_SECONDS
+
+
+def plan_packs(clips: Iterable[Tuple[str, float]]) -> List[List[str]]:
+    """Group (path, duration) clips, in order, into packs that each fit one window."""
+    packs: List[List[str]] = []
+    current: List[str] = []
+    length = 0.0
+    for path, duration in clips:
+        needed = duration + (GAP_SECONDS if current else 0.0)
+        if current and length + needed > PACK_WINDOW_SECONDS:
+            packs.append(current)
+            current, length, needed = [], 0.0, duration
+        current.append(path)
+        length += needed
+    if current:
+        packs.append(current)
+    return packs
+
+
+@dataclass
+class ClipSpan:
+    """Where one clip sits in the packed audio, in seconds."""
+    path: str
+    start: float
+    end: float
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+def pack_audio(clips: List[Tuple[str, np.ndarray]]) -> Tuple[np.ndarray, List[ClipSpan]]:
+    """Join clips with silent gaps between them."""
+    gap = np.zeros(int(GAP_SECONDS * SAMPLE_RATE), np.float32)
+    parts = []
+    spans = []
+    position = 0
+    for path, samples in clips:
+        if parts:
+            parts.append(gap)
+            position += len(gap)
+        parts.append(samples.astype(np.float32, copy=False))
+        spans.append(ClipSpan(path, position / SAMPLE_RATE, (position + len(samples)) / SAMPLE_RATE))
+        position += len(samples)
+    return np.concatenate(parts) if parts else np.zeros(0, np.float32), spans
+
+
+def split_segments(segments: Iterable[Dict[str, Any]],
+                   spans: List[ClipSpan]) -> Tuple[Dict[str, SegmentArrayBuilder], Set[str]]:
+    """
+    Give each segment of a packed transcription to the clip it overlaps,
+    with times relative to that clip. Returns the segments per clip and the
+    clips touched by a segment that crosses a gap. Segments lying entirely in
+    a gap (text made up from the silence) are dropped.
+    """
+    builders = {span.path: SegmentArrayBuilder() for span in spans}
+    straddled: Set[str] = set()
+    for segment in segments:
+        overlaps = [(min(segment['end'], span.end) - max(segment['start'], span.start), span) for span in spans]
+        touched = [span for overlap, span in overlaps if overlap > STRADDLE_SECONDS]
+        if len(touched) > 1:
+            straddled.update(span.path for span in touched)
+            continue
+        overlap, span = max(overlaps, key=lambda pair: pair[0])
+        if overlap <= 0:
+            continue
+        builders[span.path].append_segment(dict(
+            segment,
+            start=max(0.0, segment['start'] - span.start),
+            end=min(span.duration, segment['end'] - span.start),
+        ))
+    return builders, straddled
+
+
+@dataclass
+class PackResult:
+    """The outcome of transcribing one pack."""
+    results: Dict[str, Dict[str, Any]] = field(default_factory=dict)  # per clip, like transcribe()
+    failed: Dict[str, Exception] = field(default_factory=dict)        # clips that couldn't be read
+    redo: Set[str] = field(default_factory=set)                       # clips to transcribe on their own
+    audio_seconds: float = 0.0
+    windows: int = 0
+    guard_stats: Optional[Dict[str, float]] = None
+
+
+def transcribe_pack(backend, paths: List[str], cancel_event: Optional[threading.Event] = None,
+                    on_window: Optional[Callable] = None, guard_repetition: bool = False,
+                    **decode_options) -> PackResult:
+    """Load the clips, transcribe them as one packed window and split the result per clip."""
+    packed = PackResult()
+    clips = []
+    for path in paths:
+        try:
+            clips.append((path, load_audio(path, cancel_event)))
+        except Exception as e:
+            packed.failed[path] = e
+    audio, spans = pack_audio(clips)
+    packed.audio_seconds = sum(span.duration for span in spans)
+    if not spans:
+        return packed
+
+    def count_window(window, offset, result):
+        # Fallback retries report the same window again
+        packed.windows = max(packed.windows, window)
+        if on_window:
+            on_window(window, offset, result)
+
+    result = backend.transcribe(audio, cancel_event, on_window=count_window, guard_repetition=guard_repetition,
+                                **decode_options)
+    packed.guard_stats = result.get('repetition_guard')
+    packed.windows = packed.windows or 1  # Backends without window events decode at least one
+    builders, packed.redo = split_segments(result['segments'], spans)
+    for span in spans:
+        if span.path in packed.redo:
+            continue
+        segments = builders[span.path].build()
+        packed.results[span.path] = {
+            'text': segments.full_text(),
+            'segments': segments,
+            'language': result.get('language'),
+        }
+    return packed
+
+
+def empty_packing_stats() -> Dict[str, float]:
+    return {
+        'clips': 0,
+        'packs': 0,
+        'windows': 0,
+        'audio_seconds': 0.0,
+        'seconds': 0.0,
+    }
+
+
+def format_packing_stats(stats: Dict[str, float]) -> str:
+    """One line on what packing saved: windows decoded, and the speed reached."""
+    windows = max(1, stats['windows'])
+    line = (f"packed {stats['clips']} short clip(s) into {stats['packs']} shared window(s), "
+            f"decoding {windows} window(s) instead of at least {stats['clips']} "
+            f"({stats['clips'] / windows:.1f}x fewer)")
+    if stats['seconds']:
+        line += f"; {stats['audio_seconds'] / stats['seconds']:.1f}x real time"
+    return line
@@ -0,0 +1,183 @@
+"""
+Optional compiled inference engine for faster CPU transcription.
+
+The model from whisper.load_model() runs in PyTorch eager mode. accelerate()
+swaps parts of a loaded model for compiled versions:
+
+  torchscript  the audio encoder and the decoder's MLP layers are traced
+               with TorchScript and frozen; the traced modules are saved on
+               disk so later launches load them instead of tracing again.
+  compile      the same parts go through torch.compile (Inductor), with
+               Inductor's own on-disk cache kept in the same cache folder.
+
+The decoder's attention layers stay in eager mode: Whisper drives its
+key/value cache through Python forward hooks installed on those layers for
+every decode, which neither tracing nor compilation can capture.
+
+Every compiled part is checked against the eager module on a fixed input and
+only used if the outputs are bit-for-bit identical; anything that fails to
+compile or doesn't match stays eager, so transcripts never change.
+"""
+
+import hashlib
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+import torch
+from torch import nn
+
+from transcription_core import ENGINE_DESCRIPTIONS
+
+
+# Whisper's mel frames per 30 s window
+N_FRAMES = 3000
+
+
+def get_cache_dir() -> str:
+    return os.path.join(os.path.expanduser("~"), ".audio_transcriber", "compiled")
+
+
+@dataclass
+class EngineReport:
+    """What accelerate() did: which parts run compiled and what it cost."""
+    engine: str
+    parts: Dict[str, str] = field(default_factory=dict)  # part -> engine actually used
+    warmup_seconds: float = 0.0
+    from_cache: bool = False
+    notes: List[str] = field(default_factory=list)
+
+    @property
+    def compiled_parts(self) -> List[str]:
+        return [part for part, used in self.parts.items() if used != 'eager']
+
+    def summary(self) -> str:
+        if not self.compiled_parts:
+            reason = f": {self.notes[0]}" if self.notes else ""
+            return f"{self.engine} engine unavailable, using eager mode{reason}"
+        source = "loaded from cache" if self.from_cache else "compiled"
+        return (f"{self.engine} engine: {len(self.compiled_parts)} of {len(self.parts)} parts "
+                f"{source} in {self.warmup_seconds:.1f}s")
+
+
+class Accelerated(nn.Module):
+    """
+    Runs a compiled module for inputs like the ones it was built and checked
+    with, and the original eager module for anything else.
+    """
+
+    def __init__(self, compiled, eager: nn.Module, dtype: torch.dtype,
+                 shape: Optional[torch.Size] = None):
+        super().__init__()
+        self.compiled = compiled
+        self.eager = eager
+        self.dtype = dtype
+        self.shape = shape
+
+    def forward(self, x):
+        if x.dtype != self.dtype or (self.shape is not None and x.shape != self.shape):
+            return self.eager(x)
+        return self.compiled(x)
+
+
+def _cache_key(model_path: str, device: torch.device, dtype: torch.dtype) -> str:
+    stat = os.stat(model_path)
+    source = f"{os.path.basename(model_path)}:{stat.st_size}:{stat.st_mtime_ns}:{torch.__version__}:{device}:{dtype}"
+    return hashlib.sha1(source.encode()).hexdigest()[:16]
+
+
+def _identical(compiled, eager: nn.Module, example) -> bool:
+    with torch.no_grad():
+        return torch.equal(compiled(example), eager(example))
+
+
+def _trace(module: nn.Module, example, cache_path: str, report: EngineReport):
+    """Load a traced module from the cache, or trace, freeze and save it."""
+    if os.path.exists(cache_path):
+        try:
+            return torch.jit.load(cache_path, map_location=example.device), True
+        except Exception as e:
+            report.notes.append(f"ignored unreadable cache file {os.path.basename(cache_path)}: {e}")
+    with torch.no_grad():
+        traced = torch.jit.trace(module.eval(), example, check_trace=False)
+    # optimize_numerics=False: only fold weights, never rewrite arithmetic
+    traced = torch.jit.freeze(traced, optimize_numerics=False)
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    torch.jit.save(traced, temp_path)
+    os.replace(temp_path, cache_path)
+    return traced, False
+
+
+def _build(part: str, module: nn.Module, example, engine: str, cache_dir: str,
+           report: EngineReport):
+    """Compile one part and check it; returns the compiled module or None."""
+    cached = False
+    try:
+        if engine == 'torchscript':
+            cache_path = os.path.join(cache_dir, f"{part}.pt")
+            compiled, cached = _trace(module, example, cache_path, report)
+            if cached and not _identical(compiled, module, example):
+                # Stale artifact (e.g. weights replaced in place); trace again
+                os.remove(cache_path)
+                compiled, cached = _trace(module, example, cache_path, report)
+        else:
+            compiled = torch.compile(module, dynamic=True)
+        if not _identical(compiled, module, example):
+            report.notes.append(f"{part}: compiled output differs from eager mode")
+            return None
+    except Exception as e:
+        report.notes.append(f"{part}: {type(e).__name__}: {e}")
+        return None
+    report.from_cache = report.from_cache or cached
+    return compiled
+
+
+def accelerate(model, model_path: str, engine: str = 'torchscript',
+               cache_dir: Optional[str] = None) -> EngineReport:
+    """
+    Replace the encoder and decoder MLPs of a loaded Whisper model with
+    compiled versions where they reproduce eager mode exactly. The model is
+    modified in place; parts that can't be compiled are left as they are.
+    """
+    if engine not in ENGINE_DESCRIPTIONS:
+        raise ValueError(f"Unknown engine '{engine}'. Choose from {sorted(ENGINE_DESCRIPTIONS)}.")
+    report = EngineReport(engine)
+    if engine == 'eager':
+        return report
+
+    start = time.perf_counter()
+    parameter = next(model.parameters())
+    device, dtype = parameter.device, parameter.dtype
+    cache_dir = os.path.join(cache_dir or get_cache_dir(), _cache_key(model_path, device, dtype))
+    os.makedirs(cache_dir, exist_ok=True)
+    if engine == 'compile':
+        # Let Inductor reuse compiled kernels across launches
+        os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", os.path.join(cache_dir, "inductor"))
+
+    generator = torch.Generator().manual_seed(0)
+    dims = model.dims
+    mel = torch.randn(1, dims.n_mels, N_FRAMES, generator=generator).to(device, dtype)
+    hidden = torch.randn(1, 4, dims.n_text_state, generator=generator).to(device, dtype)
+
+    # The encoder always sees one padded 30 s window, so its compiled form is shape-specific
+    replacements: List[Callable[[], None]] = []
+    compiled = _build('encoder', model.encoder, mel, engine, cache_dir, report)
+    report.parts['encoder'] = engine if compiled is not None else 'eager'
+    if compiled is not None:
+        encoder = Accelerated(compiled, model.encoder, dtype, mel.shape)
+        replacements.append(lambda: setattr(model, 'encoder', encoder))
+
+    for i, block in enumerate(model.decoder.blocks):
+        part = f"decoder_mlp_{i}"
+        compiled = _build(part, block.mlp, hidden, engine, cache_dir, report)
+        report.parts[part] = engine if compiled is not None else 'eager'
+        if compiled is not None:
+            accelerated = Accelerated(compiled, block.mlp, dtype)
+            replacements.append(lambda block=block, accelerated=accelerated: setattr(block, 'mlp', accelerated))
+
+    # Swap only once everything has been built and checked against the eager model
+    for replace in replacements:
+        replace()
+    report.warmup_seconds = time.perf_counter() - start
+    return report
@@ -0,0 +1,349 @@
+"""
+Hooks into Whisper's per-window decoding.
+
+Whisper's transcribe() decodes the audio one 30 s window at a time through
+model.decode(). WindowMonitor temporarily replaces that method on a model
+instance with an equivalent that builds the DecodingTask itself, so extra
+logit filters can run at every decoder step (e.g. to check for cancellation)
+and callers are told when each window has been decoded. It can also run
+the RepetitionGuard, which cuts decoding short when a window starts looping.
+
+Where each window starts is taken from transcribe() itself: it cuts every
+window out of the file's mel spectrogram and pads it with pad_or_trim(),
+which WindowMonitor wraps to note the slice's position and length. That
+function is shared by the whole process, so one wrapper is installed while
+any monitor is active, and it reports each call to the monitor of the
+thread making it; monitors on other threads (concurrent sessions, service
+jobs) never see or undo each other's hooks.
+"""
+
+import importlib
+import threading
+import time
+from dataclasses import replace
+from typing import Any, Callable, Dict, List, Optional
+
+from audio_transcriber import TranscriptionCancelled
+from repetition_guard import (
+    RepetitionGuard, empty_guard_stats, COMPRESSION_RATIO_THRESHOLD, REASON_REPETITION
+)
+
+
+SAMPLE_RATE = 16000
+
+# Whisper's mel frames per second and seconds per timestamp token
+FRAMES_PER_SECOND = 100
+TIME_PRECISION = 0.02
+
+# Mel frames in one 30 s window
+N_FRAMES = 3000
+
+# transcribe()'s defaults for skipping a window as silence
+NO_SPEECH_THRESHOLD = 0.6
+LOGPROB_THRESHOLD = -1.0
+
+# The shared pad_or_trim wrapper: installed by the first active monitor, removed by the last
+_segment_hook_lock = threading.Lock()
+_segment_hook_users = 0
+_original_pad_or_trim = None
+_thread_monitor = threading.local()
+
+
+def _pad_or_trim_hook(array, *args, **kwargs):
+    monitor = getattr(_thread_monitor, 'monitor', None)
+    if monitor is not None:
+        monitor._take_segment(array, *args, **kwargs)
+    return _original_pad_or_trim(array, *args, **kwargs)
+
+
+def _install_segment_hook() -> bool:
+    """Wrap whisper.transcribe's pad_or_trim (once per process). Returns False if whisper lacks it."""
+    global _segment_hook_users, _original_pad_or_trim
+    try:
+        # whisper.transcribe is also the name of the function; the module is needed here
+        module = importlib.import_module('whisper.transcribe')
+    except ImportError:
+        return False
+    with _segment_hook_lock:
+        if _segment_hook_users == 0:
+            if not hasattr(module, 'pad_or_trim'):
+                return False
+            _original_pad_or_trim = module.pad_or_trim
+            module.pad_or_trim = _pad_or_trim_hook
+        _segment_hook_users += 1
+    return True
+
+
+def _remove_segment_hook():
+    global _segment_hook_users, _original_pad_or_trim
+    with _segment_hook_lock:
+        _segment_hook_users -= 1
+        if _segment_hook_users == 0:
+            importlib.import_module('whisper.transcribe').pad_or_trim = _original_pad_or_trim
+            _original_pad_or_trim = None
+
+
+class CancelCheck:
+    """Logit filter that aborts decoding as soon as the cancel event is set."""
+
+    def __init__(self, cancel_event: threading.Event, monitor: "WindowMonitor"):
+        self.cancel_event = cancel_event
+        self.monitor = monitor
+
+    def apply(self, logits, tokens):
+        if self.cancel_event.is_set():
+            raise self.monitor.cancelled()
+
+
+class WindowMonitor:
+    """
+    Context manager that instruments model.decode for one transcription.
+
+    on_window(window_index, offset_seconds, result) is called after each window,
+    where offset_seconds is where the window started in the audio. Temperature
+    fallback re-decodes the same window; those retries are not counted twice.
+    
+    With guard_repetition, looping windows are stopped early and trimmed, and
+    remembered in suspect_windows (window start -> reason). max_temperature is
+    the last fallback temperature transcribe() will try, so fallbacks avoided
+    by the guard can be counted.
+    
+    Window starts come from the mel slices transcribe() pads (see
+    _take_segment). Should that hook be unavailable, they are worked out by
+    following transcribe()'s seek rules, for which the no-speech thresholds
+    passed to transcribe() are needed.
+    """
+
+    def __init__(self, model, cancel_event: Optional[threading.Event] = None,
+                 on_window: Optional[Callable] = None, guard_repetition: bool = False,
+                 max_temperature: float = 0.0, no_speech_threshold: Optional[float] = NO_SPEECH_THRESHOLD,
+                 logprob_threshold: Optional[float] = LOGPROB_THRESHOLD):
+        self.model = model
+        self.cancel_event = cancel_event
+        self.on_window = on_window
+        self.guard_repetition = guard_repetition
+        self.max_temperature = max_temperature
+        self.no_speech_threshold = no_speech_threshold
+        self.logprob_threshold = logprob_threshold
+        self.windows = 0
+        self.decode_calls = 0
+        self.offset = 0.0
+        self.suspect_windows: Dict[float, str] = {}
+        self.guard_stats = empty_guard_stats()
+        self._guard = None
+        self._decode_seconds = 0.0
+        self._decode_steps = 0
+        self._fallback_steps_avoided = 0
+        self._window_start = 0.0
+        self._window_frames = N_FRAMES
+        self._last_mel = None
+        self._had_instance_decode = False
+        self._instance_decode = None
+        # Set while transcribe()'s pad_or_trim is wrapped; _next_window is the latest slice taken
+        self._segment_hooked = False
+        self._outer_monitor = None
+        self._next_window = None
+
+    def cancelled(self) -> TranscriptionCancelled:
+        return TranscriptionCancelled(
+            f"Cancelled at {self._window_start:.1f}s after {self.windows} windows",
+            windows_decoded=self.windows, audio_offset=self._window_start
+        )
+
+    def logit_filters(self, task) -> List:
+        """Extra filters added to every DecodingTask; override to add more."""
+        filters = []
+        if self.cancel_event is not None:
+            filters.append(CancelCheck(self.cancel_event, self))
+        if self.guard_repetition:
+            self._guard = RepetitionGuard(task)
+            filters.append(self._guard)
+        return filters
+
+    def __enter__(self):
+        self._had_instance_decode = 'decode' in vars(self.model)
+        self._instance_decode = vars(self.model).get('decode')
+        self.model.decode = self._decode
+        self._segment_hooked = _install_segment_hook()
+        if self._segment_hooked:
+            # transcribe() runs on this thread; a monitor already active here is restored on exit
+            self._outer_monitor = getattr(_thread_monitor, 'monitor', None)
+            _thread_monitor.monitor = self
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._had_instance_decode:
+            self.model.decode = self._instance_decode
+        else:
+            del self.model.decode
+        if self._segment_hooked:
+            _thread_monitor.monitor = self._outer_monitor
+            self._outer_monitor = None
+            _remove_segment_hook()
+            self._segment_hooked = False
+        return False
+
+    def _take_segment(self, array, *args, **kwargs):
+        """Note seek and size when transcribe() pads mel[:, seek:seek + size] with pad_or_trim()."""
+        self._next_window = window_position(array, args[0] if args else kwargs.get('length', N_FRAMES))
+
+    def _start_window(self, mel) -> bool:
+        """Work out which window a decode call is for. Returns True for a fallback retry."""
+        if self._segment_hooked:
+            # Each window is padded once; fallback retries decode that same segment again
+            position, self._next_window = self._next_window, None
+            if position is None:
+                return True
+            seek, frames = position
+            self._window_start = seek / FRAMES_PER_SECOND if seek is not None else self.offset
+            self._window_frames = frames
+            return False
+
+        if mel is self._last_mel:
+            return True
+        self._window_start = self.offset
+        self._window_frames = mel.shape[-1]
+        self._last_mel = mel
+        return False
+
+    def _decode(self, mel, options=None, **kwargs):
+        """Same contract as whisper.decoding.decode, with our filters installed."""
+        from whisper.decoding import DecodingOptions, DecodingTask
+
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise self.cancelled()
+
+        retry = self._start_window(mel)
+
+        options = options or DecodingOptions()
+        if kwargs:
+            options = replace(options, **kwargs)
+        single = mel.ndim == 2
+        batch = mel.unsqueeze(0) if single else mel
+
+        decode_start = time.perf_counter()
+        task = DecodingTask(self.model, options)
+        self._guard = None
+        task.logit_filters.extend(self.logit_filters(task))
+        results = task.run(batch)
+        self.decode_calls += 1
+        if self._guard is not None:
+            self._decode_seconds += time.perf_counter() - decode_start
+            self._decode_steps += self._guard.steps
+            if single:
+                # Where the audio in this window ends; the final window is mostly padding
+                window_end_token = task.tokenizer.timestamp_begin + round(
+                    self._window_frames / FRAMES_PER_SECOND / TIME_PRECISION
+                )
+                results = [self._apply_guard(self._guard, options, results[0], window_end_token)]
+
+        if not retry:
+            self.windows += 1
+        self.offset = self._window_start + self._window_advance(results[0], task.tokenizer)
+        if self.on_window:
+            self.on_window(self.windows, self._window_start, results[0])
+
+        return results[0] if single else results
+
+    def _apply_guard(self, guard: RepetitionGuard, options, result, window_end_token: int):
+        """Trim a looping result and keep count of what stopping early saved."""
+        trimmed, reason = guard.trim(result, window_end_token)
+        # A retry replaces the previous attempt at this window
+        self.suspect_windows.pop(self._window_start, None)
+        if reason:
+            self.suspect_windows[self._window_start] = reason
+        if guard.fired:
+            self.guard_stats['windows_guarded'] += 1
+            self.guard_stats['decoder_steps_saved'] += guard.steps_saved
+            # The untrimmed loop would have sent transcribe() on to the next temperature
+            if (options.temperature < self.max_temperature
+                    and result.compression_ratio > COMPRESSION_RATIO_THRESHOLD
+                    and trimmed.compression_ratio <= COMPRESSION_RATIO_THRESHOLD):
+                self.guard_stats['fallbacks_avoided'] += 1
+                self._fallback_steps_avoided += guard.sample_len
+        step_seconds = self._decode_seconds / self._decode_steps if self._decode_steps else 0.0
+        self.guard_stats['seconds_saved'] = step_seconds * (
+            self.guard_stats['decoder_steps_saved'] + self._fallback_steps_avoided
+        )
+        return trimmed
+
+    def mark_suspect_segments(self, segments: List[Dict[str, Any]], duration: Optional[float] = None):
+        """
+        Flag the segments of guarded windows with segment['suspect'] = reason.
+        For a cut-off loop only the window's last segment (the loop) is flagged.
+        """
+        for window_start, reason in self.suspect_windows.items():
+            in_window = [s for s in segments
+                         if abs(s['seek'] / FRAMES_PER_SECOND - window_start) < TIME_PRECISION]
+            for segment in (in_window[-1:] if reason == REASON_REPETITION else in_window):
+                segment['suspect'] = reason
+                if duration is not None:
+                    # The loop is closed at the window edge, which may be past the end of the audio
+                    segment['end'] = min(segment['end'], duration)
+
+    def _is_skipped(self, result) -> bool:
+        """Whether transcribe() drops this window as silence and moves on by the whole window."""
+        if self.no_speech_threshold is None or result.no_speech_prob <= self.no_speech_threshold:
+            return False
+        return self.logprob_threshold is None or result.avg_logprob <= self.logprob_threshold
+
+    def _window_advance(self, result, tokenizer) -> float:
+        """
+        How far Whisper will seek after this window, mirroring transcribe(). Only
+        used to place the next window when its real position isn't known.
+        """
+        window_seconds = self._window_frames / FRAMES_PER_SECOND
+        if self._is_skipped(result):
+            return window_seconds
+        tokens = result.tokens
+        is_timestamp = [t >= tokenizer.timestamp_begin for t in tokens]
+        single_timestamp_ending = is_timestamp[-2:] == [False, True]
+        last_pair = None
+        for i in range(len(tokens) - 1):
+            if is_timestamp[i] and is_timestamp[i + 1]:
+                last_pair = i
+        if last_pair is not None and not single_timestamp_ending:
+            return (tokens[last_pair] - tokenizer.timestamp_begin) * TIME_PRECISION
+        return window_seconds
+
+
+def window_position(segment, length: int = N_FRAMES):
+    """
+    (seek, frames) of a mel slice taken by transcribe(): seek is the first mel
+    frame (None if it can't be told) and frames the audio frames in the window.
+    The file's mel is a fresh contiguous (n_mels, frames) tensor, so a column
+    slice of it starts seek elements into its storage.
+    """
+    frames = min(segment.shape[-1], length)
+    if segment.dim() != 2 or segment.stride(-1) != 1:
+        return None, frames
+    return segment.storage_offset(), frames
+
+
+def transcribe_cancellable(model, audio, cancel_event: Optional[threading.Event],
+                           on_window: Optional[Callable] = None, guard_repetition: bool = False,
+                           **decode_options):
+    """
+    model.transcribe() that stops within one decoder step of cancel_event being
+    set, killing ffmpeg if the file is still being decoded. audio may be a path
+    or an array of 16 kHz samples. Raises TranscriptionCancelled.
+    
+    With guard_repetition, runaway repetition is cut off while decoding; the
+    affected segments get a 'suspect' key and result['repetition_guard']
+    holds the counts of what that saved.
+    """
+    if isinstance(audio, str):
+        from audio_io import load_audio
+        audio = load_audio(audio, cancel_event)
+    
+    temperature = decode_options.get('temperature', (0.0, 0.2, 0.4, 0.6, 0.8, 1.0))
+    max_temperature = max(temperature) if isinstance(temperature, (list, tuple)) else temperature
+    with WindowMonitor(model, cancel_event, on_window, guard_repetition, max_temperature,
+                       decode_options.get('no_speech_threshold', NO_SPEECH_THRESHOLD),
+                       decode_options.get('logprob_threshold', LOGPROB_THRESHOLD)) as monitor:
+        result = model.transcribe(audio, **decode_options)
+    
+    if guard_repetition:
+        monitor.mark_suspect_segments(result['segments'], len(audio) / SAMPLE_RATE)
+        result['repetition_guard'] = dict(monitor.guard_stats)
+    return result
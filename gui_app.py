@@ -6,14 +6,31 @@ A warm, friendly interface designed for non-technical users.
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
 import threading
+import queue
 import os
 import sys
+from collections import deque
 from pathlib import Path
 from transcription_core import (
-    TranscriptionSession, find_media_files, get_search_directory,
+    find_media_files, get_search_directory,
     WHISPER_MODELS, get_model_info, is_media_file,
-    get_transcription_output_dir
+    get_transcription_output_dir, DECODING_PROFILES,
+    DEFAULT_DECODING_PROFILE, get_profile_info
 )
+from progress_events import WindowDecoded
+from repetition_guard import merge_guard_stats, format_guard_stats
+from clip_packing import empty_packing_stats, format_packing_stats
+from transcription_daemon import open_session, DAEMON_SUPPORTED
+from throughput_stats import plan_files
+
+# How often (ms) the GUI drains queued progress messages from the worker thread
+PROGRESS_POLL_MS = 100
+
+# Maximum number of messages handled per drain, so a flood can't stall the UI
+PROGRESS_BATCH_SIZE = 500
+
+# Number of lines kept in the status log before the oldest are dropped
+MAX_STATUS_LINES = 1000
 
 
 class AudioTranscriberGUI:
@@ -32,13 +49,23 @@ class AudioTranscriberGUI:
         # Variables
         self.selected_files = []
         self.transcription_session = None
+        self.cancel_requested = False
         self.is_transcribing = False
         
+        # Progress messages are queued by the worker thread and drawn in batches
+        self.progress_queue = queue.Queue()
+        self.status_lines = deque(maxlen=MAX_STATUS_LINES)
+        # Latest transient update per kind (ETA, current window), shown on one line
+        self.transient_status = {}
+        
         # Create GUI
         self.create_widgets()
         
         # Start with welcome screen
         self.show_welcome_screen()
+        
+        # Start draining progress messages on a fixed timer
+        self.root.after(PROGRESS_POLL_MS, self._drain_progress_queue)
     
     def center_window(self):
         """Center the window on screen."""
@@ -148,6 +175,64 @@ class AudioTranscriberGUI:
                 value=model
             ).pack(anchor=tk.W, pady=2)
         
+        # Decoding profile selection
+        profile_row = ttk.Frame(model_frame)
+        profile_row.pack(anchor=tk.W, pady=(8, 0))
+        ttk.Label(profile_row, text="Speed vs. accuracy:").pack(side=tk.LEFT, padx=(0, 10))
+        
+        self.profile_var = tk.StringVar(value=DEFAULT_DECODING_PROFILE)
+        profile_info = get_profile_info()
+        for profile in DECODING_PROFILES:
+            ttk.Radiobutton(
+                profile_row,
+                text=profile.title(),
+                variable=self.profile_var,
+                value=profile
+            ).pack(side=tk.LEFT, padx=(0, 10))
+        
+        self.profile_desc_var = tk.StringVar(value=profile_info[DEFAULT_DECODING_PROFILE])
+        self.profile_var.trace_add(
+            'write', lambda *_: self.profile_desc_var.set(profile_info[self.profile_var.get()])
+        )
+        ttk.Label(model_frame, textvariable=self.profile_desc_var, foreground="#666666").pack(anchor=tk.W)
+        
+        self.split_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            model_frame,
+            text="Speed up long recordings by splitting them across all CPU cores",
+            variable=self.split_var
+        ).pack(anchor=tk.W, pady=(8, 0))
+        
+        self.pack_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            model_frame,
+            text="Speed up many short voice notes by transcribing several at once",
+            variable=self.pack_var
+        ).pack(anchor=tk.W)
+        
+        self.multichannel_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            model_frame,
+            text="Transcribe each channel separately (one speaker per channel), labelled by channel",
+            variable=self.multichannel_var
+        ).pack(anchor=tk.W)
+        
+        # A running background service is used either way; this starts one if needed
+        self.daemon_var = tk.BooleanVar(value=False)
+        if DAEMON_SUPPORTED:
+            ttk.Checkbutton(
+                model_frame,
+                text="Keep the model loaded in the background so the next start is instant",
+                variable=self.daemon_var
+            ).pack(anchor=tk.W)
+        
+        self.profile_files_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            model_frame,
+            text="Profile each file to find out why transcription is slow (saved in 'profiles')",
+            variable=self.profile_files_var
+        ).pack(anchor=tk.W)
+        
         # File selection frame
         file_frame = ttk.LabelFrame(self.app_frame, text="Step 2: Select Audio/Video Files", padding="15")
         file_frame.pack(fill=tk.BOTH, expand=True, pady=(0, 15))
@@ -218,7 +303,16 @@ class AudioTranscriberGUI:
             mode='indeterminate',
             length=400
         )
-        self.progress_bar.pack(pady=(0, 20))
+        self.progress_bar.pack(pady=(0, 10))
+        
+        # Latest ETA and window progress (only the most recent of each is shown)
+        self.segment_status_var = tk.StringVar(value="")
+        ttk.Label(
+            self.progress_frame,
+            textvariable=self.segment_status_var,
+            font=("Courier", 10),
+            foreground="#666666"
+        ).pack(pady=(0, 10))
         
         # Status text
         self.status_text = scrolledtext.ScrolledText(
@@ -338,21 +432,60 @@ class AudioTranscriberGUI:
             messagebox.showwarning("No Files", "Please select some audio/video files first.")
             return
         
-        # Confirm start
+        # Tk variables are read here; the files are probed and the session created on worker threads
         model_name = self.model_var.get()
+        session_options = dict(
+            start_daemon_if_needed=self.daemon_var.get(),
+            decoding_profile=self.profile_var.get(),
+            split_long_files=self.split_var.get(),
+            profile=self.profile_files_var.get(),
+            pack_short_clips=self.pack_var.get(),
+            multichannel=self.multichannel_var.get()
+        )
+        
+        # Estimate how long the run will take; probing every file would freeze the window
+        self.start_button.config(state=tk.DISABLED)
+        self.root.config(cursor="watch")
+        threading.Thread(target=self._plan_in_background,
+                         args=(model_name, list(self.selected_files), session_options), daemon=True).start()
+    
+    def _plan_in_background(self, model_name, files, session_options):
+        """Probe the files for the plan, then ask for confirmation on the Tk main loop."""
+        try:
+            plan, error = plan_files(model_name, files), None
+        except Exception as e:
+            plan, error = None, e
+        try:
+            self.root.after_idle(lambda: self._confirm_start(model_name, files, session_options, plan, error))
+        except (tk.TclError, RuntimeError):
+            pass  # The window was closed while the files were being probed
+    
+    def _confirm_start(self, model_name, files, session_options, plan, error):
+        """Show the plan and start the transcription if the user confirms (runs on the Tk main loop)."""
+        self.root.config(cursor="")
+        self.start_button.config(state=tk.NORMAL)
+        if error is not None:
+            messagebox.showerror("Error", f"Could not check the selected files: {error}")
+            return
+        
+        # Confirm start
         result = messagebox.askyesno(
             "Start Transcription",
-            f"Ready to transcribe {len(self.selected_files)} files using the '{model_name}' model.\n\nThis may take several minutes depending on file length.\n\nProceed?"
+            f"Ready to transcribe {len(files)} files using the '{model_name}' model.\n\n"
+            f"Planned: {plan.plan_summary()}.\n\nProceed?"
         )
         
         if not result:
             return
         
+        self.transcription_session = None
+        self.cancel_requested = False
+        
         # Show progress screen
         self.show_progress_screen()
         
         # Clear status text
-        self.status_text.delete(1.0, tk.END)
+        self._clear_status()
         
         # Start progress bar
         self.progress_bar.start(10)
@@ -363,15 +496,24 @@ class AudioTranscriberGUI:
         self.back_button.config(state=tk.DISABLED)
         
         # Start transcription in background thread
-        self.transcription_thread = threading.Thread(target=self.run_transcription)
+        self.transcription_thread = threading.Thread(target=self.run_transcription,
+                                                     args=(model_name, files, session_options, plan.durations))
         self.transcription_thread.daemon = True
         self.transcription_thread.start()
     
-    def run_transcription(self):
+    def run_transcription(self, model_name, files, session_options, durations):
         """Run transcription in background thread."""
+        session = None
         try:
-            model_name = self.model_var.get()
-            self.transcription_session = TranscriptionSession(model_name, self.update_progress)
+            # Opening the session may start the background service, so it happens here
+            # rather than on the Tk main loop; the files were already probed for the plan
+            session = open_session(model_name, **session_options)
+            session.events.subscribe(self.on_progress_event)
+            self.transcription_session = session
+            if self.cancel_requested:
+                session.cancel()  # Cancel was pressed before the session existed
+            plan = session.plan(files, durations)
+            self.update_progress(f"Planned: {plan.plan_summary()}")
             
             # Load model
             if not self.transcription_session.load_model():
@@ -380,7 +522,7 @@ class AudioTranscriberGUI:
             
             # Prepare file list and directories
             files_by_dir = {}
-            for file_path in self.selected_files:
+            for file_path in files:
                 dir_path = os.path.dirname(file_path)
                 filename = os.path.basename(file_path)
                 if dir_path not in files_by_dir:
@@ -389,7 +531,7 @@ class AudioTranscriberGUI:
             
             # Transcribe files by directory
             total_results = {
-                'total_files': len(self.selected_files),
+                'total_files': len(files),
                 'completed_files': 0,
                 'failed_files': 0,
                 'errors': []
@@ -403,25 +545,96 @@ class AudioTranscriberGUI:
                 total_results['completed_files'] += results['completed_files']
                 total_results['failed_files'] += results['failed_files']
                 total_results['errors'].extend(results['errors'])
+                total_results.setdefault('cancelled', []).extend(results.get('cancelled', []))
+                total_results.setdefault('profiles', {}).update(results.get('profiles', {}))
+                if 'packing' in results:
+                    packing = total_results.setdefault('packing', empty_packing_stats())
+                    for key, value in results['packing'].items():
+                        packing[key] += value
+                if 'repetition_guard' in results:
+                    total_results['repetition_guard'] = merge_guard_stats(
+                        total_results.get('repetition_guard'), results['repetition_guard']
+                    )
             
-            self.transcription_finished(success=True, results=total_results)
+            if self.transcription_session.is_cancelled:
+                self.transcription_finished(success=False, results=total_results)
+            else:
+                self.transcription_finished(success=True, results=total_results)
             
         except Exception as e:
             self.transcription_finished(success=False, error=str(e))
+        finally:
+            if session is not None:
+                session.close()
     
     def update_progress(self, message):
-        """Update progress display (called from background thread)."""
-        # Use after_idle to safely update GUI from thread
-        self.root.after_idle(lambda: self._update_progress_safe(message))
+        """Queue a log message for display (safe to call from any thread)."""
+        self.progress_queue.put((None, message))
+    
+    def update_segment_progress(self, message, key="eta"):
+        """Queue a transient update; only the latest one of each key is drawn."""
+        self.progress_queue.put((key, message))
     
-    def _update_progress_safe(self, message):
-        """Thread-safe progress update."""
-        self.status_text.insert(tk.END, f"{message}\n")
+    def on_progress_event(self, event):
+        """Route a session progress event to the log or the status line (runs on the event thread)."""
+        message = event.message()
+        if message is None:
+            return
+        if event.transient:
+            self.update_segment_progress(message, key="window" if isinstance(event, WindowDecoded) else "eta")
+        else:
+            self.update_progress(message)
+    
+    def _drain_progress_queue(self):
+        """Draw queued progress messages in one batch (runs on the Tk main loop)."""
+        new_lines = []
+        transient_changed = False
+        try:
+            for _ in range(PROGRESS_BATCH_SIZE):
+                key, message = self.progress_queue.get_nowait()
+                if key is None:
+                    new_lines.extend(str(message).split("\n"))
+                else:
+                    self.transient_status[key] = message
+                    transient_changed = True
+        except queue.Empty:
+            pass
+        
+        if new_lines:
+            self._append_status_lines(new_lines)
+        if transient_changed and self.is_transcribing:
+            self.segment_status_var.set("   |   ".join(self.transient_status.values()))
+        
+        self.root.after(PROGRESS_POLL_MS, self._drain_progress_queue)
+    
+    def _append_status_lines(self, lines):
+        """Append lines to the status log, keeping at most MAX_STATUS_LINES."""
+        self.status_lines.extend(lines)
+        self.status_text.insert(tk.END, "\n".join(lines) + "\n")
+        
+        # Drop the oldest lines from the widget so it mirrors the ring buffer
+        line_count = int(self.status_text.index('end-1c').split('.')[0]) - 1
+        excess = line_count - len(self.status_lines)
+        if excess > 0:
+            self.status_text.delete(1.0, f"{excess + 1}.0")
+        
         self.status_text.see(tk.END)
-        self.root.update_idletasks()
+    
+    def _clear_status(self):
+        """Clear the status log, the ring buffer and any pending messages."""
+        try:
+            while True:
+                self.progress_queue.get_nowait()
+        except queue.Empty:
+            pass
+        self.status_lines.clear()
+        self.status_text.delete(1.0, tk.END)
+        self.transient_status.clear()
+        self.segment_status_var.set("")
     
     def cancel_transcription(self):
         """Cancel the ongoing transcription."""
+        self.cancel_requested = True
         if self.transcription_session:
             self.transcription_session.cancel()
         
@@ -430,12 +643,18 @@ class AudioTranscriberGUI:
     
     def transcription_finished(self, success=True, results=None, error=None):
         """Handle transcription completion (called from background thread)."""
-        self.root.after_idle(lambda: self._transcription_finished_safe(success, results, error))
+        try:
+            self.root.after_idle(lambda: self._transcription_finished_safe(success, results, error))
+        except (tk.TclError, RuntimeError):
+            pass  # The window was closed while the worker was stopping
+
     
     def _transcription_finished_safe(self, success, results, error):
         """Thread-safe transcription completion handler."""
         # Stop progress bar
         self.progress_bar.stop()
+        self.transient_status.clear()
+        self.segment_status_var.set("")
         
         # Update UI state
         self.is_transcribing = False
@@ -449,7 +668,16 @@ class AudioTranscriberGUI:
             self.update_progress(f"Total files: {results['total_files']}")
             self.update_progress(f"Completed successfully: {results['completed_files']}")
             self.update_progress(f"Failed: {results['failed_files']}")
-            
+            guard_stats = results.get('repetition_guard')
+            if guard_stats and guard_stats['windows_guarded']:
+                self.update_progress(f"Repetition guard: {format_guard_stats(guard_stats)}")
+            if results.get('packing', {}).get('windows'):
+                self.update_progress(f"Clip packing: {format_packing_stats(results['packing'])}")
+            if results.get('profiles'):
+                self.update_progress("\nProfile summaries (stage times and hot spots):")
+                for summary_file in results['profiles'].values():
+                    self.update_progress(f"  {summary_file}")
+
             if results['errors']:
                 self.update_progress("\nErrors:")
                 for error in results['errors']:
@@ -478,6 +706,12 @@ class AudioTranscriberGUI:
         else:
             # Cancelled
             self.update_progress("\n🚫 Transcription cancelled by user")
+            if results:
+                self.update_progress(f"Completed before cancelling: {results['completed_files']}")
+                for partial in results.get('cancelled', []):
+                    self.update_progress(
+                        f"Stopped {partial['file']} at about {partial['audio_offset']:.0f}s of audio"
+                    )
             messagebox.showinfo("Cancelled", "Transcription was cancelled.")
 
 
@@ -489,12 +723,16 @@ def main():
     # Handle window close
     def on_closing():
         if app.is_transcribing:
-            if messagebox.askokcancel("Quit", "Transcription is in progress. Do you want to cancel and quit?"):
-                if app.transcription_session:
-                    app.transcription_session.cancel()
-                root.quit()
-        else:
-            root.quit()
+            if not messagebox.askokcancel("Quit", "Transcription is in progress. Do you want to cancel and quit?"):
+                return
+            app.cancel_requested = True
+            if app.transcription_session:
+                app.transcription_session.cancel()
+            # Give the worker a moment to stop decoding and kill ffmpeg/worker processes
+            app.transcription_thread.join(timeout=3)
+        if app.transcription_session:
+            app.transcription_session.close()
+        root.destroy()
     
     root.protocol("WM_DELETE_WINDOW", on_closing)
     
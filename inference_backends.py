@@ -0,0 +1,342 @@
+"""
+Inference backends: what actually turns audio into timed text.
+
+TranscriptionSession and the worker processes only talk to an
+InferenceBackend, so other runtimes (CTranslate2, ONNX Runtime, ...) can be
+tried without touching the pipeline. Two backends are built in:
+
+  whisper  OpenAI Whisper on PyTorch, using the bundled models (default)
+  stub     deterministic stand-in that needs no model weights, for testing
+           and benchmarking everything around the model
+
+Other packages can add backends by declaring an entry point in the
+"audio_transcriber.backends" group that points at an InferenceBackend
+subclass, e.g. in their pyproject.toml:
+
+  [project.entry-points."audio_transcriber.backends"]
+  ct2 = "my_package.backend:CTranslate2Backend"
+"""
+
+import os
+import sys
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from audio_transcriber import TranscriptionCancelled
+
+
+ENTRY_POINT_GROUP = "audio_transcriber.backends"
+
+DEFAULT_BACKEND = 'whisper'
+
+SAMPLE_RATE = 16000
+
+# Audio decoded per step, as in Whisper's transcribe()
+WINDOW_SECONDS = 30
+
+# (backend name, model name, options): enough to build the same backend in a worker process
+BackendSpec = Tuple[str, str, Dict[str, Any]]
+
+
+@dataclass(frozen=True)
+class BackendCapabilities:
+    """
+    What a backend supports beyond plain transcription. The pipeline only
+    passes a backend the hooks it supports (see transcribe_audio()).
+    """
+    cancellable: bool = False         # stops mid-file once cancel_event is set
+    window_events: bool = False       # calls on_window after each decoded window
+    repetition_guard: bool = False    # honours guard_repetition
+    engines: Tuple[str, ...] = ('eager',)
+    needs_weights: bool = True        # holds a loaded model (counted against the memory budget)
+    torch_ops: bool = False           # runs PyTorch operators (so a torch profiler trace is useful)
+
+
+class InferenceBackend:
+    """
+    Base class for backends. Subclasses set name and implement load() and
+    transcribe(); the constructor only records settings, so it is cheap and
+    can run again in each worker process (see spec()).
+    """
+    name = ''
+    description = ''
+
+    def __init__(self, model_name: str, engine: str = 'eager', **options):
+        if engine not in self.capabilities().engines:
+            raise ValueError(f"The {self.name} backend has no '{engine}' engine. "
+                             f"Choose from {sorted(self.capabilities().engines)}.")
+        self.model_name = model_name
+        self.engine = engine
+        self.options = options
+        # Set by load(); the runtime's own model object, if it has one
+        self.model = None
+
+    def capabilities(self) -> BackendCapabilities:
+        return BackendCapabilities()
+
+    def spec(self) -> BackendSpec:
+        """Arguments for create_backend() that rebuild this backend elsewhere."""
+        return self.name, self.model_name, dict(self.options, engine=self.engine)
+
+    def load(self):
+        """Load the model. Raises if the runtime or the weights are missing."""
+        raise NotImplementedError
+
+    def set_threads(self, threads: int):
+        """Limit the CPU threads one transcription uses (called in worker processes)."""
+
+    def profile_stages(self) -> Dict[str, List[Callable]]:
+        """Functions whose cumulative time makes up each stage of a profile (see profiling.py)."""
+        from audio_io import load_audio
+        return {'audio decoding': [load_audio]}
+
+    def transcribe(self, audio, cancel_event: Optional[threading.Event] = None,
+                   on_window: Optional[Callable] = None, guard_repetition: bool = False,
+                   **decode_options) -> Dict[str, Any]:
+        """
+        Transcribe a file path or an array of 16 kHz float32 samples window by
+        window, the way model.transcribe() does. Returns a dict with 'text',
+        'segments' (each with 'start', 'end' and 'text') and 'language'.
+
+        on_window(window_index, offset_seconds, result) is called after each
+        window, where result.text is the window's text. Setting cancel_event
+        raises TranscriptionCancelled. Options a backend doesn't know are ignored.
+        """
+        raise NotImplementedError
+
+
+class WhisperBackend(InferenceBackend):
+    """OpenAI Whisper with the models bundled in the app's 'models' folder."""
+    name = 'whisper'
+    description = 'OpenAI Whisper on PyTorch (bundled models)'
+
+    def __init__(self, model_name: str, engine: str = 'eager', **options):
+        super().__init__(model_name, engine, **options)
+        self.model_path = None
+        self.engine_report = None
+
+    @classmethod
+    def from_model(cls, model, model_path: Optional[str] = None) -> "WhisperBackend":
+        """Wrap an already loaded Whisper model."""
+        backend = cls(os.path.splitext(os.path.basename(model_path))[0] if model_path else 'custom')
+        backend.model = model
+        backend.model_path = model_path
+        return backend
+
+    def capabilities(self) -> BackendCapabilities:
+        from transcription_core import ENGINE_DESCRIPTIONS
+        return BackendCapabilities(cancellable=True, window_events=True, repetition_guard=True,
+                                   engines=tuple(ENGINE_DESCRIPTIONS), torch_ops=True)
+
+    @staticmethod
+    def bundled_model_path(model_name: str) -> str:
+        if getattr(sys, 'frozen', False):  # Running as a PyInstaller bundle
+            base_path = sys._MEIPASS
+        else:  # Running as a script
+            base_path = os.path.dirname(os.path.abspath(__file__))
+        return os.path.join(base_path, "models", f"{model_name}.pt")
+
+    def load(self):
+        try:
+            import whisper
+        except ImportError:
+            raise ImportError("Whisper not installed. Please install openai-whisper.")
+
+        model_path = self.bundled_model_path(self.model_name)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Model '{self.model_name}' not found in bundled models directory.")
+        self.model = whisper.load_model(model_path)
+        self.model_path = model_path
+
+        if self.engine != 'eager':
+            # In worker processes the parent has usually filled the on-disk cache already
+            from compiled_engine import accelerate
+            self.engine_report = accelerate(self.model, model_path, self.engine)
+
+    def set_threads(self, threads: int):
+        import torch
+        torch.set_num_threads(threads)
+
+    def profile_stages(self) -> Dict[str, List[Callable]]:
+        import whisper.audio
+        stages = super().profile_stages()
+        # model.transcribe() reads a file path itself through ffmpeg
+        stages['audio decoding'].append(whisper.audio.load_audio)
+        stages['mel spectrogram'] = [whisper.audio.log_mel_spectrogram]
+        stages['encoder'] = [type(self.model.encoder).forward]
+        stages['decoder'] = [type(self.model.decoder).forward]
+        return stages
+
+    def transcribe(self, audio, cancel_event: Optional[threading.Event] = None,
+                   on_window: Optional[Callable] = None, guard_repetition: bool = False,
+                   **decode_options) -> Dict[str, Any]:
+        if cancel_event is None and on_window is None and not guard_repetition:
+            return self.model.transcribe(audio, **decode_options)
+        from decode_hooks import transcribe_cancellable
+        return transcribe_cancellable(self.model, audio, cancel_event, on_window=on_window,
+                                      guard_repetition=guard_repetition, **decode_options)
+
+
+# Stub output: one segment per stretch of sound (at most 5 s), worded from its samples
+STUB_SEGMENT_SECONDS = 5.0
+STUB_FRAME_SECONDS = 0.1
+STUB_SILENCE_RMS = 0.01
+STUB_WORDS = (
+    "alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel",
+    "india", "juliett", "kilo", "lima", "mike", "november", "oscar", "papa",
+)
+
+
+class StubBackend(InferenceBackend):
+    """
+    Deterministic stand-in that needs no model weights. Every stretch of
+    sound between pauses, cut into pieces of at most 5 s, becomes one segment
+    whose words are derived from the samples, so the same audio always gives
+    the same transcript. The
+    seconds_per_window option adds a fixed delay per 30 s window to stand in
+    for model compute when benchmarking the pipeline.
+    """
+    name = 'stub'
+    description = 'Deterministic fake transcripts without model weights (testing, benchmarks)'
+
+    def __init__(self, model_name: str = 'stub', engine: str = 'eager', seconds_per_window: float = 0.0,
+                 **options):
+        super().__init__(model_name, engine, seconds_per_window=seconds_per_window, **options)
+        self.seconds_per_window = seconds_per_window
+
+    def capabilities(self) -> BackendCapabilities:
+        return BackendCapabilities(cancellable=True, window_events=True, needs_weights=False)
+
+    def load(self):
+        pass
+
+    def profile_stages(self) -> Dict[str, List[Callable]]:
+        stages = super().profile_stages()
+        stages['fake model'] = [StubBackend._words]
+        return stages
+
+    @staticmethod
+    def _words(samples: np.ndarray) -> str:
+        checksum = zlib.crc32(np.round(samples * 1000).astype(np.int16).tobytes())
+        return " ".join(STUB_WORDS[(checksum >> (4 * i)) % len(STUB_WORDS)] for i in range(4))
+
+    @staticmethod
+    def _sounding_stretches(audio: np.ndarray) -> List[Tuple[int, int]]:
+        """(start, end) sample ranges of sound between pauses, each at most STUB_SEGMENT_SECONDS long."""
+        frame = int(STUB_FRAME_SECONDS * SAMPLE_RATE)
+        n_frames = -(-len(audio) // frame)
+        frames = np.pad(audio, (0, n_frames * frame - len(audio))).reshape(n_frames, frame)
+        loud = np.sqrt(np.mean(np.square(frames), axis=1)) >= STUB_SILENCE_RMS
+        longest = int(STUB_SEGMENT_SECONDS / STUB_FRAME_SECONDS)
+        stretches = []
+        start = None
+        for i, is_loud in enumerate(np.append(loud, False).tolist()):
+            if is_loud and start is None:
+                start = i
+            elif start is not None and (not is_loud or i - start == longest):
+                stretches.append((start * frame, min(i * frame, len(audio))))
+                start = i if is_loud else None
+        return stretches
+
+    def _windows(self, audio, cancel_event: Optional[threading.Event], on_window: Optional[Callable]):
+        """Yield (window_index, segments) per 30 s window."""
+        if isinstance(audio, str):
+            from audio_io import load_audio
+            audio = load_audio(audio, cancel_event)
+        window = int(WINDOW_SECONDS * SAMPLE_RATE)
+        for index, window_start in enumerate(range(0, len(audio), window)):
+            offset = window_start / SAMPLE_RATE
+            if cancel_event is not None and cancel_event.is_set():
+                raise TranscriptionCancelled(f"Cancelled at {offset:.1f}s after {index} windows",
+                                             windows_decoded=index, audio_offset=offset)
+            if self.seconds_per_window:
+                time.sleep(self.seconds_per_window)
+
+            segments = []
+            for start, end in self._sounding_stretches(audio[window_start:window_start + window]):
+                segments.append({
+                    'start': (window_start + start) / SAMPLE_RATE,
+                    'end': (window_start + end) / SAMPLE_RATE,
+                    'text': f" {self._words(audio[window_start + start:window_start + end]).capitalize()}.",
+                })
+            if on_window:
+                on_window(index + 1, offset, SimpleNamespace(text="".join(s['text'] for s in segments)))
+            yield index, segments
+
+    def transcribe(self, audio, cancel_event: Optional[threading.Event] = None,
+                   on_window: Optional[Callable] = None, guard_repetition: bool = False,
+                   **decode_options) -> Dict[str, Any]:
+        segments = []
+        for _, window_segments in self._windows(audio, cancel_event, on_window):
+            segments.extend(window_segments)
+        for i, segment in enumerate(segments):
+            segment['id'] = i
+        return {
+            'text': "".join(s['text'] for s in segments),
+            'segments': segments,
+            'language': decode_options.get('language') or 'en',
+        }
+
+
+_BACKENDS: Dict[str, Any] = {}
+_discovered = False
+
+
+def register_backend(backend_class):
+    """Make a backend available by name; usable as a class decorator."""
+    _BACKENDS[backend_class.name] = backend_class
+    return backend_class
+
+
+register_backend(WhisperBackend)
+register_backend(StubBackend)
+
+
+def _discover():
+    """Add backends declared by installed packages; they are imported when first used."""
+    global _discovered
+    if _discovered:
+        return
+    _discovered = True
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:
+        return
+    found = entry_points()
+    if hasattr(found, 'select'):
+        found = found.select(group=ENTRY_POINT_GROUP)
+    else:  # Python < 3.10
+        found = found.get(ENTRY_POINT_GROUP, [])
+    for entry_point in found:
+        # Built-in backends keep their names
+        _BACKENDS.setdefault(entry_point.name, entry_point)
+
+
+def available_backends() -> Dict[str, str]:
+    """Backend names and descriptions, including those installed by other packages."""
+    _discover()
+    return {name: getattr(backend, 'description', '') or f"from {backend.value}"
+            for name, backend in _BACKENDS.items()}
+
+
+def get_backend_class(name: str):
+    _discover()
+    if name not in _BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}'. Choose from {sorted(_BACKENDS)}.")
+    backend = _BACKENDS[name]
+    if not isinstance(backend, type):
+        backend = _BACKENDS[name] = backend.load()
+        if not issubclass(backend, InferenceBackend):
+            raise TypeError(f"Entry point '{name}' does not point at an InferenceBackend subclass")
+    return backend
+
+
+def create_backend(name: str, model_name: str, **options) -> InferenceBackend:
+    """Build a backend by name. Call load() on it before transcribing."""
+    return get_backend_class(name)(model_name, **options)
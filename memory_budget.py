@@ -0,0 +1,194 @@
+"""
+Memory-budget admission control for concurrent transcriptions.
+
+Each job's peak memory is estimated from the model size and the audio
+duration. Jobs are only started while the estimates of everything running
+fit in the configured RAM budget; the rest wait their turn. Measured peak
+RSS of finished jobs is fed back to correct the estimates for later jobs.
+"""
+
+import os
+import sys
+import threading
+from typing import Dict, Optional
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+
+# Resident size of a loaded model in its own process (weights plus torch runtime)
+MODEL_MEMORY_MB = {
+    'tiny': 350,
+    'base': 500,
+    'small': 1200
+}
+
+# Decoder activations and buffers while a file is being transcribed
+DECODE_WORKING_MB = {
+    'tiny': 150,
+    'base': 250,
+    'small': 500
+}
+
+# Decoded samples, STFT and mel spectrogram of the whole file (~1.2 GB per hour)
+AUDIO_MB_PER_SECOND = 0.35
+
+# Fraction of physical RAM used when no budget is configured
+DEFAULT_BUDGET_FRACTION = 0.7
+
+# Weight given to the newest measurement when refining the estimates
+ESTIMATE_SMOOTHING = 0.3
+
+
+def total_memory_mb() -> Optional[float]:
+    """Physical RAM of this machine in MB, or None if it can't be determined."""
+    if PSUTIL_AVAILABLE:
+        return psutil.virtual_memory().total / (1024 * 1024)
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') / (1024 * 1024)
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def current_rss_mb(pid: Optional[int] = None) -> Optional[float]:
+    """Resident set size of a process (default: this one) in MB."""
+    pid = pid or os.getpid()
+    if PSUTIL_AVAILABLE:
+        try:
+            return psutil.Process(pid).memory_info().rss / (1024 * 1024)
+        except psutil.Error:
+            return None
+    try:
+        with open(f"/proc/{pid}/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        pass
+    if pid == os.getpid():
+        import resource
+        # Lifetime peak rather than current RSS; KB on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    return None
+
+
+class PeakRSSSampler:
+    """
+    Samples a process's RSS in the background and remembers the peak.
+
+    growth_mb is measured from baseline_mb, which defaults to the RSS when
+    sampling starts. A process that is reused for job after job should pass
+    its RSS from just after the model loaded: the allocator keeps memory
+    from earlier jobs, so growth from the start of a later job would be far
+    below what the job really uses.
+    """
+
+    def __init__(self, pid: Optional[int] = None, interval: float = 0.2, baseline_mb: Optional[float] = None):
+        self.pid = pid or os.getpid()
+        self.interval = interval
+        self.baseline_mb = baseline_mb
+        self.peak_mb = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        rss = current_rss_mb(self.pid)
+        if rss is not None and (self.peak_mb is None or rss > self.peak_mb):
+            self.peak_mb = rss
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        if self.baseline_mb is None:
+            self.baseline_mb = current_rss_mb(self.pid)
+        self._sample()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        return False
+
+    @property
+    def growth_mb(self) -> Optional[float]:
+        """How far the peak RSS rose above the baseline."""
+        if self.peak_mb is None or self.baseline_mb is None:
+            return None
+        return max(0.0, self.peak_mb - self.baseline_mb)
+
+
+class MemoryAdmissionController:
+    """Admits jobs only while their estimated peak memory fits the budget."""
+
+    def __init__(self, model_name: str, budget_mb: Optional[float] = None, model_mb: Optional[float] = None):
+        self.model_name = model_name
+        # Memory each worker's model takes; 0 for a backend that loads no weights
+        self._model_mb = model_mb
+        total = total_memory_mb()
+        if budget_mb is None:
+            budget_mb = total * DEFAULT_BUDGET_FRACTION if total else 4096
+        self.budget_mb = budget_mb
+        self.reserved_mb = 0.0
+        self.running: Dict[str, float] = {}
+        # Ratio of measured to estimated job memory, refined as jobs finish
+        self.correction = 1.0
+        self.job_peaks: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def model_mb(self) -> float:
+        if self._model_mb is not None:
+            return self._model_mb
+        return MODEL_MEMORY_MB.get(self.model_name, 1000)
+
+    def reserve(self, mb: float):
+        """Set aside memory for this process or loaded worker models (negative gives it back)."""
+        with self._lock:
+            self.reserved_mb += mb
+
+    @property
+    def available_mb(self) -> float:
+        return self.budget_mb - self.reserved_mb - sum(self.running.values())
+
+    def estimate_job_mb(self, duration_seconds: Optional[float]) -> float:
+        """Estimated peak working memory of one transcription, excluding the model."""
+        duration = duration_seconds or 0.0
+        base = DECODE_WORKING_MB.get(self.model_name, 500) + duration * AUDIO_MB_PER_SECOND
+        return base * self.correction
+
+    def max_workers(self, requested: int, per_job_mb: float) -> int:
+        """How many model-holding worker processes fit in the budget (at least one)."""
+        per_worker = self.model_mb + per_job_mb
+        affordable = int(max(0.0, self.budget_mb - self.reserved_mb) // per_worker)
+        return max(1, min(requested, affordable))
+
+    def try_admit(self, job_id: str, estimate_mb: float) -> bool:
+        """
+        Admit a job if it fits. A job larger than the whole budget is still
+        admitted once nothing else is running, so it is deferred, never refused.
+        """
+        with self._lock:
+            if estimate_mb <= self.available_mb or not self.running:
+                self.running[job_id] = estimate_mb
+                return True
+            return False
+
+    def release(self, job_id: str, measured_mb: Optional[float] = None):
+        """Finish a job and refine future estimates from its measured peak."""
+        with self._lock:
+            estimate = self.running.pop(job_id, None)
+            if measured_mb is not None:
+                self.job_peaks[job_id] = measured_mb
+                if estimate:
+                    ratio = measured_mb / (estimate / self.correction)
+                    # Never shrink estimates below half the model's nominal figures
+                    ratio = max(0.5, ratio)
+                    self.correction = (1 - ESTIMATE_SMOOTHING) * self.correction + ESTIMATE_SMOOTHING * ratio
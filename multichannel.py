@@ -0,0 +1,147 @@
+"""
+Multichannel mode: one transcript per recording, one decode per speaker.
+
+Interview rigs record each speaker on a channel of their own. Mixing those
+down to mono, as Whisper's loader does, puts overlapping speech on top of
+itself and loses who said what. In multichannel mode every channel is decoded
+separately, channels that stay silent (unused inputs) or merely repeat an
+earlier channel (mono saved as stereo) are skipped, and the remaining
+channels are transcribed concurrently by worker processes, each holding its
+own copy of the model. The segments are merged into one time-ordered
+transcript, each line labelled with its channel.
+
+Work grows with the number of active channels, not with the channel count of
+the file; with a worker per active channel the wall time stays close to that
+of the longest channel.
+"""
+
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from audio_io import load_channels, is_silent
+from audio_transcriber import TranscriptionCancelled
+from repetition_guard import merge_guard_stats
+from segment_array import SegmentArrayBuilder, compact_result
+from worker_pool import create_pool, terminate_pool, transcribe_chunk
+
+
+# Channels closer than this to an earlier one (largest sample difference) are copies of it
+DUPLICATE_TOLERANCE = 1e-3
+
+
+def select_channels(channels: List[np.ndarray]) -> Tuple[List[int], List[int], List[int]]:
+    """
+    Sort channels (0-based) into those worth transcribing, silent ones and
+    duplicates of an earlier active channel.
+    """
+    active, silent, duplicate = [], [], []
+    for index, audio in enumerate(channels):
+        if is_silent(audio):
+            silent.append(index)
+        elif any(np.max(np.abs(audio - channels[other])) < DUPLICATE_TOLERANCE for other in active):
+            duplicate.append(index)
+        else:
+            active.append(index)
+    return active, silent, duplicate
+
+
+def merge_channel_results(channel_results: List[Tuple[int, Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Merge per-channel results (channel numbered from 1, result) into one result
+    whose segments are ordered by start time and labelled with their channel.
+    """
+    labelled = []
+    language = None
+    guard_stats = None
+    for channel, result in channel_results:
+        language = language or result.get('language')
+        if 'repetition_guard' in result:
+            guard_stats = merge_guard_stats(guard_stats, result['repetition_guard'])
+        labelled.extend(dict(segment, channel=channel) for segment in result['segments'])
+    labelled.sort(key=lambda segment: (segment['start'], segment['channel']))
+
+    segments = SegmentArrayBuilder()
+    for segment in labelled:
+        segments.append_segment(segment)
+    merged = {
+        'text': "".join(segment['text'] for segment in labelled),
+        'segments': segments.build(),
+        'language': language
+    }
+    if guard_stats is not None:
+        merged['repetition_guard'] = guard_stats
+    return merged
+
+
+class MultichannelTranscriber:
+    """Transcribes the channels of a recording separately and concurrently."""
+
+    def __init__(self, backend, workers: Optional[int] = None, cancel_event: Optional[threading.Event] = None,
+                 guard_repetition: bool = False, progress_callback: Optional[Callable] = None):
+        self.backend = backend
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.cancel_event = cancel_event or threading.Event()
+        self.guard_repetition = guard_repetition
+        self.progress_callback = progress_callback
+        self._executor = None
+
+    def _report(self, message: str):
+        if self.progress_callback:
+            self.progress_callback(message)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = create_pool(self.backend.spec(), self.workers)
+        return self._executor
+
+    def transcribe(self, file_path: str, **decode_options) -> Dict[str, Any]:
+        """Drop-in replacement for model.transcribe(file_path, **options)."""
+        channels = load_channels(file_path, self.cancel_event)
+        active, silent, duplicate = select_channels(channels)
+        name = os.path.basename(file_path)
+        skipped = [f"channel {i + 1} silent" for i in silent] + [f"channel {i + 1} duplicate" for i in duplicate]
+        self._report(f"{name}: transcribing {len(active)} of {len(channels)} channel(s)"
+                     + (f" ({', '.join(skipped)})" if skipped else ""))
+
+        if len(active) <= 1 or self.workers == 1:
+            # Nothing to run side by side; the model already loaded here is enough
+            channel_results = []
+            for i in active:
+                result = self.backend.transcribe(channels[i], self.cancel_event,
+                                                 guard_repetition=self.guard_repetition, **decode_options)
+                channel_results.append((i + 1, compact_result(result)))
+            return merge_channel_results(channel_results)
+
+        executor = self._get_executor()
+        futures = [(i + 1, executor.submit(transcribe_chunk, channels[i], decode_options, self.guard_repetition))
+                   for i in active]
+        del channels  # The workers have their copies
+
+        pending = [future for _, future in futures]
+        while pending:
+            if self.cancel_event.is_set():
+                done_channels = len(futures) - len(pending)
+                self.terminate()
+                raise TranscriptionCancelled(
+                    f"Cancelled with {done_channels} of {len(futures)} channels done",
+                    windows_decoded=done_channels
+                )
+            _, not_done = wait(pending, timeout=0.2)
+            pending = list(not_done)
+
+        return merge_channel_results([(channel, future.result()) for channel, future in futures])
+
+    def terminate(self):
+        """Kill the workers now, abandoning any channels in progress."""
+        if self._executor is not None:
+            terminate_pool(self._executor)
+            self._executor = None
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,233 @@
+"""
+Per-file profiling, for finding out where a slow transcription spends its time.
+
+With profiling on, each file is transcribed under cProfile and, for backends
+that run PyTorch, the torch profiler. Three files per media file are written
+to the 'profiles' folder next to it:
+
+  NAME.pstats        cProfile dump (python -m pstats, snakeviz, ...)
+  NAME.trace.json    torch operator trace in Chrome trace format
+                     (chrome://tracing or https://ui.perfetto.dev)
+  NAME.summary.txt   time per stage (audio decoding, mel spectrogram, encoder,
+                     decoder, the rest) and the top hot spots in each
+
+The backend names the functions that make up each stage (see
+InferenceBackend.profile_stages()); a stage's time is their cumulative time,
+and whatever is left of the wall time is counted as Python overhead.
+
+Profiling never changes how a transcription turns out: a profile that can't
+be written (unwritable folder, full disk, ...) is reported in
+FileProfile.errors and the rest of it is still saved where possible.
+"""
+
+import cProfile
+import inspect
+import os
+import pstats
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+STAGE_OTHER = 'python/other'
+
+# Functions listed per stage, and torch operators listed overall
+TOP_FUNCTIONS = 8
+TOP_OPERATORS = 15
+
+FunctionKey = Tuple[str, int, str]  # cProfile's (filename, line, name)
+
+
+def get_profiles_dir(file_path: str) -> str:
+    """Get the profiles folder for a media file, creating it."""
+    profiles_dir = os.path.join(os.path.dirname(file_path), "profiles")
+    os.makedirs(profiles_dir, exist_ok=True)
+    return profiles_dir
+
+
+def function_key(function: Callable) -> Optional[FunctionKey]:
+    """The key cProfile records a Python function under (None for builtins)."""
+    code = getattr(inspect.unwrap(getattr(function, '__func__', function)), '__code__', None)
+    if code is None:
+        return None
+    return code.co_filename, code.co_firstlineno, code.co_name
+
+
+def describe_function(key: FunctionKey) -> str:
+    filename, line, name = key
+    if filename == '~':
+        return name  # Builtin, e.g. <built-in method time.sleep>
+    return f"{os.path.basename(filename)}:{line}({name})"
+
+
+@dataclass
+class FileProfile:
+    """What one file's profile found."""
+    file: str
+    backend: str
+    wall_seconds: float
+    stages: Dict[str, float] = field(default_factory=dict)
+    hot_spots: Dict[str, List[Tuple[str, float]]] = field(default_factory=dict)
+    operators: List[Tuple[str, float, int]] = field(default_factory=list)  # name, self seconds, calls
+    stats_file: Optional[str] = None
+    trace_file: Optional[str] = None
+    summary_file: Optional[str] = None
+    notes: List[str] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)  # Parts of the profile that couldn't be saved
+
+    def format_summary(self) -> str:
+        lines = [f"Profile of {self.file} ({self.backend} backend, {self.wall_seconds:.2f}s wall time)", ""]
+        lines.append(f"{'stage':<20} {'seconds':>9} {'share':>7}")
+        for stage, seconds in self.stages.items():
+            share = seconds / self.wall_seconds if self.wall_seconds else 0.0
+            lines.append(f"{stage:<20} {seconds:>9.2f} {share:>7.1%}")
+
+        lines += ["", "Hot spots by stage (own time in seconds; shared helpers appear under each stage using them):"]
+        for stage, functions in self.hot_spots.items():
+            lines.append(f"  {stage}")
+            lines += [f"    {seconds:>9.3f}  {name}" for name, seconds in functions]
+
+        if self.operators:
+            lines += ["", "Top torch operators (self CPU time):"]
+            lines += [f"    {seconds:>9.3f}s {calls:>8}x  {name}" for name, seconds, calls in self.operators]
+
+        lines += [""] + [f"Note: {note}" for note in self.notes]
+        lines += [f"Not saved: {error}" for error in self.errors]
+        if self.stats_file:
+            lines.append(f"cProfile dump: {os.path.basename(self.stats_file)}")
+        if self.trace_file:
+            lines.append(f"Operator trace: {os.path.basename(self.trace_file)} (chrome://tracing or ui.perfetto.dev)")
+        return "\n".join(lines) + "\n"
+
+
+def _stage_breakdown(stats: pstats.Stats, stage_functions: Dict[str, List[Callable]],
+                     wall_seconds: float) -> Tuple[Dict[str, float], Dict[str, List[Tuple[str, float]]]]:
+    """Split a cProfile run into stage times and each stage's hot spots."""
+    raw = stats.stats  # key -> (primitive calls, calls, own time, cumulative time, callers)
+    callees = defaultdict(set)
+    for key, (_, _, _, _, callers) in raw.items():
+        for caller in callers:
+            callees[caller].add(key)
+
+    roots = {stage: {k for k in map(function_key, functions) if k in raw}
+             for stage, functions in stage_functions.items()}
+    all_roots = set().union(*roots.values()) if roots else set()
+
+    stages: Dict[str, float] = {}
+    hot_spots: Dict[str, List[Tuple[str, float]]] = {}
+    covered = set()
+    for stage, stage_roots in roots.items():
+        # Roots called from inside another root of this stage are already counted
+        top = [k for k in stage_roots if not stage_roots & set(raw[k][4])]
+        stages[stage] = sum(raw[k][3] for k in top)
+
+        # Everything the stage calls, without walking into other stages
+        reached, pending = set(stage_roots), list(stage_roots)
+        while pending:
+            for callee in callees[pending.pop()]:
+                if callee not in reached and callee not in all_roots:
+                    reached.add(callee)
+                    pending.append(callee)
+        covered |= reached
+        hot_spots[stage] = _top_own_time(raw, reached)
+
+    stages[STAGE_OTHER] = max(0.0, wall_seconds - sum(stages.values()))
+    hot_spots[STAGE_OTHER] = _top_own_time(raw, set(raw) - covered)
+    return stages, hot_spots
+
+
+def _top_own_time(raw, keys) -> List[Tuple[str, float]]:
+    ranked = sorted(keys, key=lambda k: raw[k][2], reverse=True)[:TOP_FUNCTIONS]
+    return [(describe_function(k), raw[k][2]) for k in ranked if raw[k][2] > 0]
+
+
+class FileProfiler:
+    """
+    Context manager that profiles the transcription of one file and writes the
+    dump, trace and summary when it exits (also after a failure or cancel).
+    The result is in .profile afterwards.
+    """
+
+    def __init__(self, backend, file_path: str, profiles_dir: Optional[str] = None):
+        self.backend = backend
+        self.file_path = file_path
+        self.profiles_dir = profiles_dir
+        self.profile: Optional[FileProfile] = None
+        self._cprofile = None
+        self._torch_profiler = None
+        self._start = 0.0
+        self._notes: List[str] = []
+
+    def __enter__(self):
+        if self.backend.capabilities().torch_ops:
+            try:
+                from torch.profiler import profile, ProfilerActivity
+                self._torch_profiler = profile(activities=[ProfilerActivity.CPU])
+                self._torch_profiler.__enter__()
+            except Exception as e:
+                self._torch_profiler = None
+                self._notes.append(f"torch profiler unavailable: {e}")
+        self._cprofile = cProfile.Profile()
+        self._start = time.perf_counter()
+        try:
+            self._cprofile.enable()
+        except ValueError as e:  # Another profiler is already active
+            self._cprofile = None
+            self._notes.append(f"cProfile unavailable: {e}")
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        wall_seconds = time.perf_counter() - self._start
+        profile = FileProfile(os.path.basename(self.file_path), self.backend.name, wall_seconds,
+                              notes=self._notes)
+        self.profile = profile
+
+        def attempt(what: str, step: Callable[[], None]) -> bool:
+            try:
+                step()
+                return True
+            except Exception as e:
+                profile.errors.append(f"{what}: {e}")
+                return False
+
+        torch_profiler = self._torch_profiler
+        if torch_profiler is not None:
+            if not attempt("torch profile", lambda: torch_profiler.__exit__(None, None, None)):
+                torch_profiler = None
+
+        def breakdown():
+            profile.stages, profile.hot_spots = _stage_breakdown(
+                pstats.Stats(self._cprofile), self.backend.profile_stages(), wall_seconds
+            )
+        if self._cprofile is not None:
+            attempt("stage breakdown", breakdown)
+
+        def find_dir():
+            self.profiles_dir = self.profiles_dir or get_profiles_dir(self.file_path)
+        if not attempt("profiles folder", find_dir):
+            return False
+        stem = os.path.join(self.profiles_dir, os.path.splitext(os.path.basename(self.file_path))[0])
+
+        if self._cprofile is not None:
+            if attempt("cProfile dump", lambda: self._cprofile.dump_stats(f"{stem}.pstats")):
+                profile.stats_file = f"{stem}.pstats"
+
+        if torch_profiler is not None:
+            def export_trace():
+                torch_profiler.export_chrome_trace(f"{stem}.trace.json")
+                profile.trace_file = f"{stem}.trace.json"
+                averages = sorted(torch_profiler.key_averages(), key=lambda a: a.self_cpu_time_total,
+                                  reverse=True)[:TOP_OPERATORS]
+                profile.operators = [(a.key, a.self_cpu_time_total / 1e6, a.count) for a in averages]
+            attempt("operator trace", export_trace)
+
+        def write_summary():
+            with open(f"{stem}.summary.txt", "w") as f:
+                f.write(profile.format_summary())
+            profile.summary_file = f"{stem}.summary.txt"
+        attempt("summary", write_summary)
+        # Never let profiling turn the transcription's outcome into something else
+        return False
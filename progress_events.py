@@ -0,0 +1,360 @@
+"""
+Structured progress events.
+
+A transcription reports what it is doing by publishing small typed events
+(JobQueued, FileStarted, WindowDecoded, FileFinished, Error, ...) to an
+EventBus. Publishing only puts the event on a queue; a dispatcher thread
+hands it to the subscribers, so a slow subscriber (a Tk window, a log file
+on a network share) never holds up the inference thread.
+
+Subscribers are plain callables taking one event. The GUI, the CLI printer,
+the JSON-lines log and the metrics exporter are all subscribers, and
+callback_adapter() turns the old progress_callback/eta_callback pair into one.
+"""
+
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from dataclasses import dataclass, asdict, fields
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class ProgressEvent:
+    """Base class for progress events. Every event is stamped when it is created."""
+
+    # Transient events (window progress, ETA) replace each other in a status
+    # line instead of being appended to the log
+    transient = False
+
+    def __post_init__(self):
+        self.timestamp = time.time()
+
+    @property
+    def kind(self) -> str:
+        return type(self).__name__
+
+    def message(self) -> Optional[str]:
+        """Human-readable line for the log, or None if the event isn't shown."""
+        return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data['event'] = self.kind
+        data['timestamp'] = self.timestamp
+        return data
+
+
+@dataclass
+class StatusMessage(ProgressEvent):
+    """Free-form status text (model loading, worker pool sizes, ...)."""
+    text: str
+
+    def message(self) -> Optional[str]:
+        return self.text
+
+
+@dataclass
+class JobQueued(ProgressEvent):
+    """A file was added to the run."""
+    file: str
+    index: int
+    total: int
+    audio_seconds: Optional[float] = None
+
+
+@dataclass
+class FileStarted(ProgressEvent):
+    file: str
+    label: str
+    estimated_memory_mb: Optional[float] = None
+
+    def message(self) -> Optional[str]:
+        if self.estimated_memory_mb is not None:
+            return f"Processing {self.label}: {self.file} (~{self.estimated_memory_mb:.0f} MB)"
+        return f"Processing {self.label}: {self.file}"
+
+
+@dataclass
+class WindowDecoded(ProgressEvent):
+    """One 30 s decoding window of a file finished; audio_offset is where it started."""
+    file: str
+    window: int
+    audio_offset: float
+    text: str = ""
+    transient = True
+
+    def message(self) -> Optional[str]:
+        return f"{self.file}: window {self.window} at {self.audio_offset:.0f}s"
+
+
+@dataclass
+class TranscriptStored(ProgressEvent):
+    file: str
+    output_file: str
+    segments: int
+
+
+@dataclass
+class ProfileWritten(ProgressEvent):
+    """A file's profile was saved (see profiling.py); stages maps each stage to its seconds."""
+    file: str
+    summary_file: str
+    stages: Dict[str, float]
+
+    def message(self) -> Optional[str]:
+        breakdown = ", ".join(f"{stage} {seconds:.1f}s" for stage, seconds in self.stages.items())
+        return f"Profile of {self.file}: {breakdown} (see {self.summary_file})"
+
+
+@dataclass
+class FileFinished(ProgressEvent):
+    file: str
+    success: bool
+    elapsed_seconds: float
+    audio_seconds: Optional[float] = None
+    error: Optional[str] = None
+
+    def message(self) -> Optional[str]:
+        if self.success:
+            return f"✓ Completed: {self.file}"
+        return f"✗ Failed: {self.file} - {self.error}"
+
+
+@dataclass
+class FileCancelled(ProgressEvent):
+    file: str
+    elapsed_seconds: float
+    windows_decoded: int = 0
+    audio_offset: float = 0.0
+
+    def message(self) -> Optional[str]:
+        return (f"🚫 Cancelled: {self.file} after {self.elapsed_seconds:.0f}s "
+                f"(reached ~{self.audio_offset:.0f}s of audio, {self.windows_decoded} windows)")
+
+
+@dataclass
+class Error(ProgressEvent):
+    """
+    Something went wrong. Failed transcription attempts carry the attempt
+    number; final is set when no more attempts will be made.
+    """
+    text: str
+    file: Optional[str] = None
+    attempt: Optional[int] = None
+    final: bool = False
+
+    def message(self) -> Optional[str]:
+        if self.attempt is None:
+            return f"Error: {self.text}"
+        line = f"Attempt {self.attempt} failed for {self.file}: {self.text}"
+        return line + " (giving up)" if self.final else line
+
+
+@dataclass
+class EtaUpdated(ProgressEvent):
+    summary: str
+    remaining_seconds: float
+    files_per_hour: Optional[float] = None
+    transient = True
+
+    def message(self) -> Optional[str]:
+        return self.summary
+
+
+def event_from_dict(data: Dict[str, Any]) -> ProgressEvent:
+    """Rebuild an event from to_dict() output (e.g. one sent by the background service)."""
+    kinds = {cls.__name__: cls for cls in ProgressEvent.__subclasses__()}
+    cls = kinds.get(data.get('event'))
+    if cls is None:
+        raise ValueError(f"Unknown progress event: {data.get('event')!r}")
+    event = cls(**{f.name: data[f.name] for f in fields(cls) if f.name in data})
+    event.timestamp = data.get('timestamp', event.timestamp)
+    return event
+
+
+# Queued by EventBus.close() to stop the dispatcher thread
+_STOP = object()
+
+
+class EventBus:
+    """
+    Delivers published events to subscribers on a dedicated dispatcher thread,
+    in the order they were published. close() the bus when done with it to
+    stop the thread.
+    """
+
+    def __init__(self):
+        self._subscribers: List[Tuple[Callable, Tuple[type, ...]]] = []
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = None
+        self._closed = False
+
+    def subscribe(self, callback: Callable, *event_types: type) -> Callable:
+        """
+        Call callback(event) for every event, or only for the given event types.
+        Returns a function that removes the subscription.
+        """
+        entry = (callback, event_types or (ProgressEvent,))
+        with self._lock:
+            self._subscribers = self._subscribers + [entry]
+
+        def unsubscribe():
+            with self._lock:
+                self._subscribers = [s for s in self._subscribers if s is not entry]
+        return unsubscribe
+
+    def publish(self, event: ProgressEvent):
+        """Queue an event for the subscribers; never blocks on them. Dropped once the bus is closed."""
+        if not self._subscribers or self._closed:
+            return
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None and not self._closed:
+                    self._thread = threading.Thread(target=self._dispatch, name="progress-events", daemon=True)
+                    self._thread.start()
+        self._queue.put(event)
+
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        """Wait until every event published so far has been delivered."""
+        if self._thread is None or self._closed or threading.current_thread() is self._thread:
+            return True
+        delivered = threading.Event()
+        self._queue.put(delivered)
+        return delivered.wait(timeout)
+
+    def close(self, timeout: Optional[float] = 5.0):
+        """Deliver the events published so far, then stop the dispatcher thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+        if thread is None:
+            return
+        self._queue.put(_STOP)
+        if threading.current_thread() is not thread:
+            thread.join(timeout)
+
+    def _dispatch(self):
+        while True:
+            event = self._queue.get()
+            if event is _STOP:
+                return
+            if isinstance(event, threading.Event):
+                event.set()
+                continue
+            for callback, event_types in self._subscribers:
+                if not isinstance(event, event_types):
+                    continue
+                try:
+                    callback(event)
+                except Exception as e:
+                    # A broken subscriber must not stop the others (or the run)
+                    print(f"Progress subscriber {callback!r} failed on {event.kind}: {e}", file=sys.stderr)
+
+
+def callback_adapter(progress_callback: Optional[Callable] = None,
+                     eta_callback: Optional[Callable] = None) -> Callable:
+    """
+    Subscriber for the original string callbacks: log lines go to
+    progress_callback and ETA updates to eta_callback. Per-window updates
+    are only available as WindowDecoded events.
+    """
+    def deliver(event: ProgressEvent):
+        if isinstance(event, WindowDecoded):
+            return
+        text = event.message()
+        if text is None:
+            return
+        if isinstance(event, EtaUpdated):
+            if eta_callback:
+                eta_callback(text)
+        elif progress_callback:
+            progress_callback(text)
+    return deliver
+
+
+class JsonLinesLog:
+    """Subscriber that appends every event to a file as one JSON object per line."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8", buffering=1)
+
+    def __call__(self, event: ProgressEvent):
+        self._file.write(json.dumps(event.to_dict(), ensure_ascii=False) + "\n")
+
+    def close(self):
+        self._file.close()
+
+
+class MetricsExporter:
+    """
+    Subscriber that keeps run counters and writes them in the Prometheus text
+    format (e.g. for node_exporter's textfile collector). The file is replaced
+    atomically, at most every min_interval seconds except when a file finishes.
+    """
+
+    def __init__(self, path: str, min_interval: float = 5.0):
+        self.path = path
+        self.min_interval = min_interval
+        self.counters = {
+            'files_queued_total': 0,
+            'files_started_total': 0,
+            'files_completed_total': 0,
+            'files_failed_total': 0,
+            'files_cancelled_total': 0,
+            'windows_decoded_total': 0,
+            'errors_total': 0,
+            'audio_seconds_transcribed_total': 0.0,
+            'transcribe_seconds_total': 0.0,
+        }
+        self.eta_seconds = None
+        self._last_write = 0.0
+
+    def __call__(self, event: ProgressEvent):
+        counters = self.counters
+        if isinstance(event, JobQueued):
+            counters['files_queued_total'] += 1
+        elif isinstance(event, FileStarted):
+            counters['files_started_total'] += 1
+        elif isinstance(event, WindowDecoded):
+            counters['windows_decoded_total'] += 1
+        elif isinstance(event, FileFinished):
+            counters['files_completed_total' if event.success else 'files_failed_total'] += 1
+            counters['transcribe_seconds_total'] += event.elapsed_seconds
+            if event.success and event.audio_seconds:
+                counters['audio_seconds_transcribed_total'] += event.audio_seconds
+        elif isinstance(event, FileCancelled):
+            counters['files_cancelled_total'] += 1
+        elif isinstance(event, Error):
+            counters['errors_total'] += 1
+        elif isinstance(event, EtaUpdated):
+            self.eta_seconds = event.remaining_seconds
+
+        if isinstance(event, FileFinished) or time.monotonic() - self._last_write >= self.min_interval:
+            self.write()
+
+    def render(self) -> str:
+        lines = []
+        for name, value in self.counters.items():
+            lines.append(f"# TYPE transcriber_{name} counter")
+            lines.append(f"transcriber_{name} {value}")
+        if self.eta_seconds is not None:
+            lines.append("# TYPE transcriber_eta_seconds gauge")
+            lines.append(f"transcriber_eta_seconds {self.eta_seconds:.1f}")
+        return "\n".join(lines) + "\n"
+
+    def write(self):
+        self._last_write = time.monotonic()
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as f:
+            f.write(self.render())
+        os.replace(temp_path, self.path)
+
+    def close(self):
+        self.write()
@@ -0,0 +1,149 @@
+"""
+Early abort of runaway decoding on music, noise and long silences.
+
+On windows without clear speech Whisper can fall into a loop, emitting the
+same few tokens until it runs out of token budget, and then often re-decodes
+the window at every fallback temperature. RepetitionGuard is a logit filter
+that watches each hypothesis as it is decoded and forces end-of-text as soon
+as the tail is one n-gram repeated many times, or the text so far compresses
+suspiciously well (the same compression-ratio test transcribe() applies after
+the fact). The looping tail is then cut from the result, so the window is
+kept with a single copy of the repeated text and marked as suspect.
+"""
+
+import zlib
+from dataclasses import replace
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# Longest repeated n-gram looked for, and how many tokens a loop must cover
+MAX_NGRAM = 10
+MIN_LOOP_TOKENS = 16
+MIN_LOOP_REPEATS = 3
+
+# transcribe()'s default compression_ratio_threshold
+COMPRESSION_RATIO_THRESHOLD = 2.4
+
+# Text compression is measured every few steps once there is enough text
+COMPRESSION_CHECK_INTERVAL = 16
+COMPRESSION_MIN_TOKENS = 64
+
+REASON_REPETITION = "repetition"
+REASON_COMPRESSION = "compression"
+
+
+def find_loop(tokens: List[int]) -> Optional[Tuple[int, int]]:
+    """
+    If tokens end in one n-gram repeated enough times to be a loop, return
+    (start, n): where the repeats begin and the n-gram length.
+    """
+    for n in range(1, MAX_NGRAM + 1):
+        repeats = max(MIN_LOOP_REPEATS, -(-MIN_LOOP_TOKENS // n))
+        if len(tokens) < n * repeats:
+            break
+        pattern = tokens[-n:]
+        if tokens[-n * repeats:] != pattern * repeats:
+            continue
+        start = len(tokens) - n * repeats
+        while start >= n and tokens[start - n:start] == pattern:
+            start -= n
+        return start, n
+    return None
+
+
+def text_compression_ratio(text: str) -> float:
+    data = text.encode("utf-8")
+    return len(data) / len(zlib.compress(data)) if data else 0.0
+
+
+class RepetitionGuard:
+    """
+    Logit filter for one DecodingTask. It is called once per decoder step,
+    so it also counts the steps the decode took.
+    """
+
+    def __init__(self, task):
+        self.tokenizer = task.tokenizer
+        self.sample_begin = task.sample_begin
+        self.sample_len = task.sample_len
+        self.steps = 0
+        self.reason = None
+
+    def _text_tokens(self, row) -> List[int]:
+        eot = self.tokenizer.eot
+        return [t for t in row[self.sample_begin:].tolist() if t < eot]
+
+    def apply(self, logits, tokens):
+        self.steps += 1
+        check_compression = self.steps % COMPRESSION_CHECK_INTERVAL == 0
+        eot = self.tokenizer.eot
+        for k in range(tokens.shape[0]):
+            if tokens.shape[1] > self.sample_begin and tokens[k, -1] == eot:
+                continue  # This hypothesis has already finished
+            text_tokens = self._text_tokens(tokens[k])
+            reason = None
+            if find_loop(text_tokens):
+                reason = REASON_REPETITION
+            elif check_compression and len(text_tokens) >= COMPRESSION_MIN_TOKENS:
+                if text_compression_ratio(self.tokenizer.decode(text_tokens)) > COMPRESSION_RATIO_THRESHOLD:
+                    reason = REASON_COMPRESSION
+            if reason:
+                self.reason = self.reason or reason
+                logits[k, :] = float("-inf")
+                logits[k, eot] = 0.0
+
+    @property
+    def fired(self) -> bool:
+        return self.reason is not None
+
+    @property
+    def steps_saved(self) -> int:
+        """Decoder steps left unused in the token budget when the guard fired."""
+        return max(0, self.sample_len - self.steps) if self.fired else 0
+
+    def trim(self, result, window_end_token: int) -> Tuple[Any, Optional[str]]:
+        """
+        Cut a looping tail from a decoding result, keeping one copy of the
+        repeated text. The window-end timestamp token is added to close it,
+        so transcribe() moves on to the next window rather than decoding the
+        rest of this one again. Returns the result and why it is suspect (or None).
+        """
+        tokenizer = self.tokenizer
+        text_positions = [i for i, t in enumerate(result.tokens) if t < tokenizer.eot]
+        loop = find_loop([result.tokens[i] for i in text_positions])
+        if loop is None:
+            # Stopped on compression, or a hypothesis that didn't loop won the beam search
+            if self.fired and result.compression_ratio > COMPRESSION_RATIO_THRESHOLD:
+                return result, self.reason
+            return result, None
+
+        start, n = loop
+        tokens = result.tokens[:text_positions[start + n - 1] + 1]
+        if tokens[-1] < tokenizer.timestamp_begin and any(t >= tokenizer.timestamp_begin for t in tokens):
+            tokens = tokens + [window_end_token]
+        text = tokenizer.decode([t for t in tokens if t < tokenizer.eot])
+        trimmed = replace(result, tokens=tokens, text=text, compression_ratio=text_compression_ratio(text))
+        return trimmed, REASON_REPETITION
+
+
+def empty_guard_stats() -> Dict[str, float]:
+    return {
+        'windows_guarded': 0,
+        'decoder_steps_saved': 0,
+        'fallbacks_avoided': 0,
+        'seconds_saved': 0.0,
+    }
+
+
+def merge_guard_stats(total: Optional[Dict[str, float]], stats: Optional[Dict[str, float]]) -> Dict[str, float]:
+    """Add one transcription's guard counters to a running total."""
+    total = dict(total or empty_guard_stats())
+    for key, value in (stats or {}).items():
+        total[key] = total.get(key, 0) + value
+    return total
+
+
+def format_guard_stats(stats: Dict[str, float]) -> str:
+    return (f"stopped {stats['windows_guarded']} repetition loop(s) early, "
+            f"saving ~{stats['decoder_steps_saved']} decoder steps "
+            f"and {stats['fallbacks_avoided']} fallback re-decode(s), ~{stats['seconds_saved']:.1f}s")
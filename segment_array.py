@@ -0,0 +1,209 @@
+"""
+Compact storage for transcription segments.
+
+Whisper returns each segment as a dict holding Python floats, its token ids
+and several per-window statistics, which adds up to over a kilobyte per
+segment. A multi-hour result can hold tens of thousands of them.
+SegmentArray keeps only what the transcript needs, in columns: start and end
+times, confidence, a suspect flag and the source channel in NumPy arrays,
+plus each distinct text stored once in a shared UTF-8 buffer. Repeated lines
+(" Thank you.", "...") share their entry. It serializes to a flat binary blob
+that loads without parsing, which is also how it is pickled between worker
+processes.
+"""
+
+import struct
+from array import array
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+import numpy as np
+
+
+# Values of the suspect column; index 0 means the segment is not suspect
+SUSPECT_REASONS = (None, "repetition", "compression")
+
+_MAGIC = b"SEGA"
+_VERSION = 2  # Version 1 had no channel column
+_HEADER = struct.Struct("<4sHxxQQQ")  # magic, version, segments, texts, text bytes
+
+
+class SegmentArrayBuilder:
+    """Collects segments one at a time into compact typed buffers."""
+
+    def __init__(self):
+        self._start = array("d")
+        self._end = array("d")
+        self._confidence = array("f")
+        self._suspect = array("B")
+        self._channel = array("B")
+        self._text_ids = array("I")
+        self._text_offsets = array("Q", [0])
+        self._text_buffer = bytearray()
+        self._interned: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._start)
+
+    def append(self, start: float, end: float, text: str, confidence: float = float("nan"),
+               suspect: Optional[str] = None, channel: Optional[int] = None):
+        text_id = self._interned.get(text)
+        if text_id is None:
+            text_id = len(self._interned)
+            self._interned[text] = text_id
+            self._text_buffer += text.encode("utf-8")
+            self._text_offsets.append(len(self._text_buffer))
+        self._start.append(start)
+        self._end.append(end)
+        self._confidence.append(confidence)
+        self._suspect.append(SUSPECT_REASONS.index(suspect))
+        self._channel.append(channel or 0)
+        self._text_ids.append(text_id)
+
+    def append_segment(self, segment: Dict[str, Any], offset: float = 0.0):
+        """Add a Whisper segment dict (or one yielded by a SegmentArray), shifted by offset seconds."""
+        confidence = segment.get('confidence')
+        if confidence is None:
+            avg_logprob = segment.get('avg_logprob')
+            confidence = float(np.exp(avg_logprob)) if avg_logprob is not None else float("nan")
+        self.append(segment['start'] + offset, segment['end'] + offset, segment['text'],
+                    confidence, segment.get('suspect'), segment.get('channel'))
+
+    def build(self) -> "SegmentArray":
+        return SegmentArray(
+            np.frombuffer(self._start, np.float64).copy(),
+            np.frombuffer(self._end, np.float64).copy(),
+            np.frombuffer(self._confidence, np.float32).copy(),
+            np.frombuffer(self._suspect, np.uint8).copy(),
+            np.frombuffer(self._text_ids, np.uint32).copy(),
+            np.frombuffer(self._text_offsets, np.uint64).copy(),
+            bytes(self._text_buffer),
+            np.frombuffer(self._channel, np.uint8).copy(),
+        )
+
+
+class SegmentArray:
+    """
+    Read-only columnar segments. Iterating yields small dicts with the keys
+    the transcript writer uses (id, start, end, text, confidence, suspect,
+    channel). channel is the 1-based source channel in multichannel mode and
+    None otherwise (stored as 0).
+    """
+
+    def __init__(self, start: np.ndarray, end: np.ndarray, confidence: np.ndarray, suspect: np.ndarray,
+                 text_ids: np.ndarray, text_offsets: np.ndarray, text_buffer: bytes,
+                 channel: Optional[np.ndarray] = None):
+        self.start = start
+        self.end = end
+        self.confidence = confidence
+        self.suspect = suspect
+        self.text_ids = text_ids
+        self.text_offsets = text_offsets
+        self.text_buffer = text_buffer
+        self.channel = channel if channel is not None else np.zeros(len(start), np.uint8)
+
+    @classmethod
+    def from_segments(cls, segments: Iterable[Dict[str, Any]], offset: float = 0.0) -> "SegmentArray":
+        if isinstance(segments, SegmentArray) and not offset:
+            return segments
+        builder = SegmentArrayBuilder()
+        for segment in segments:
+            builder.append_segment(segment, offset)
+        return builder.build()
+
+    def __len__(self) -> int:
+        return len(self.start)
+
+    def distinct_text(self, text_id: int) -> str:
+        lo, hi = self.text_offsets[text_id], self.text_offsets[text_id + 1]
+        return self.text_buffer[lo:hi].decode("utf-8")
+
+    def text(self, i: int) -> str:
+        return self.distinct_text(int(self.text_ids[i]))
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        if i < 0:
+            i += len(self)
+        return {
+            'id': i,
+            'start': float(self.start[i]),
+            'end': float(self.end[i]),
+            'text': self.text(i),
+            'confidence': float(self.confidence[i]),
+            'suspect': SUSPECT_REASONS[self.suspect[i]],
+            'channel': int(self.channel[i]) or None,
+        }
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        # Convert the columns once rather than element by element
+        starts, ends = self.start.tolist(), self.end.tolist()
+        confidences, suspects, channels = self.confidence.tolist(), self.suspect.tolist(), self.channel.tolist()
+        texts = [self.distinct_text(i) for i in range(len(self.text_offsets) - 1)]
+        for i, text_id in enumerate(self.text_ids.tolist()):
+            yield {
+                'id': i,
+                'start': starts[i],
+                'end': ends[i],
+                'text': texts[text_id],
+                'confidence': confidences[i],
+                'suspect': SUSPECT_REASONS[suspects[i]],
+                'channel': channels[i] or None,
+            }
+
+    def full_text(self) -> str:
+        return "".join(self.text(i) for i in range(len(self)))
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the columns and the text buffer."""
+        columns = (self.start, self.end, self.confidence, self.suspect, self.channel, self.text_ids,
+                   self.text_offsets)
+        return sum(column.nbytes for column in columns) + len(self.text_buffer)
+
+    def to_bytes(self) -> bytes:
+        header = _HEADER.pack(_MAGIC, _VERSION, len(self), len(self.text_offsets) - 1, len(self.text_buffer))
+        return b"".join([
+            header,
+            self.start.astype("<f8", copy=False).tobytes(),
+            self.end.astype("<f8", copy=False).tobytes(),
+            self.text_offsets.astype("<u8", copy=False).tobytes(),
+            self.confidence.astype("<f4", copy=False).tobytes(),
+            self.text_ids.astype("<u4", copy=False).tobytes(),
+            self.suspect.tobytes(),
+            self.channel.tobytes(),
+            self.text_buffer,
+        ])
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "SegmentArray":
+        """Load a blob written by to_bytes(); the columns are views over data, not copies."""
+        magic, version, count, texts, text_bytes = _HEADER.unpack_from(data)
+        if magic != _MAGIC or version > _VERSION:
+            raise ValueError("Not a segment array (or written by a newer version)")
+        position = _HEADER.size
+
+        def column(dtype: str, length: int) -> np.ndarray:
+            nonlocal position
+            values = np.frombuffer(data, dtype, length, position)
+            position += values.nbytes
+            return values
+
+        # Widest types first so every column stays aligned
+        start = column("<f8", count)
+        end = column("<f8", count)
+        text_offsets = column("<u8", texts + 1)
+        confidence = column("<f4", count)
+        text_ids = column("<u4", count)
+        suspect = column("u1", count)
+        channel = column("u1", count) if version >= 2 else None
+        text_buffer = bytes(data[position:position + text_bytes])
+        return cls(start, end, confidence, suspect, text_ids, text_offsets, text_buffer, channel)
+
+    def __reduce__(self):
+        return (SegmentArray.from_bytes, (self.to_bytes(),))
+
+
+def compact_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Replace a transcription result's segment dicts with a SegmentArray, in place."""
+    result['segments'] = SegmentArray.from_segments(result['segments'])
+    return result
+
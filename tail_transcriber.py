@@ -0,0 +1,163 @@
+"""
+Tail mode: transcribe a recording while it is still being written.
+
+The file is polled for new audio. Each time another full window of audio is
+on disk it is decoded and transcribed, and the finished segments are appended
+to the file's `_transcription.txt`. The text transcribed so far is passed to
+Whisper as the prompt for the next window, so decoder context carries across
+increments. When the file stops growing for a while the remainder is
+transcribed and tail mode ends. Restarting tail mode on the same file resumes
+from the last timestamp already in the transcript.
+"""
+
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from audio_io import load_audio_region
+from audio_transcriber import get_output_file, append_segments, TranscriptionCancelled
+
+
+SAMPLE_RATE = 16000
+
+# Audio transcribed per increment; matches Whisper's own window
+TAIL_WINDOW_SECONDS = 30
+
+# Extra audio that must exist past a window before it counts as complete
+COMPLETE_MARGIN_SECONDS = 1.0
+
+DEFAULT_POLL_SECONDS = 5.0
+
+# A file that hasn't grown for this long is treated as finished
+DEFAULT_IDLE_SECONDS = 60.0
+
+# Characters of previous text given to the decoder as context
+PROMPT_CHARS = 200
+
+_LINE_RE = re.compile(r"^\[(\d+(?:\.\d+)?)s - (\d+(?:\.\d+)?)s\] ?(.*)$")
+
+
+def decode_region(file_path: str, start_seconds: float, duration_seconds: float,
+                  cancel_event: Optional[threading.Event] = None) -> np.ndarray:
+    """Decode part of a media file to 16 kHz mono float32 samples; ffmpeg is killed on cancel."""
+    return load_audio_region(file_path, start_seconds, duration_seconds, cancel_event, SAMPLE_RATE)
+
+
+def read_resume_point(transcript_path: str) -> Tuple[float, str]:
+    """Return the end time of the last transcribed segment and the recent text."""
+    if not os.path.exists(transcript_path):
+        return 0.0, ""
+    end = 0.0
+    texts = []
+    with open(transcript_path, "r") as f:
+        for line in f:
+            match = _LINE_RE.match(line.rstrip("\n"))
+            if match:
+                end = float(match.group(2))
+                texts.append(match.group(3))
+    return end, " ".join(texts)[-PROMPT_CHARS:]
+
+
+class TailTranscriber:
+    """Follows a growing media file and transcribes it window by window."""
+
+    def __init__(self, backend, file_path: str, decode_options: Optional[Dict[str, Any]] = None,
+                 window_seconds: float = TAIL_WINDOW_SECONDS,
+                 poll_seconds: float = DEFAULT_POLL_SECONDS,
+                 idle_seconds: float = DEFAULT_IDLE_SECONDS,
+                 progress_callback: Optional[Callable] = None,
+                 cancel_event: Optional[threading.Event] = None,
+                 guard_repetition: bool = False):
+        self.backend = backend
+        self.file_path = file_path
+        self.decode_options = dict(decode_options or {})
+        self.window_seconds = window_seconds
+        self.poll_seconds = poll_seconds
+        self.idle_seconds = idle_seconds
+        self.progress_callback = progress_callback
+        self.cancel_event = cancel_event or threading.Event()
+        self.guard_repetition = guard_repetition
+        self.output_file = get_output_file(file_path)
+        self.position, self.context = read_resume_point(self.output_file)
+        self.increments = 0
+        self.segments_written = 0
+
+    def _report(self, message: str):
+        if self.progress_callback:
+            self.progress_callback(message)
+
+    def _transcribe_window(self, audio: np.ndarray, final: bool) -> float:
+        """Transcribe audio starting at self.position; return how far the position advanced."""
+        result = self.backend.transcribe(audio, self.cancel_event, guard_repetition=self.guard_repetition,
+                                         initial_prompt=self.context or None, **self.decode_options)
+        segments = [s for s in result['segments'] if s['text'].strip()]
+        window_end = len(audio) / SAMPLE_RATE
+
+        if not final and len(segments) > 1:
+            # The last segment may stop mid-sentence at the window edge; redo it next time
+            segments = segments[:-1]
+            advance = segments[-1]['end']
+        else:
+            advance = window_end
+
+        append_segments(segments, self.output_file, offset=self.position)
+        self.segments_written += len(segments)
+        self.increments += 1
+        if segments:
+            self.context = (self.context + "".join(s['text'] for s in segments))[-PROMPT_CHARS:]
+        # Always move forward, even if Whisper's timestamps end early
+        return max(advance, min(window_end, 1.0))
+
+    def run(self) -> Dict[str, Any]:
+        """Follow the file until it stops growing or the session is cancelled."""
+        if self.position:
+            self._report(f"Resuming {os.path.basename(self.file_path)} at {self.position:.2f}s")
+        else:
+            open(self.output_file, "w").close()
+
+        last_size = -1
+        last_growth = time.monotonic()
+        finished = False
+        while not self.cancel_event.is_set():
+            size = os.path.getsize(self.file_path)
+            if size != last_size:
+                last_size = size
+                last_growth = time.monotonic()
+            stopped_growing = time.monotonic() - last_growth >= self.idle_seconds
+
+            window_samples = int(self.window_seconds * SAMPLE_RATE)
+            margin_samples = int(COMPLETE_MARGIN_SECONDS * SAMPLE_RATE)
+
+            try:
+                audio = decode_region(self.file_path, self.position, self.window_seconds + COMPLETE_MARGIN_SECONDS,
+                                      self.cancel_event)
+                # Audio just past the window edge may still be half-written; wait for the full margin
+                if len(audio) >= window_samples + margin_samples:
+                    self.position += self._transcribe_window(audio[:window_samples], final=False)
+                    self._report(f"Transcribed up to {self.position:.1f}s ({self.segments_written} segments)")
+                    continue  # There may be more complete windows already on disk
+
+                if stopped_growing:
+                    if len(audio):
+                        self.position += self._transcribe_window(audio, final=True)
+                    finished = True
+                    break
+            except TranscriptionCancelled:
+                break  # The unfinished window is redone when tail mode is resumed
+
+            self.cancel_event.wait(self.poll_seconds)
+
+        self._report(f"{'Finished' if finished else 'Stopped'} following {os.path.basename(self.file_path)} "
+                     f"at {self.position:.1f}s")
+        return {
+            'file': self.file_path,
+            'output_file': self.output_file,
+            'finished': finished,
+            'transcribed_seconds': self.position,
+            'increments': self.increments,
+            'segments': self.segments_written
+        }
@@ -0,0 +1,39 @@
+import threading
+
+from audio_transcriber import transcribe_audio
+from inference_backends import BackendCapabilities
+from progress_events import EventBus
+
+
+class RecordingBackend:
+    """A backend reporting the given capabilities that remembers the hooks it was handed."""
+    name = "recording"
+
+    def __init__(self, capabilities):
+        self._capabilities = capabilities
+        self.calls = []
+
+    def capabilities(self):
+        return self._capabilities
+
+    def transcribe(self, audio, cancel_event=None, on_window=None, guard_repetition=False, **decode_options):
+        self.calls.append({'cancel_event': cancel_event, 'on_window': on_window})
+        return {'text': " Hello.", 'segments': [{'start': 0.0, 'end': 1.0, 'text': " Hello."}], 'language': 'en'}
+
+
+def transcribe_with(tmp_path, capabilities):
+    backend = RecordingBackend(capabilities)
+    media_file = tmp_path / "talk.wav"
+    media_file.write_bytes(b"")
+    transcribe_audio(str(media_file), backend=backend, cancel_event=threading.Event(), events=EventBus())
+    return backend.calls[0]
+
+
+def test_hooks_are_passed_to_backends_that_support_them(tmp_path):
+    call = transcribe_with(tmp_path, BackendCapabilities(cancellable=True, window_events=True))
+    assert call['cancel_event'] is not None and call['on_window'] is not None
+
+
+def test_hooks_are_left_out_for_backends_without_them(tmp_path):
+    call = transcribe_with(tmp_path, BackendCapabilities())
+    assert call['cancel_event'] is None and call['on_window'] is None
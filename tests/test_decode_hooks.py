@@ -0,0 +1,122 @@
+import sys
+import threading
+from types import ModuleType, SimpleNamespace
+
+from decode_hooks import WindowMonitor, N_FRAMES
+from repetition_guard import REASON_REPETITION
+
+
+class FakeSegment:
+    """A column slice mel[:, seek:seek + frames] of a contiguous mel tensor."""
+
+    def __init__(self, seek, frames):
+        self.seek = seek
+        self.shape = (80, frames)
+
+    def dim(self):
+        return 2
+
+    def stride(self, dim):
+        return 1
+
+    def storage_offset(self):
+        return self.seek
+
+
+class FakeGuard:
+    fired = False
+
+    def __init__(self, reason):
+        self.reason = reason
+
+    def trim(self, result, window_end_token):
+        return result, self.reason
+
+
+TOKENIZER = SimpleNamespace(timestamp_begin=1000)
+
+# Whisper keeps these tokens (ending in a timestamp pair at 2 s) unless the window is skipped as silence
+SILENT_WINDOW = SimpleNamespace(tokens=[1000, 5, 1100, 1100], no_speech_prob=0.9, avg_logprob=-1.5)
+
+
+def hooked_monitor():
+    monitor = WindowMonitor(model=object(), guard_repetition=True)
+    monitor._segment_hooked = True  # What __enter__ sets up when whisper is installed
+    return monitor
+
+
+def test_guarded_window_after_no_speech_skip_is_flagged():
+    monitor = hooked_monitor()
+
+    # Window 1: skipped for no speech, so transcribe() seeks a whole window on
+    monitor._take_segment(FakeSegment(0, N_FRAMES), N_FRAMES)
+    assert monitor._start_window(None) is False
+    monitor.offset = monitor._window_start + monitor._window_advance(SILENT_WINDOW, TOKENIZER)
+
+    # Window 2: a short final window that loops
+    monitor._take_segment(FakeSegment(N_FRAMES, 1200), N_FRAMES)
+    assert monitor._start_window(None) is False
+    assert monitor._start_window(None) is True  # A fallback retry of the same window
+    monitor._apply_guard(FakeGuard(REASON_REPETITION), None, SILENT_WINDOW, 0)
+
+    assert monitor._window_start == 30.0
+    assert monitor._window_frames == 1200
+    segments = [
+        {'seek': N_FRAMES, 'start': 30.0, 'end': 34.0, 'text': " Words."},
+        {'seek': N_FRAMES, 'start': 34.0, 'end': 42.0, 'text': " La la la la."},
+    ]
+    monitor.mark_suspect_segments(segments, duration=42.0)
+    assert 'suspect' not in segments[0]
+    assert segments[1]['suspect'] == REASON_REPETITION
+
+
+def test_mirrored_seek_moves_a_whole_window_past_silence():
+    monitor = WindowMonitor(model=object())
+    mel = SimpleNamespace(shape=(80, N_FRAMES))
+    monitor._start_window(mel)
+    assert monitor._window_advance(SILENT_WINDOW, TOKENIZER) == 30.0
+
+    monitor.no_speech_threshold = None
+    assert monitor._window_advance(SILENT_WINDOW, TOKENIZER) == 2.0
+
+
+def fake_whisper(monkeypatch):
+    """A whisper.transcribe module whose pad_or_trim the monitors wrap."""
+    def pad_or_trim(array, length=N_FRAMES):
+        return array
+    transcribe_module = ModuleType("whisper.transcribe")
+    transcribe_module.pad_or_trim = pad_or_trim
+    whisper = ModuleType("whisper")
+    whisper.transcribe = transcribe_module
+    monkeypatch.setitem(sys.modules, "whisper", whisper)
+    monkeypatch.setitem(sys.modules, "whisper.transcribe", transcribe_module)
+    return transcribe_module, pad_or_trim
+
+
+def test_overlapping_monitors_keep_their_own_windows(monkeypatch):
+    transcribe_module, original = fake_whisper(monkeypatch)
+    first = WindowMonitor(model=SimpleNamespace())
+    second = WindowMonitor(model=SimpleNamespace())
+    second_entered, first_exited, second_done = threading.Event(), threading.Event(), threading.Event()
+
+    def other_job():
+        with second:
+            second_entered.set()
+            first_exited.wait(5)
+            # The first monitor has gone; this thread's windows still reach the second
+            transcribe_module.pad_or_trim(FakeSegment(N_FRAMES, N_FRAMES), N_FRAMES)
+        second_done.set()
+
+    thread = threading.Thread(target=other_job)
+    with first:
+        thread.start()
+        second_entered.wait(5)
+        transcribe_module.pad_or_trim(FakeSegment(2 * N_FRAMES, 500), N_FRAMES)
+    assert transcribe_module.pad_or_trim is not original  # Still in use by the second monitor
+    first_exited.set()
+    second_done.wait(5)
+    thread.join(5)
+
+    assert first._next_window == (2 * N_FRAMES, 500)
+    assert second._next_window == (N_FRAMES, N_FRAMES)
+    assert transcribe_module.pad_or_trim is original
@@ -0,0 +1,32 @@
+import memory_budget
+from memory_budget import MemoryAdmissionController, PeakRSSSampler
+
+
+def run_job(monkeypatch, rss_mb, baseline_mb=None):
+    """Measure a job during which the process's RSS stays at rss_mb."""
+    monkeypatch.setattr(memory_budget, 'current_rss_mb', lambda pid=None: rss_mb)
+    with PeakRSSSampler(interval=60, baseline_mb=baseline_mb) as sampler:
+        pass
+    return sampler.growth_mb
+
+
+def test_reused_worker_does_not_lower_the_correction(monkeypatch):
+    admission = MemoryAdmissionController('tiny', budget_mb=8192)
+    model_loaded_mb = 600.0
+
+    # The first job takes the worker from 600 MB to 900 MB; the allocator keeps
+    # that memory, so the second (same-sized) job starts and peaks at 900 MB
+    measurements = []
+    for job in ("first.wav", "second.wav"):
+        assert admission.try_admit(job, admission.estimate_job_mb(None))
+        measured = run_job(monkeypatch, 900.0, baseline_mb=model_loaded_mb)
+        admission.release(job, measured)
+        measurements.append(measured)
+
+    assert measurements == [300.0, 300.0]
+    assert admission.correction > 1.0  # The nominal 150 MB was too low, and stays corrected
+
+
+def test_growth_from_job_start_misses_retained_memory(monkeypatch):
+    # What the worker used to report for the second job above
+    assert run_job(monkeypatch, 900.0) == 0.0
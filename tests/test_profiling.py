@@ -0,0 +1,46 @@
+import os
+
+from profiling import FileProfiler
+
+
+class FakeCapabilities:
+    torch_ops = False
+
+
+class FakeBackend:
+    name = "fake"
+
+    def capabilities(self):
+        return FakeCapabilities()
+
+    def profile_stages(self):
+        return {}
+
+
+def test_unwritable_profiles_folder_does_not_fail_the_file(tmp_path):
+    media_file = tmp_path / "talk.wav"
+    (tmp_path / "profiles").write_text("a file where the folder should be")
+
+    with FileProfiler(FakeBackend(), str(media_file)) as profiler:
+        pass
+
+    profile = profiler.profile
+    assert profile.summary_file is None
+    assert profile.errors and profile.errors[0].startswith("profiles folder")
+
+
+def test_failed_dump_still_writes_the_summary(tmp_path, monkeypatch):
+    media_file = tmp_path / "talk.wav"
+
+    def full_disk(self, path):
+        raise OSError(28, "No space left on device")
+    monkeypatch.setattr("cProfile.Profile.dump_stats", full_disk)
+
+    with FileProfiler(FakeBackend(), str(media_file)) as profiler:
+        pass
+
+    profile = profiler.profile
+    assert profile.stats_file is None
+    assert os.path.exists(profile.summary_file)
+    with open(profile.summary_file) as f:
+        assert "Not saved: cProfile dump" in f.read()
@@ -0,0 +1,20 @@
+from progress_events import EventBus, StatusMessage
+
+
+def test_close_delivers_queued_events_and_stops_the_thread():
+    bus = EventBus()
+    received = []
+    bus.subscribe(lambda event: received.append(event.text))
+    for i in range(3):
+        bus.publish(StatusMessage(f"message {i}"))
+    thread = bus._thread
+
+    bus.close()
+
+    assert received == ["message 0", "message 1", "message 2"]
+    assert not thread.is_alive()
+    # A closed bus drops late events instead of starting another thread
+    bus.publish(StatusMessage("too late"))
+    assert bus.flush()
+    assert received == ["message 0", "message 1", "message 2"]
+    bus.close()
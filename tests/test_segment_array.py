@@ -0,0 +1,18 @@
+import pickle
+
+from segment_array import SegmentArray
+
+
+def test_pickle_round_trip_keeps_every_column():
+    segments = [
+        {'start': 0.0, 'end': 2.5, 'text': " Hello.", 'channel': 1},
+        {'start': 2.5, 'end': 4.0, 'text': " La la la.", 'suspect': "repetition", 'channel': 2},
+        {'start': 4.0, 'end': 5.0, 'text': " Hello."},
+    ]
+    restored = pickle.loads(pickle.dumps(SegmentArray.from_segments(segments)))
+
+    assert [(s['start'], s['end'], s['text'], s['suspect'], s['channel']) for s in restored] == [
+        (0.0, 2.5, " Hello.", None, 1),
+        (2.5, 4.0, " La la la.", "repetition", 2),
+        (4.0, 5.0, " Hello.", None, None),
+    ]
@@ -0,0 +1,77 @@
+import sys
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import audio_io
+import tail_transcriber
+from audio_transcriber import TranscriptionCancelled
+from tail_transcriber import TailTranscriber, SAMPLE_RATE, COMPLETE_MARGIN_SECONDS
+
+WINDOW_SECONDS = 2.0
+
+
+class FakeBackend:
+    def __init__(self):
+        self.lengths = []
+
+    def transcribe(self, audio, cancel_event=None, guard_repetition=False, **decode_options):
+        self.lengths.append(len(audio))
+        end = len(audio) / SAMPLE_RATE
+        return {'segments': [{'start': 0.0, 'end': end / 2, 'text': " one"},
+                             {'start': end / 2, 'end': end, 'text': " two"}]}
+
+
+def follow(tmp_path, monkeypatch, seconds_on_disk, idle_seconds):
+    """Tail a file whose decodable audio is seconds_on_disk long; cancel it on the second poll."""
+    media_file = tmp_path / "recording.wav"
+    media_file.write_bytes(b"")
+    backend = FakeBackend()
+    tail = TailTranscriber(backend, str(media_file), window_seconds=WINDOW_SECONDS,
+                           poll_seconds=0, idle_seconds=idle_seconds)
+
+    polls = []
+
+    def decode_region(file_path, start_seconds, duration_seconds, cancel_event=None):
+        polls.append(start_seconds)
+        if len(polls) > 1:
+            tail.cancel_event.set()
+        available = max(0.0, min(duration_seconds, seconds_on_disk - start_seconds))
+        return np.zeros(int(available * SAMPLE_RATE), np.float32)
+    monkeypatch.setattr(tail_transcriber, 'decode_region', decode_region)
+
+    result = tail.run()
+    return backend.lengths, result
+
+
+def test_audio_inside_the_margin_is_not_a_complete_window(tmp_path, monkeypatch):
+    seconds_on_disk = WINDOW_SECONDS + COMPLETE_MARGIN_SECONDS / 2
+
+    # Still growing: wait for the margin instead of cutting a window at the edge
+    lengths, result = follow(tmp_path, monkeypatch, seconds_on_disk, idle_seconds=3600)
+    assert lengths == []
+
+    # Stopped growing: everything on disk goes into the final window
+    lengths, result = follow(tmp_path, monkeypatch, seconds_on_disk, idle_seconds=0)
+    assert lengths == [int(seconds_on_disk * SAMPLE_RATE)]
+    assert result['finished']
+
+
+def test_window_with_the_full_margin_is_transcribed(tmp_path, monkeypatch):
+    lengths, _ = follow(tmp_path, monkeypatch, WINDOW_SECONDS + COMPLETE_MARGIN_SECONDS, idle_seconds=3600)
+    assert lengths[0] == int(WINDOW_SECONDS * SAMPLE_RATE)
+
+
+
+def test_cancel_stops_a_decode_that_produces_nothing_yet():
+    # Stands in for an ffmpeg that is slow to produce anything (seeking in a large recording)
+    quiet_decoder = [sys.executable, "-c", "import time; time.sleep(30)"]
+    cancel_event = threading.Event()
+    threading.Timer(0.2, cancel_event.set).start()
+
+    start = time.monotonic()
+    with pytest.raises(TranscriptionCancelled):
+        audio_io._run_ffmpeg(quiet_decoder, cancel_event, check=False)
+    assert time.monotonic() - start < 5
@@ -0,0 +1,35 @@
+from throughput_stats import RealTimeFactorHistory, ThroughputEstimator
+
+
+def make_estimator(tmp_path, durations):
+    history = RealTimeFactorHistory(str(tmp_path / "throughput_stats.json"))
+    return ThroughputEstimator('tiny', durations, history)
+
+
+def test_concurrent_files_do_not_skew_the_single_file_speed(tmp_path):
+    estimator = make_estimator(tmp_path, {'a.wav': 600.0, 'b.wav': 600.0, 'c.wav': 600.0})
+    estimator.file_finished('a.wav', 60.0)  # On its own: RTF 0.1
+
+    # Four at once, each file takes four times as long
+    estimator.set_execution("4 files at once", 4)
+    estimator.file_finished('b.wav', 240.0)
+
+    history = estimator.history
+    assert history.real_time_factor('tiny') == 0.1
+    assert history.real_time_factor('tiny', "4 files at once") == 0.4
+    # A split file is faster than either; it is kept apart too
+    estimator.file_finished('c.wav', 15.0, mode="split across 8 workers")
+    assert history.real_time_factor('tiny') == 0.1
+    # Modes never measured start from the single-file speed
+    assert history.real_time_factor('tiny', "2 files at once") == 0.1
+
+
+def test_remaining_time_counts_the_files_running_at_once(tmp_path):
+    durations = {f"{i}.wav": 600.0 for i in range(8)}
+    estimator = make_estimator(tmp_path, durations)
+    estimator.history.record('tiny', 600.0, 240.0, "4 files at once")
+
+    estimator.set_execution("4 files at once", 4)
+    # 8 files of 240 s each, four progressing together
+    assert estimator.planned_total_seconds() == 480.0
+    assert estimator.remaining_seconds() == 480.0
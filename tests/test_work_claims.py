@@ -0,0 +1,107 @@
+import multiprocessing
+import os
+import time
+import wave
+
+import numpy as np
+
+from work_claims import ClaimManager, CLAIMS_DIR_NAME
+
+WORKERS = 3
+FILES = 8
+
+
+def write_clips(directory, count, seconds=2.0, rate=16000):
+    t = np.arange(int(seconds * rate)) / rate
+    names = []
+    for i in range(count):
+        name = f"clip_{i:02d}.wav"
+        with wave.open(os.path.join(directory, name), "wb") as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(rate)
+            wav_file.writeframes((0.3 * np.sin(2 * np.pi * (200 + 20 * i) * t) * 32767).astype("<i2").tobytes())
+        names.append(name)
+    return names
+
+
+def run_worker(worker_id, directory, files, finished):
+    """One distributed worker with the stub backend; reports the files it transcribed."""
+    from progress_events import FileFinished
+    from transcription_core import TranscriptionSession
+
+    session = TranscriptionSession('stub', backend='stub', language='en',
+                                   backend_options={'seconds_per_window': 0.05})
+    done_here = []
+    session.events.subscribe(lambda event: done_here.append(event.file), FileFinished)
+    assert session.load_model()
+    claims = ClaimManager(directory, worker_id=worker_id, lease_seconds=30)
+    session.transcribe_claimed(files, directory, claims, poll_seconds=0.1)
+    session.close()
+    finished.put((worker_id, done_here))
+
+
+def test_several_processes_transcribe_each_file_once(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))  # Keep the speed history out of the real home folder
+    directory = tmp_path / "shared"
+    directory.mkdir()
+    files = write_clips(str(directory), FILES)
+
+    context = multiprocessing.get_context("spawn")
+    finished = context.Queue()
+    workers = [context.Process(target=run_worker, args=(f"worker-{i}", str(directory), files, finished))
+               for i in range(WORKERS)]
+    for worker in workers:
+        worker.start()
+    reports = [finished.get(timeout=120) for _ in workers]
+    for worker in workers:
+        worker.join(timeout=30)
+        assert worker.exitcode == 0
+
+    transcribed = sorted(name for _, names in reports for name in names)
+    assert transcribed == sorted(files)
+    claims_dir = directory / CLAIMS_DIR_NAME
+    assert sorted(p.name for p in claims_dir.glob("*.done")) == sorted(f"{name}.done" for name in files)
+    assert not list(claims_dir.glob("*.lease"))
+    for name in files:
+        assert (directory / "transcriptions" / f"{os.path.splitext(name)[0]}_transcription.txt").exists()
+
+
+def test_stale_lease_is_taken_over(tmp_path):
+    dead = ClaimManager(str(tmp_path), worker_id="dead", lease_seconds=60)
+    assert dead.try_claim("talk.wav")
+    dead._stop.set()  # The worker died: no more heartbeats
+    lease = os.path.join(dead.claims_dir, "talk.wav.lease")
+    stale = time.time() - 600
+    os.utime(lease, (stale, stale))
+
+    alive = ClaimManager(str(tmp_path), worker_id="alive", lease_seconds=60)
+    assert alive.try_claim("talk.wav")
+    assert alive.owns("talk.wav") and not dead.owns("talk.wav")
+    alive.close()
+
+
+def test_fresh_lease_is_not_taken_over(tmp_path):
+    first = ClaimManager(str(tmp_path), worker_id="first", lease_seconds=60)
+    second = ClaimManager(str(tmp_path), worker_id="second", lease_seconds=60)
+    assert first.try_claim("talk.wav")
+    assert not second.try_claim("talk.wav")
+    first.close()
+    second.close()
+
+
+def test_failed_file_is_handed_to_another_worker(tmp_path):
+    workers = [ClaimManager(str(tmp_path), worker_id=f"worker-{i}", max_attempts=2) for i in range(3)]
+
+    assert workers[0].try_claim("talk.wav")
+    assert not workers[0].complete("talk.wav", success=False)
+    assert not workers[0].is_done("talk.wav")
+    assert workers[0].pending(["talk.wav"]) == []  # Not retried by the worker that failed it
+    assert not workers[0].try_claim("talk.wav")
+
+    assert workers[1].try_claim("talk.wav")
+    assert workers[1].complete("talk.wav", success=False)  # Second failure: given up on
+    assert workers[2].pending(["talk.wav"]) == []
+    assert [a['worker'] for a in workers[2].failures("talk.wav")] == ["worker-0", "worker-1"]
+    for claims in workers:
+        claims.close()
@@ -0,0 +1,241 @@
+"""
+Throughput statistics and ETA estimation for transcription runs.
+Keeps a small per-machine history of measured real-time factors (processing
+time divided by audio duration) for each model and uses it, together with
+probed media durations, to plan runs and estimate time remaining.
+
+A file's wall time depends on how it was run: several files at once each take
+longer, a file split across chunk workers takes less. Measurements are kept
+per execution mode (see mode_key()) so one mode doesn't skew the estimates
+of another, and the time remaining is divided by the number of files running
+at once.
+"""
+
+import json
+import os
+import re
+import subprocess
+import time
+import wave
+from typing import Dict, List, Optional
+
+from audio_transcriber import get_ffmpeg_path
+
+
+# Rough CPU real-time factors used until this machine has measured its own
+DEFAULT_REAL_TIME_FACTORS = {
+    'tiny': 0.05,
+    'base': 0.10,
+    'small': 0.30
+}
+
+# Weight given to the newest measurement when updating the stored history
+HISTORY_SMOOTHING = 0.3
+
+_DURATION_RE = re.compile(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)")
+
+
+def get_stats_file() -> str:
+    """Get the path of the local throughput statistics file."""
+    return os.path.join(os.path.expanduser("~"), ".audio_transcriber", "throughput_stats.json")
+
+
+def probe_media_duration(file_path: str) -> Optional[float]:
+    """Return the duration of a media file in seconds, or None if unknown."""
+    if file_path.lower().endswith('.wav'):
+        try:
+            with wave.open(file_path, 'rb') as wav_file:
+                return wav_file.getnframes() / float(wav_file.getframerate())
+        except (wave.Error, EOFError, OSError):
+            pass  # Not a plain PCM WAV; let ffmpeg work it out
+
+    try:
+        # ffmpeg prints the container duration to stderr even without an output
+        proc = subprocess.run(
+            [get_ffmpeg_path(), "-hide_banner", "-nostdin", "-i", file_path],
+            capture_output=True, text=True, timeout=30
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+
+    match = _DURATION_RE.search(proc.stderr)
+    if not match:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def mode_key(model_name: str, mode: Optional[str] = None) -> str:
+    """History key for a model run in an execution mode (None: one whole file at a time)."""
+    return model_name if mode is None else f"{model_name} [{mode}]"
+
+
+def format_duration(seconds: float) -> str:
+    """Format a number of seconds for display, e.g. '1h 05m', '3m 20s', '45s'."""
+    seconds = max(0, int(round(seconds)))
+    hours, remainder = divmod(seconds, 3600)
+    minutes, secs = divmod(remainder, 60)
+    if hours:
+        return f"{hours}h {minutes:02d}m"
+    if minutes:
+        return f"{minutes}m {secs:02d}s"
+    return f"{secs}s"
+
+
+class RealTimeFactorHistory:
+    """Measured real-time factor per model, persisted across runs."""
+
+    def __init__(self, stats_file: Optional[str] = None):
+        self.stats_file = stats_file or get_stats_file()
+        self.models = {}
+        self.load()
+
+    def load(self):
+        """Load the history from disk, starting fresh if it is missing or corrupt."""
+        try:
+            with open(self.stats_file, "r") as f:
+                data = json.load(f)
+            self.models = data.get('models', {})
+        except (OSError, ValueError):
+            self.models = {}
+
+    def save(self):
+        """Write the history to disk. Failures are ignored; stats are best effort."""
+        try:
+            os.makedirs(os.path.dirname(self.stats_file), exist_ok=True)
+            tmp_file = self.stats_file + ".tmp"
+            with open(tmp_file, "w") as f:
+                json.dump({'models': self.models}, f, indent=2)
+            os.replace(tmp_file, self.stats_file)
+        except OSError:
+            pass
+
+    def real_time_factor(self, model_name: str, mode: Optional[str] = None) -> float:
+        """
+        Get the expected real-time factor for a model on this machine. A mode
+        not measured yet falls back to the model's one-file-at-a-time speed.
+        """
+        for key in (mode_key(model_name, mode), model_name):
+            entry = self.models.get(key)
+            if entry and entry.get('rtf'):
+                return entry['rtf']
+        return DEFAULT_REAL_TIME_FACTORS.get(model_name, 0.25)
+
+    def has_measurements(self, model_name: str, mode: Optional[str] = None) -> bool:
+        """Check whether the model has been measured on this machine (in this mode)."""
+        return bool(self.models.get(mode_key(model_name, mode), {}).get('samples'))
+
+    def record(self, model_name: str, audio_seconds: float, elapsed_seconds: float, mode: Optional[str] = None):
+        """Record one measured transcription."""
+        if audio_seconds <= 0 or elapsed_seconds <= 0:
+            return
+        measured = elapsed_seconds / audio_seconds
+        entry = self.models.setdefault(mode_key(model_name, mode), {'rtf': None, 'samples': 0, 'audio_seconds': 0.0})
+        if entry['rtf']:
+            entry['rtf'] = (1 - HISTORY_SMOOTHING) * entry['rtf'] + HISTORY_SMOOTHING * measured
+        else:
+            entry['rtf'] = measured
+        entry['samples'] += 1
+        entry['audio_seconds'] += audio_seconds
+
+
+class ThroughputEstimator:
+    """Plans a run up front and tracks ETA and files per hour while it runs."""
+
+    def __init__(self, model_name: str, durations: Dict[str, Optional[float]],
+                 history: Optional[RealTimeFactorHistory] = None):
+        self.model_name = model_name
+        self.durations = durations
+        self.history = history or RealTimeFactorHistory()
+        # How the files are run: the history's mode, and how many run at once
+        self.mode = None
+        self.parallelism = 1
+        self.start_time = None
+        self.finished_files = 0
+        self.processed_audio = 0.0
+        self.processed_elapsed = 0.0
+        self.done = set()
+
+        known = [d for d in durations.values() if d]
+        # Files we could not probe are assumed to be as long as the average one
+        self.average_duration = sum(known) / len(known) if known else 0.0
+
+    def _duration(self, file_path: str) -> float:
+        return self.durations.get(file_path) or self.average_duration
+
+    @property
+    def total_audio_seconds(self) -> float:
+        return sum(self._duration(f) for f in self.durations)
+
+    def set_execution(self, mode: Optional[str], parallelism: int = 1):
+        """Estimate for files run in the given mode, parallelism of them at once."""
+        self.mode = mode
+        self.parallelism = max(1, parallelism)
+
+    def current_real_time_factor(self) -> float:
+        """Blend the stored history with the speed measured so far in this run (per file)."""
+        prior = self.history.real_time_factor(self.model_name, self.mode)
+        if self.processed_audio <= 0:
+            return prior
+        measured = self.processed_elapsed / self.processed_audio
+        # Trust this run more as it covers more audio (fully after ~10 minutes)
+        weight = min(1.0, self.processed_audio / 600.0)
+        return (1 - weight) * prior + weight * measured
+
+    def planned_total_seconds(self) -> float:
+        """Estimated processing time for the whole run before it starts."""
+        return (self.total_audio_seconds * self.history.real_time_factor(self.model_name, self.mode)
+                / self.parallelism)
+
+    def start(self):
+        self.start_time = time.monotonic()
+
+    def file_finished(self, file_path: str, elapsed_seconds: float, success: bool = True,
+                      mode: Optional[str] = None):
+        """
+        Record a finished file and feed successful measurements into the
+        history, under mode if given (a file run differently from the rest).
+        """
+        self.done.add(file_path)
+        self.finished_files += 1
+        audio_seconds = self.durations.get(file_path)
+        if success and audio_seconds:
+            self.processed_audio += audio_seconds
+            self.processed_elapsed += elapsed_seconds
+            self.history.record(self.model_name, audio_seconds, elapsed_seconds, mode or self.mode)
+
+    def remaining_seconds(self) -> float:
+        remaining_audio = sum(self._duration(f) for f in self.durations if f not in self.done)
+        return remaining_audio * self.current_real_time_factor() / self.parallelism
+
+    def files_per_hour(self) -> Optional[float]:
+        if not self.start_time or not self.finished_files:
+            return None
+        elapsed = time.monotonic() - self.start_time
+        return self.finished_files * 3600.0 / elapsed if elapsed > 0 else None
+
+    def plan_summary(self) -> str:
+        """One-line description of the planned run."""
+        unknown = sum(1 for d in self.durations.values() if not d)
+        summary = (f"{len(self.durations)} files, {format_duration(self.total_audio_seconds)} of audio, "
+                   f"estimated {format_duration(self.planned_total_seconds())} with '{self.model_name}'")
+        if not self.history.has_measurements(self.model_name, self.mode):
+            summary += " (first run on this machine, rough estimate)"
+        if unknown:
+            summary += f" ({unknown} file(s) of unknown length)"
+        return summary
+
+    def progress_summary(self) -> str:
+        """One-line live ETA and throughput description."""
+        summary = f"ETA {format_duration(self.remaining_seconds())}"
+        rate = self.files_per_hour()
+        if rate is not None:
+            summary += f" · {rate:.1f} files/hour"
+        return summary
+
+
+def plan_files(model_name: str, file_paths: List[str],
+               history: Optional[RealTimeFactorHistory] = None) -> ThroughputEstimator:
+    """Probe the files' durations and create an estimator for them."""
+    durations = {path: probe_media_duration(path) for path in file_paths}
+    return ThroughputEstimator(model_name, durations, history)
@@ -5,7 +5,22 @@ This module contains all the shared functionality for audio/video transcription.
 
 import os
 import sys
-from typing import List, Optional, Callable, Dict, Any
+import time
+import threading
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import wait, FIRST_COMPLETED
+from typing import List, Optional, Callable, Dict, Any, Tuple
+
+from throughput_stats import ThroughputEstimator, plan_files
+from work_claims import ClaimManager
+from memory_budget import MemoryAdmissionController, PeakRSSSampler, current_rss_mb
+from repetition_guard import merge_guard_stats, format_guard_stats
+from inference_backends import create_backend, DEFAULT_BACKEND
+from progress_events import (
+    EventBus, callback_adapter, StatusMessage, JobQueued, FileStarted,
+    FileFinished, FileCancelled, EtaUpdated, Error, ProfileWritten, WindowDecoded, TranscriptStored
+)
 
 
 def setup_ffmpeg_path():
@@ -40,15 +55,11 @@ setup_ffmpeg_path()
 setup_whisper_assets()
 
 
-# Import whisper and audio_transcriber only when needed
+# Whisper itself is imported by the inference backend that uses it
 try:
-    import whisper
-    WHISPER_AVAILABLE = True
-except ImportError:
-    WHISPER_AVAILABLE = False
-
-try:
-    from audio_transcriber import transcribe_with_retry
+    from audio_transcriber import (
+        transcribe_with_retry, TranscriptionCancelled, get_output_file, store_transcription
+    )
     TRANSCRIBER_AVAILABLE = True
 except ImportError:
     TRANSCRIBER_AVAILABLE = False
@@ -68,6 +79,49 @@ MODEL_DESCRIPTIONS = {
     'small': 'Slower but more accurate'
 }
 
+# Named decoding profiles passed through to Whisper's transcribe()
+DECODING_PROFILES = {
+    # Greedy decoding, no temperature fallback and no cross-window prompting,
+    # so every 30 s window is decoded exactly once
+    'fast': {
+        'beam_size': None,
+        'best_of': None,
+        'temperature': (0.0,),
+        'condition_on_previous_text': False,
+    },
+    # Whisper's own defaults
+    'balanced': {
+        'beam_size': None,
+        'best_of': None,
+        'temperature': (0.0, 0.2, 0.4, 0.6, 0.8, 1.0),
+        'condition_on_previous_text': True,
+    },
+    # Beam search plus the full fallback schedule
+    'accurate': {
+        'beam_size': 5,
+        'best_of': 5,
+        'temperature': (0.0, 0.2, 0.4, 0.6, 0.8, 1.0),
+        'condition_on_previous_text': True,
+    },
+}
+
+DEFAULT_DECODING_PROFILE = 'balanced'
+
+PROFILE_DESCRIPTIONS = {
+    'fast': 'Quickest, may miss words on noisy audio',
+    'balanced': 'Standard Whisper settings (recommended)',
+    'accurate': 'Beam search, slowest but most careful'
+}
+
+# Inference engines (see compiled_engine.py); compiled parts must match eager mode exactly
+ENGINE_DESCRIPTIONS = {
+    'eager': 'Plain PyTorch (no warm-up)',
+    'torchscript': 'Traced encoder and decoder MLPs, cached on disk',
+    'compile': 'torch.compile; slow first launch, cached afterwards'
+}
+
+DEFAULT_ENGINE = 'eager'
+
 
 def is_media_file(filename: str) -> bool:
     """Check if a file is a supported audio/video file."""
@@ -97,54 +151,454 @@ def get_search_directory() -> str:
 class TranscriptionSession:
     """Manages a transcription session with progress tracking."""
     
-    def __init__(self, model_name: str = 'base', progress_callback: Optional[Callable] = None):
+    def __init__(self, model_name: str = 'base', progress_callback: Optional[Callable] = None,
+                 eta_callback: Optional[Callable] = None,
+                 decoding_profile: str = DEFAULT_DECODING_PROFILE, language: Optional[str] = None,
+                 split_long_files: bool = False, chunk_workers: Optional[int] = None,
+                 chunk_seconds: float = 600, concurrent_jobs: int = 1,
+                 memory_budget_mb: Optional[float] = None, events: Optional[EventBus] = None,
+                 guard_repetition: bool = True, engine: str = DEFAULT_ENGINE,
+                 backend: str = DEFAULT_BACKEND, profile: bool = False, pack_short_clips: bool = False,
+                 backend_options: Optional[Dict[str, Any]] = None, multichannel: bool = False):
         self.model_name = model_name
+        self.model_path = None
+        self.decoding_profile = decoding_profile
+        self.language = language
+        self.decode_options = get_decoding_options(decoding_profile, language)
+        # The inference backend (see inference_backends.py) and its model once loaded
+        self.backend_name = backend
+        self.backend_options = dict(backend_options or {})
+        self.backend = None
         self.model = None
+        self.engine = engine
+        self.engine_report = None
         self.progress_callback = progress_callback
+        self.eta_callback = eta_callback
+        # Progress is published as typed events; the string callbacks are one subscriber
+        self.events = events or EventBus()
+        if progress_callback or eta_callback:
+            self.events.subscribe(callback_adapter(progress_callback, eta_callback))
+        self.estimator = None
         self.is_cancelled = False
+        # Checked inside the decoding loop so a cancel takes effect mid-file
+        self.cancel_event = threading.Event()
+        # Cut runaway repetition loops short while decoding (see repetition_guard.py)
+        self.guard_repetition = guard_repetition
+        # Save a CPU and operator profile of every file (see profiling.py)
+        self.profile = profile
+        # Transcribe short clips several to a window (see clip_packing.py)
+        self.pack_short_clips = pack_short_clips
+        
+        # Long files can be split at pauses and their chunks transcribed in parallel
+        self.split_long_files = split_long_files
+        self.chunk_workers = chunk_workers
+        self.chunk_seconds = chunk_seconds
+        self.chunker = None
+        
+        # Each channel transcribed on its own, in parallel (see multichannel.py)
+        self.multichannel = multichannel
+        self.channel_transcriber = None
+        
+        # Concurrent jobs (and chunk workers) are admitted within a RAM budget
+        self.concurrent_jobs = max(1, concurrent_jobs)
+        self.memory_budget_mb = memory_budget_mb
+        self.admission = None
+        self._reserved_worker_mb = 0.0
+        self._loaded_rss_mb = None
+    
+    def plan(self, file_paths: List[str], durations: Optional[Dict[str, Optional[float]]] = None) -> ThroughputEstimator:
+        """
+        Probe the files (unless their durations are given) and estimate how long
+        transcribing them will take. The plan is reused by transcribe_files()
+        for live ETA updates.
+        """
+        if durations is None:
+            self.estimator = plan_files(self.history_key, file_paths)
+        else:
+            self.estimator = ThroughputEstimator(self.history_key, durations)
+        if self.concurrent_jobs > 1 and len(file_paths) > 1 and not (self.profile or self.multichannel):
+            # Until the memory budget has had its say, assume every job slot is used
+            jobs = min(self.concurrent_jobs, len(file_paths))
+            self.estimator.set_execution(self._concurrent_mode(jobs), jobs)
+        return self.estimator
+    
+    @staticmethod
+    def _concurrent_mode(jobs: int) -> str:
+        return f"{jobs} files at once"
+    
+    @property
+    def history_key(self) -> str:
+        """Name this machine's measured speed is stored under; each backend keeps its own."""
+        if self.backend_name == DEFAULT_BACKEND:
+            return self.model_name
+        return f"{self.backend_name}:{self.model_name}"
+    
+    def _status(self, message: str):
+        self.events.publish(StatusMessage(message))
+    
+    def _publish_eta(self):
+        self.events.publish(EtaUpdated(
+            self.estimator.progress_summary(), self.estimator.remaining_seconds(),
+            self.estimator.files_per_hour()
+        ))
         
     def load_model(self) -> bool:
-        """Load the Whisper model from the bundled directory. Returns True if successful."""
-        if not WHISPER_AVAILABLE:
-            if self.progress_callback:
-                self.progress_callback("Error: Whisper not installed. Please install openai-whisper.")
-            return False
-
+        """Load the model through the session's inference backend. Returns True if successful."""
         try:
-            if self.progress_callback:
-                self.progress_callback(f"Loading transcription model '{self.model_name}'...")
-
-            # Check for bundled models in the 'models' directory
-            if getattr(sys, 'frozen', False):  # Running as a PyInstaller bundle
-                base_path = sys._MEIPASS
-            else:  # Running as a script
-                base_path = os.path.dirname(os.path.abspath(__file__))
-
-            model_path = os.path.join(base_path, "models", f"{self.model_name}.pt")
-            if os.path.exists(model_path):
-                self.model = whisper.load_model(model_path)
-            else:
-                raise FileNotFoundError(f"Model '{self.model_name}' not found in bundled models directory.")
+            self._status(f"Loading transcription model '{self.model_name}'...")
+            backend = create_backend(self.backend_name, self.model_name, engine=self.engine,
+                                     **self.backend_options)
+            if self.engine != 'eager':
+                self._status(f"Preparing the {self.engine} engine...")
+            backend.load()
+            self.attach_backend(backend)
 
-            if self.progress_callback:
-                self.progress_callback("Transcription model loaded successfully.")
+            self._status("Transcription model loaded successfully.")
 
             return True
         except Exception as e:
-            if self.progress_callback:
-                self.progress_callback(f"Error loading model: {str(e)}")
+            self.events.publish(Error(f"Could not load model: {str(e)}"))
+            return False
+        finally:
+            self.events.flush()
+    
+    def attach_backend(self, backend):
+        """Use a backend that is already loaded (load_model() calls this; so does the background service)."""
+        self.backend = backend
+        self.model = backend.model
+        # Per-file memory is measured from here, not from whatever earlier files left allocated
+        self._loaded_rss_mb = current_rss_mb()
+        self.model_path = getattr(backend, 'model_path', None)
+        self.engine_report = getattr(backend, 'engine_report', None)
+        if self.engine_report is not None:
+            self._status(self.engine_report.summary())
+        capabilities = backend.capabilities()
+        if self.guard_repetition and not capabilities.repetition_guard:
+            self._status(f"The {backend.name} backend has no repetition guard; loops won't be cut short")
+            self.guard_repetition = False
+        if not capabilities.cancellable:
+            self._status(f"The {backend.name} backend can't stop mid-file; a cancel waits for the current file")
+    
+    def _check_ready(self):
+        if self.backend is None:
+            raise ValueError("Model not loaded. Call load_model() first.")
+        
+        if not TRANSCRIBER_AVAILABLE:
+            raise ValueError("Audio transcriber not available. Please check audio_transcriber.py.")
+    
+    def _start_estimates(self, full_paths: List[str]):
+        if self.estimator is None or not set(full_paths) <= set(self.estimator.durations):
+            self.plan(full_paths)
+        if self.estimator.start_time is None:
+            self.estimator.start()
+        self._publish_eta()
+    
+    def _get_transcribe_fn(self, full_path: str) -> Tuple[Optional[Callable], Optional[str]]:
+        """
+        Pick the per-channel or chunked parallel path when it is enabled.
+        Returns the function and the execution mode its speed is recorded under.
+        """
+        if self.profile:
+            return None, None
+        if self.multichannel:
+            channel_transcriber = self._get_channel_transcriber()
+            return channel_transcriber.transcribe, f"channels across {channel_transcriber.workers} workers"
+        if not self.split_long_files:
+            return None, None
+        duration = self.estimator.durations.get(full_path) if self.estimator else None
+        if duration is not None and duration < 1.5 * self.chunk_seconds:
+            return None, None
+        
+        if self.chunker is None:
+            from chunked_transcription import ChunkedTranscriber
+            admission = self._get_admission()
+            requested = self.chunk_workers or os.cpu_count() or 1
+            workers = self._limit_workers(requested, admission.estimate_job_mb(self.chunk_seconds))
+            self.chunker = ChunkedTranscriber(self.backend.spec(), workers, self.chunk_seconds, self.cancel_event,
+                                              self.guard_repetition)
+            self._status(f"Splitting long files across {self.chunker.workers} worker processes")
+        return self.chunker.transcribe, f"split across {self.chunker.workers} workers"
+    
+    def _get_channel_transcriber(self):
+        if self.channel_transcriber is None:
+            from multichannel import MultichannelTranscriber
+            admission = self._get_admission()
+            requested = self.chunk_workers or os.cpu_count() or 1
+            # Every worker holds one whole channel of the longest file
+            known = [d for d in self.estimator.durations.values() if d] if self.estimator else []
+            workers = self._limit_workers(requested, admission.estimate_job_mb(max(known, default=None)))
+            self.channel_transcriber = MultichannelTranscriber(self.backend, workers, self.cancel_event,
+                                                               self.guard_repetition, self._status)
+            self._status(f"Transcribing channels separately, up to {workers} at once")
+        return self.channel_transcriber
+    
+    def _get_admission(self) -> MemoryAdmissionController:
+        if self.admission is None:
+            # Workers of a backend without weights hold no model
+            model_mb = None if self.backend.capabilities().needs_weights else 0.0
+            self.admission = MemoryAdmissionController(self.model_name, self.memory_budget_mb, model_mb)
+            # This process already holds a model; only the rest of the budget is shared out
+            self.admission.reserve(current_rss_mb() or self.admission.model_mb)
+        return self.admission
+    
+    def _limit_workers(self, requested: int, per_job_mb: float) -> int:
+        """Cap a worker pool to what fits in the memory budget and reserve its models."""
+        admission = self._get_admission()
+        workers = admission.max_workers(requested, per_job_mb)
+        if workers < requested:
+            self._status(
+                f"Memory budget of {admission.budget_mb:.0f} MB allows {workers} of {requested} workers"
+            )
+        admission.reserve(workers * admission.model_mb)
+        self._reserved_worker_mb += workers * admission.model_mb
+        return workers
+    
+    def _close_workers(self):
+        if self.chunker is not None:
+            self.chunker.close()
+            self.chunker = None
+        if self.channel_transcriber is not None:
+            self.channel_transcriber.close()
+            self.channel_transcriber = None
+        if self._reserved_worker_mb:
+            self.admission.reserve(-self._reserved_worker_mb)
+            self._reserved_worker_mb = 0.0
+    
+    def _record_result(self, media_file: str, full_path: str, elapsed: float, results: Dict[str, Any],
+                       error: Optional[Exception] = None, memory_mb: Optional[float] = None,
+                       guard_stats: Optional[Dict[str, float]] = None, mode: Optional[str] = None) -> bool:
+        """
+        Update results, estimates and progress for a finished file. Returns True on success.
+        mode is the execution mode the file's speed is recorded under, if not the run's own.
+        """
+        if memory_mb is not None:
+            # Peak RSS growth while the file was transcribed
+            results.setdefault('job_memory_mb', {})[media_file] = memory_mb
+        if guard_stats is not None:
+            results['repetition_guard'] = merge_guard_stats(results.get('repetition_guard'), guard_stats)
+            if guard_stats['windows_guarded']:
+                self._status(f"Repetition guard in {media_file}: {format_guard_stats(guard_stats)}")
+        
+        if error is None:
+            results['completed_files'] += 1
+            self.estimator.file_finished(full_path, elapsed, mode=mode)
+        else:
+            results['failed_files'] += 1
+            self.estimator.file_finished(full_path, elapsed, success=False, mode=mode)
+            error_msg = f"Failed to transcribe {media_file}: {str(error)}"
+            results['errors'].append(error_msg)
+        
+        self.events.publish(FileFinished(
+            media_file, error is None, elapsed, self.estimator.durations.get(full_path),
+            error=None if error is None else str(error)
+        ))
+        self._publish_eta()
+        return error is None
+    
+    def _record_cancelled(self, media_file: str, elapsed: float, results: Dict[str, Any],
+                          error: Optional[Exception] = None):
+        """Remember how far a file got before it was cancelled."""
+        partial = {
+            'file': media_file,
+            'elapsed_seconds': elapsed,
+            'windows_decoded': getattr(error, 'windows_decoded', 0),
+            'audio_offset': getattr(error, 'audio_offset', 0.0)
+        }
+        results.setdefault('cancelled', []).append(partial)
+        self.events.publish(FileCancelled(media_file, elapsed, partial['windows_decoded'], partial['audio_offset']))
+    
+    def _record_profile(self, media_file: str, profile, results: Dict[str, Any]):
+        for problem in profile.errors:
+            self.events.publish(Error(f"Profile of {media_file} incomplete: {problem}", file=media_file))
+        if profile.summary_file is None:
+            return
+        results.setdefault('profiles', {})[media_file] = profile.summary_file
+        self.events.publish(ProfileWritten(media_file, profile.summary_file, profile.stages))
+    
+    def _transcribe_one(self, media_file: str, full_path: str, label: str, results: Dict[str, Any],
+                        may_store: Optional[Callable[[], bool]] = None) -> bool:
+        """
+        Transcribe a single file, updating results. Returns True on success.
+        may_store is checked before the transcript is written (see transcribe_audio()).
+        """
+        self.events.publish(FileStarted(media_file, label))
+        
+        file_start = time.monotonic()
+        error = None
+        cancelled = None
+        result = {}
+        profiler = None
+        if self.profile:
+            from profiling import FileProfiler
+            profiler = FileProfiler(self.backend, full_path)
+        transcribe_fn, mode = self._get_transcribe_fn(full_path)
+        with PeakRSSSampler(baseline_mb=self._loaded_rss_mb) as sampler, (profiler or nullcontext()):
+            try:
+                result = transcribe_with_retry(full_path, backend=self.backend, decode_options=self.decode_options,
+                                               transcribe_fn=transcribe_fn,
+                                               cancel_event=self.cancel_event, events=self.events,
+                                               guard_repetition=self.guard_repetition, may_store=may_store)
+            except TranscriptionCancelled as e:
+                cancelled = e
+            except Exception as e:
+                error = e
+        
+        if profiler is not None:
+            self._record_profile(media_file, profiler.profile, results)
+        if cancelled is not None:
+            self._record_cancelled(media_file, time.monotonic() - file_start, results, cancelled)
             return False
+        return self._record_result(media_file, full_path, time.monotonic() - file_start, results,
+                                   error=error, memory_mb=sampler.growth_mb,
+                                   guard_stats=result.get('repetition_guard'), mode=mode)
+    
+    def _transcribe_packed(self, files: List[str], full_paths: List[str], results: Dict[str, Any]) -> List[int]:
+        """
+        Transcribe the short clips among the files several to a decoding window.
+        Returns the indices of the files still to be transcribed one by one:
+        longer files, and clips whose text couldn't be told apart in the pack.
+        """
+        from clip_packing import is_packable, plan_packs, transcribe_pack, empty_packing_stats, format_packing_stats
+        
+        clips = [(path, self.estimator.durations.get(path)) for path in full_paths
+                 if is_packable(self.estimator.durations.get(path))]
+        if len(clips) < 2:
+            return list(range(len(files)))
+        names = dict(zip(full_paths, files))
+        packs = plan_packs(clips)
+        stats = empty_packing_stats()
+        stats['clips'], stats['packs'] = len(clips), len(packs)
+        self._status(f"Packing {len(clips)} short clips into {len(packs)} shared decoding windows")
+        
+        done = set()
+        for pack in packs:
+            if self.is_cancelled:
+                break
+            label = f"{names[pack[0]]} (+{len(pack) - 1} packed)"
+            for path in pack:
+                self.events.publish(FileStarted(names[path], f"clip packed with {len(pack) - 1} other(s)"))
+            on_window = lambda window, offset, result: self.events.publish(
+                WindowDecoded(label, window, offset, result.text)
+            )
+            
+            pack_start = time.monotonic()
+            try:
+                packed = transcribe_pack(self.backend, pack, self.cancel_event, on_window,
+                                         self.guard_repetition, **self.decode_options)
+            except TranscriptionCancelled as e:
+                for path in pack:
+                    self._record_cancelled(names[path], time.monotonic() - pack_start, results, e)
+                    done.add(path)
+                break
+            except Exception as e:
+                self._status(f"Packed transcription of {label} failed ({e}); transcribing those clips one by one")
+                continue
+            elapsed = time.monotonic() - pack_start
+            stats['windows'] += packed.windows
+            stats['audio_seconds'] += packed.audio_seconds
+            stats['seconds'] += elapsed
+            
+            guard_stats = packed.guard_stats
+            for path in pack:
+                if path in packed.redo:
+                    continue
+                error = packed.failed.get(path)
+                if error is None:
+                    try:
+                        output_file = get_output_file(path)
+                        store_transcription(packed.results[path], output_file)
+                        self.events.publish(TranscriptStored(names[path], output_file,
+                                                             len(packed.results[path]['segments'])))
+                    except Exception as e:
+                        error = e
+                # The pack's time is shared out by audio length, for the speed history
+                share = (self.estimator.durations.get(path) or 0.0) / max(packed.audio_seconds, 1e-9)
+                self._record_result(names[path], path, elapsed * share, results, error=error,
+                                    guard_stats=guard_stats, mode="packed clips")
+                guard_stats = None  # Counted once per pack
+                done.add(path)
+            if packed.redo:
+                self._status(f"Text ran across clips in {label}; transcribing {len(packed.redo)} clip(s) on their own")
+        
+        results['packing'] = stats
+        if stats['windows']:
+            self._status(f"Clip packing: {format_packing_stats(stats)}")
+        return [i for i, path in enumerate(full_paths) if path not in done]
+    
+    def _transcribe_concurrently(self, files: List[str], full_paths: List[str], results: Dict[str, Any]):
+        """
+        Run several files at once in worker processes, each holding its own model.
+        A file is only started when its estimated peak memory fits in the budget;
+        files that don't fit yet are deferred until running jobs finish. Files
+        are not split into chunks here; the workers already use all cores.
+        """
+        from worker_pool import create_pool, terminate_pool, transcribe_file_job
+        
+        admission = self._get_admission()
+        durations = [self.estimator.durations.get(path) for path in full_paths]
+        known = sorted(d for d in durations if d)
+        typical_mb = admission.estimate_job_mb(known[len(known) // 2] if known else None)
+        workers = self._limit_workers(min(self.concurrent_jobs, len(files)), typical_mb)
+        # Each file takes longer with others beside it; the ETA counts them all progressing at once
+        self.estimator.set_execution(self._concurrent_mode(workers), workers)
+        
+        self._status(f"Running up to {workers} files at once within a {admission.budget_mb:.0f} MB memory budget")
+        
+        pool = create_pool(self.backend.spec(), workers)
+        pending = deque(range(len(files)))
+        running = {}
+        deferred = set()
+        try:
+            while pending or running:
+                if self.is_cancelled:
+                    # Kill the workers rather than waiting for their files to finish
+                    terminate_pool(pool)
+                    for i, start in running.values():
+                        admission.release(full_paths[i])
+                        self._record_cancelled(files[i], time.monotonic() - start, results)
+                    break
+                
+                for i in list(pending):
+                    if len(running) >= workers:
+                        break
+                    estimate = admission.estimate_job_mb(durations[i])
+                    if admission.try_admit(full_paths[i], estimate):
+                        pending.remove(i)
+                        self.events.publish(FileStarted(files[i], f"file {i+1} of {len(files)}", estimate))
+                        future = pool.submit(transcribe_file_job, full_paths[i], self.decode_options,
+                                             self.guard_repetition)
+                        running[future] = (i, time.monotonic())
+                    elif i not in deferred:
+                        deferred.add(i)
+                        self._status(
+                                f"Deferring {files[i]}: needs ~{estimate:.0f} MB, "
+                                f"{max(0.0, admission.available_mb):.0f} MB free in budget"
+                            )
+                
+                if not running:
+                    continue
+                done, _ = wait(list(running), timeout=0.5, return_when=FIRST_COMPLETED)
+                for future in done:
+                    i, start = running.pop(future)
+                    error = None
+                    job = {}
+                    try:
+                        job = future.result()
+                    except Exception as e:
+                        error = e
+                    admission.release(full_paths[i], job.get('memory_mb'))
+                    self._record_result(files[i], full_paths[i], time.monotonic() - start, results,
+                                        error=error, memory_mb=job.get('memory_mb'),
+                                        guard_stats=job.get('repetition_guard'))
+        finally:
+            pool.shutdown(cancel_futures=True)
     
     def transcribe_files(self, files: List[str], search_dir: str) -> Dict[str, Any]:
         """
         Transcribe multiple files with progress tracking.
         Returns a dictionary with results and statistics.
         """
-        if not self.model:
-            raise ValueError("Model not loaded. Call load_model() first.")
-        
-        if not TRANSCRIBER_AVAILABLE:
-            raise ValueError("Audio transcriber not available. Please check audio_transcriber.py.")
+        self._check_ready()
         
         results = {
             'total_files': len(files),
@@ -153,34 +607,151 @@ class TranscriptionSession:
             'errors': []
         }
         
+        full_paths = [os.path.join(search_dir, f) for f in files]
+        self._start_estimates(full_paths)
         for i, media_file in enumerate(files):
-            if self.is_cancelled:
-                break
-                
-            if self.progress_callback:
-                self.progress_callback(f"Processing file {i+1} of {len(files)}: {media_file}")
-            
-            try:
-                full_path = os.path.join(search_dir, media_file)
-                transcribe_with_retry(full_path, model=self.model)
-                results['completed_files'] += 1
+            self.events.publish(JobQueued(media_file, i + 1, len(files), self.estimator.durations.get(full_paths[i])))
+        
+        if self.profile and (self.concurrent_jobs > 1 or self.split_long_files):
+            self._status("Profiling: files are transcribed one at a time in this process so every stage is captured")
+        elif self.profile and self.multichannel:
+            self._status("Profiling: channels are mixed to mono so every stage is captured in this process")
+        elif self.multichannel and (self.concurrent_jobs > 1 or self.pack_short_clips):
+            self._status("Multichannel: files are transcribed one at a time, their channels in parallel")
+        
+        try:
+            remaining = list(range(len(files)))
+            per_file = self.profile or self.multichannel
+            if self.pack_short_clips and not per_file:
+                remaining = self._transcribe_packed(files, full_paths, results)
+            if self.concurrent_jobs > 1 and len(remaining) > 1 and not (per_file or self.is_cancelled):
+                self._transcribe_concurrently([files[i] for i in remaining], [full_paths[i] for i in remaining],
+                                              results)
+            else:
+                self.estimator.set_execution(None)
+                for i in remaining:
+                    if self.is_cancelled:
+                        break
+                    self._transcribe_one(files[i], full_paths[i], f"file {i+1} of {len(files)}", results)
+        finally:
+            self._close_workers()
+            self.events.flush()
+        
+        # Remember how fast this machine was for future estimates
+        self.estimator.history.save()
+        
+        return results
+    
+    def transcribe_claimed(self, files: List[str], search_dir: str, claims: ClaimManager,
+                           poll_seconds: float = 5.0) -> Dict[str, Any]:
+        """
+        Transcribe files shared with other workers, possibly on other machines.
+        Each file is claimed through the ClaimManager before it is processed, so
+        every file is transcribed once across all workers. A file that fails is
+        handed back for another worker to try (see work_claims.py). Returns
+        when every file is done (by any worker) or failed here, or the session
+        is cancelled; the results only count files processed by this worker.
+        """
+        self._check_ready()
+        
+        results = {
+            'total_files': 0,
+            'completed_files': 0,
+            'failed_files': 0,
+            'errors': [],
+            'worker_id': claims.worker_id
+        }
+        
+        self._start_estimates([os.path.join(search_dir, f) for f in files])
+        # This worker takes one file at a time
+        self.estimator.set_execution(None)
+        
+        try:
+            while not self.is_cancelled:
+                pending = claims.pending(files)
+                if not pending:
+                    break
                 
-                if self.progress_callback:
-                    self.progress_callback(f"✓ Completed: {media_file}")
+                claimed_any = False
+                for position, media_file in enumerate(pending):
+                    if self.is_cancelled:
+                        break
+                    if not claims.try_claim(media_file):
+                        continue
                     
-            except Exception as e:
-                results['failed_files'] += 1
-                error_msg = f"Failed to transcribe {media_file}: {str(e)}"
-                results['errors'].append(error_msg)
+                    claimed_any = True
+                    results['total_files'] += 1
+                    # As of the start of this pass; rescanning the claims for every file is slow on NFS
+                    remaining = len(pending) - position
+                    self.events.publish(JobQueued(media_file, results['total_files'], remaining))
+                    success = self._transcribe_one(
+                        media_file, os.path.join(search_dir, media_file),
+                        f"claimed file ({remaining} left across workers)", results,
+                        may_store=lambda: claims.still_owns(media_file)
+                    )
+                    if self.is_cancelled:
+                        # Hand the file back so another worker can do it
+                        claims.release(media_file)
+                        break
+                    if not claims.still_owns(media_file):
+                        # Another worker has taken the file over; its transcript and .done marker win
+                        self._status(f"Lease on {media_file} was lost while it was being transcribed; "
+                                     f"leaving it to the worker that took it over")
+                        claims.release(media_file)
+                        continue
+                    if not claims.complete(media_file, success=success):
+                        attempts = len(claims.failures(media_file))
+                        self._status(f"Leaving {media_file} to the other workers after {attempts} of "
+                                     f"{claims.max_attempts} attempts failed")
                 
-                if self.progress_callback:
-                    self.progress_callback(f"✗ Failed: {media_file} - {str(e)}")
+                if not claimed_any:
+                    # Everything left is leased by other workers; wait for them to finish or expire
+                    self._status(f"Waiting for other workers ({len(pending)} file(s) in progress)...")
+                    time.sleep(poll_seconds)
+        finally:
+            claims.close()
+            self._close_workers()
+            self.estimator.history.save()
+            self.events.flush()
         
         return results
     
+    def transcribe_growing_file(self, full_path: str, poll_seconds: float = 5.0,
+                                idle_seconds: float = 60.0) -> Dict[str, Any]:
+        """
+        Follow a recording that is still being written, appending each newly
+        completed 30 s window to its transcript. Returns once the file has
+        stopped growing for idle_seconds or the session is cancelled.
+        """
+        self._check_ready()
+        from tail_transcriber import TailTranscriber
+        
+        self._status(f"Following {os.path.basename(full_path)} as it grows...")
+        tail = TailTranscriber(
+            self.backend, full_path, self.decode_options,
+            poll_seconds=poll_seconds, idle_seconds=idle_seconds,
+            progress_callback=self._status,
+            cancel_event=self.cancel_event,
+            guard_repetition=self.guard_repetition
+        )
+        try:
+            return tail.run()
+        finally:
+            self.events.flush()
+    
     def cancel(self):
-        """Cancel the transcription session."""
+        """
+        Cancel the transcription session. The file in progress stops within
+        about a second: decoding is interrupted, ffmpeg and any worker
+        processes are killed, and how far it got is recorded in the results.
+        """
         self.is_cancelled = True
+        self.cancel_event.set()
+    
+    def close(self):
+        """Shut down the session's workers and progress-event thread once it is no longer needed."""
+        self._close_workers()
+        self.events.close()
 
 
 def get_transcription_output_dir(search_dir: str) -> str:
@@ -195,4 +766,28 @@ def validate_model_choice(model: str) -> bool:
 
 def get_model_info() -> Dict[str, str]:
     """Get model information for display."""
-    return MODEL_DESCRIPTIONS.copy()
\ No newline at end of file
+    return MODEL_DESCRIPTIONS.copy()
+
+
+def validate_decoding_profile(profile: str) -> bool:
+    """Validate if the decoding profile is supported."""
+    return profile.lower() in DECODING_PROFILES
+
+
+def get_profile_info() -> Dict[str, str]:
+    """Get decoding profile information for display."""
+    return PROFILE_DESCRIPTIONS.copy()
+
+
+def get_decoding_options(profile: str = DEFAULT_DECODING_PROFILE,
+                         language: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Build the keyword arguments for model.transcribe() from a named profile.
+    Pinning a language skips Whisper's per-file language detection pass.
+    """
+    if not validate_decoding_profile(profile):
+        raise ValueError(f"Unknown decoding profile '{profile}'. Choose from {sorted(DECODING_PROFILES)}.")
+    options = dict(DECODING_PROFILES[profile.lower()])
+    if language:
+        options['language'] = language
+    return options
\ No newline at end of file
@@ -0,0 +1,443 @@
+"""
+Background transcription service that keeps models loaded between launches.
+
+Every launch of the app pays for importing PyTorch and loading the model
+before the first file starts. The background service is a resident process
+that does this once and then listens on a Unix domain socket in
+~/.audio_transcriber. When it is running, the CLI and GUI send their jobs to
+it instead of loading a model themselves, so a second launch starts
+transcribing almost at once. It is started on demand (--start-daemon, or the
+GUI's "keep the model loaded" option) or by hand with `app.py --daemon`, and
+exits after a configurable time without jobs (0 keeps it running until it is
+stopped with `app.py --stop-daemon`).
+
+The protocol is one JSON object per line. A client sends one request per
+connection:
+
+  {"op": "ping"}                        -> {"version", "pid", "models", "idle_seconds"}
+  {"op": "shutdown"}                    -> {"ok": true}
+  {"op": "load", "session": {...}}      -> events..., {"result": {"loaded": bool}}
+  {"op": "transcribe", "session": {...}, "files": [...], "search_dir": ..., "durations": {...}}
+                                        -> events..., {"result": <transcribe_files() results>}
+
+"session" holds the TranscriptionSession options. While a load or transcribe
+runs, the service streams the session's progress events as {"event": {...}};
+the client may send {"op": "cancel"}, and closing the connection cancels too.
+Jobs run one at a time, since a model can't run two transcriptions at once.
+"""
+
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from progress_events import StatusMessage, Error, event_from_dict
+from transcription_core import TranscriptionSession
+
+
+# Bumped whenever requests or replies change; a service speaking another version is replaced
+PROTOCOL_VERSION = 1
+
+DEFAULT_IDLE_MINUTES = 15
+
+# Loaded models kept at once; the least recently used one is dropped first
+MAX_RESIDENT_MODELS = 2
+
+# How long a client waits for a service it started to accept connections
+START_TIMEOUT_SECONDS = 30
+
+# How long a ping may take before the service is considered gone
+PING_TIMEOUT_SECONDS = 1.0
+
+# Session options that stay in the client process
+_LOCAL_OPTIONS = ('progress_callback', 'eta_callback', 'events')
+
+DAEMON_SUPPORTED = hasattr(socket, 'AF_UNIX')
+
+
+def get_state_dir() -> str:
+    state_dir = os.path.join(os.path.expanduser("~"), ".audio_transcriber")
+    os.makedirs(state_dir, exist_ok=True)
+    return state_dir
+
+
+def get_socket_path() -> str:
+    return os.path.join(get_state_dir(), "daemon.sock")
+
+
+def get_log_path() -> str:
+    return os.path.join(get_state_dir(), "daemon.log")
+
+
+class _Connection:
+    """One client connection: JSON lines in both directions, sends safe from any thread."""
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.reader = sock.makefile("r", encoding="utf-8")
+        self._lock = threading.Lock()
+        self.closed = False
+
+    def send(self, message: Dict[str, Any]):
+        data = (json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            if self.closed:
+                return
+            try:
+                self.sock.sendall(data)
+            except OSError:
+                self.closed = True  # The client went away; the reader notices too
+
+    def receive(self) -> Optional[Dict[str, Any]]:
+        line = self.reader.readline()
+        return json.loads(line) if line else None
+
+    def close(self):
+        with self._lock:
+            self.closed = True
+        try:
+            # Wakes a thread blocked in receive() before the reader is closed under it
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.reader.close()
+        self.sock.close()
+
+
+def _connect(socket_path: Optional[str] = None, timeout: Optional[float] = None) -> _Connection:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(socket_path or get_socket_path())
+    except OSError:
+        sock.close()
+        raise
+    return _Connection(sock)
+
+
+class TranscriptionDaemon:
+    """The resident service: accepts connections and runs their jobs with cached models."""
+
+    def __init__(self, idle_seconds: float = DEFAULT_IDLE_MINUTES * 60, socket_path: Optional[str] = None):
+        # 0 (or less): never exit for being idle
+        self.idle_seconds = idle_seconds
+        self.socket_path = socket_path or get_socket_path()
+        # (backend, model, engine, options) -> loaded backend
+        self.backends: "OrderedDict[str, Any]" = OrderedDict()
+        self.job_lock = threading.Lock()
+        self.stopping = threading.Event()
+        self._state_lock = threading.Lock()
+        self._active = 0
+        self._last_activity = time.monotonic()
+
+    def _log(self, message: str):
+        print(f"{time.strftime('%Y-%m-%d %H:%M:%S')} {message}", flush=True)
+
+    def serve(self):
+        """Listen until idle for idle_seconds (if positive) or told to shut down."""
+        if daemon_info(self.socket_path) is not None:
+            raise RuntimeError(f"A background service is already listening on {self.socket_path}")
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)  # Left behind by a service that was killed
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        previous_umask = os.umask(0o177)  # Only this user may connect
+        try:
+            server.bind(self.socket_path)
+        finally:
+            os.umask(previous_umask)
+        server.listen()
+        server.settimeout(1.0)
+        lifetime = (f"exits after {self.idle_seconds / 60:g} idle minutes" if self.idle_seconds > 0
+                    else "runs until stopped")
+        self._log(f"Listening on {self.socket_path} (pid {os.getpid()}, {lifetime})")
+        try:
+            while not self.stopping.is_set():
+                try:
+                    client, _ = server.accept()
+                except socket.timeout:
+                    if 0 < self.idle_seconds <= self._idle_for():
+                        self._log("Idle timeout reached")
+                        break
+                    continue
+                client.settimeout(None)
+                threading.Thread(target=self._handle, args=(_Connection(client),), daemon=True).start()
+        finally:
+            server.close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            self._log("Stopped")
+
+    def _idle_for(self) -> float:
+        with self._state_lock:
+            return 0.0 if self._active else time.monotonic() - self._last_activity
+
+    def _handle(self, connection: _Connection):
+        try:
+            request = connection.receive() or {}
+            op = request.get('op')
+            if op == 'ping':
+                connection.send({
+                    'version': PROTOCOL_VERSION,
+                    'pid': os.getpid(),
+                    'models': list(self.backends),
+                    'idle_seconds': self.idle_seconds,
+                })
+            elif op == 'shutdown':
+                self.stopping.set()
+                connection.send({'ok': True})
+            elif op in ('load', 'transcribe'):
+                self._run_job(connection, request)
+            else:
+                connection.send({'error': f"Unknown request: {op!r}"})
+        except Exception as e:
+            connection.send({'error': str(e)})
+        finally:
+            connection.close()
+
+    def _run_job(self, connection: _Connection, request: Dict[str, Any]):
+        session = TranscriptionSession(**request['session'])
+        session.events.subscribe(lambda event: connection.send({'event': event.to_dict()}))
+        # Cancel when the client asks to, or when it goes away (Ctrl+C, window closed)
+        threading.Thread(target=self._watch_client, args=(connection, session), daemon=True).start()
+
+        with self._state_lock:
+            self._active += 1
+        try:
+            if not self.job_lock.acquire(blocking=False):
+                session.events.publish(StatusMessage("Waiting for another job in the background service..."))
+                self.job_lock.acquire()
+            try:
+                reply = {'result': self._run_session(session, request)}
+            except Exception as e:
+                reply = {'error': str(e)}
+            finally:
+                self.job_lock.release()
+            # Every event goes out before the reply
+            session.events.flush()
+            connection.send(reply)
+        finally:
+            session.close()
+            with self._state_lock:
+                self._active -= 1
+                self._last_activity = time.monotonic()
+
+    def _run_session(self, session: TranscriptionSession, request: Dict[str, Any]) -> Dict[str, Any]:
+        loaded = self._prepare(session, announce=request['op'] == 'load')
+        if request['op'] == 'load':
+            return {'loaded': loaded}
+        if not loaded:
+            raise RuntimeError("Model not loaded")
+        files, search_dir = request['files'], request['search_dir']
+        durations = request.get('durations')
+        if durations:
+            # Already probed by the client
+            session.plan(list(durations), durations)
+        self._log(f"Transcribing {len(files)} file(s) in {search_dir}")
+        return session.transcribe_files(files, search_dir)
+
+    def _watch_client(self, connection: _Connection, session: TranscriptionSession):
+        try:
+            while True:
+                message = connection.receive()
+                if message is None or message.get('op') == 'cancel':
+                    break
+        except (OSError, ValueError):
+            pass
+        session.cancel()
+
+    def _prepare(self, session: TranscriptionSession, announce: bool = True) -> bool:
+        """Give the session a loaded backend, reusing a resident one when it matches."""
+        key = json.dumps([session.backend_name, session.model_name, session.engine, session.backend_options],
+                         sort_keys=True)
+        backend = self.backends.get(key)
+        if backend is not None:
+            self.backends.move_to_end(key)
+            session.attach_backend(backend)
+            if announce:
+                session.events.publish(StatusMessage(
+                    f"Using the '{session.model_name}' model already loaded in the background service"
+                ))
+            return True
+
+        if not session.load_model():
+            return False
+        self._log(f"Loaded {key}")
+        self.backends[key] = session.backend
+        while len(self.backends) > MAX_RESIDENT_MODELS:
+            dropped, _ = self.backends.popitem(last=False)
+            self._log(f"Dropped {dropped}")
+        return True
+
+
+def daemon_info(socket_path: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Ping the background service; returns its details, or None if none is listening."""
+    if not DAEMON_SUPPORTED:
+        return None
+    try:
+        connection = _connect(socket_path, timeout=PING_TIMEOUT_SECONDS)
+    except OSError:
+        return None
+    try:
+        connection.send({'op': 'ping'})
+        return connection.receive()
+    except (OSError, ValueError):
+        return None
+    finally:
+        connection.close()
+
+
+def stop_daemon(socket_path: Optional[str] = None) -> bool:
+    """Ask a running background service to exit. Returns False if none was running."""
+    try:
+        connection = _connect(socket_path, timeout=PING_TIMEOUT_SECONDS)
+    except OSError:
+        return False
+    try:
+        connection.send({'op': 'shutdown'})
+        connection.receive()
+    except (OSError, ValueError):
+        pass
+    finally:
+        connection.close()
+    # It stops accepting within a second; wait so a new service can take the socket
+    deadline = time.monotonic() + 5
+    while os.path.exists(socket_path or get_socket_path()) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return True
+
+
+def _daemon_command(idle_minutes: float) -> List[str]:
+    options = ["--daemon", "--daemon-idle-minutes", f"{idle_minutes:g}"]
+    if getattr(sys, 'frozen', False):  # Running in a PyInstaller bundle
+        return [sys.executable] + options
+    return [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")] + options
+
+
+def start_daemon(idle_minutes: float = DEFAULT_IDLE_MINUTES, socket_path: Optional[str] = None) -> Optional[Dict]:
+    """Start the background service and wait until it answers. Returns its details, or None."""
+    if not DAEMON_SUPPORTED:
+        return None
+    with open(get_log_path(), "a") as log:
+        # A session of its own, so closing the terminal or the app doesn't take it down
+        subprocess.Popen(_daemon_command(idle_minutes), stdin=subprocess.DEVNULL, stdout=log,
+                         stderr=subprocess.STDOUT, start_new_session=True, close_fds=True)
+    deadline = time.monotonic() + START_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        info = daemon_info(socket_path)
+        if info is not None:
+            return info
+        time.sleep(0.05)
+    return None
+
+
+class RemoteSession(TranscriptionSession):
+    """
+    A TranscriptionSession whose model loading and transcription happen in
+    the background service. Planning, progress events and cancelling work as
+    in a local session; the service's events are published on this session's
+    bus. Claimed (distributed) and tail mode are not forwarded.
+    """
+
+    def __init__(self, model_name: str = 'base', daemon: Optional[Dict[str, Any]] = None,
+                 socket_path: Optional[str] = None, **options):
+        super().__init__(model_name, **options)
+        self.session_options = dict(model_name=model_name, **{
+            name: value for name, value in options.items() if name not in _LOCAL_OPTIONS
+        })
+        self.daemon = daemon or {}
+        self.socket_path = socket_path
+        self._connection = None
+        self._connection_lock = threading.Lock()
+
+    def _request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Send a request, publish the events streamed back, and return the result."""
+        connection = _connect(self.socket_path)
+        with self._connection_lock:
+            self._connection = connection
+        try:
+            connection.send(dict(request, session=self.session_options))
+            if self.is_cancelled:
+                connection.send({'op': 'cancel'})
+            while True:
+                message = connection.receive()
+                if message is None:
+                    raise RuntimeError("The background service stopped unexpectedly")
+                if 'event' in message:
+                    self.events.publish(event_from_dict(message['event']))
+                elif 'error' in message:
+                    raise RuntimeError(message['error'])
+                else:
+                    return message['result']
+        finally:
+            with self._connection_lock:
+                self._connection = None
+            connection.close()
+
+    def load_model(self) -> bool:
+        """Have the service load the model, unless it is already resident there."""
+        try:
+            self._status(f"Using the background service (pid {self.daemon.get('pid', '?')})")
+            return self._request({'op': 'load'})['loaded']
+        except Exception as e:
+            self.events.publish(Error(f"Could not load model: {str(e)}"))
+            return False
+        finally:
+            self.events.flush()
+
+    def transcribe_files(self, files: List[str], search_dir: str) -> Dict[str, Any]:
+        """Transcribe the files in the service; see TranscriptionSession.transcribe_files()."""
+        search_dir = os.path.abspath(search_dir)
+        full_paths = [os.path.join(search_dir, f) for f in files]
+        if self.estimator is None or not set(full_paths) <= set(self.estimator.durations):
+            self.plan(full_paths)
+        try:
+            return self._request({
+                'op': 'transcribe',
+                'files': files,
+                'search_dir': search_dir,
+                'durations': {path: self.estimator.durations.get(path) for path in full_paths},
+            })
+        finally:
+            self.events.flush()
+
+    def cancel(self):
+        super().cancel()
+        with self._connection_lock:
+            if self._connection is not None:
+                self._connection.send({'op': 'cancel'})
+
+
+def open_session(model_name: str = 'base', use_daemon: bool = True, start_daemon_if_needed: bool = False,
+                 idle_minutes: float = DEFAULT_IDLE_MINUTES, **options) -> TranscriptionSession:
+    """
+    Create a session for model_name: a RemoteSession if the background service
+    is running (or could be started, with start_daemon_if_needed), otherwise
+    an ordinary in-process TranscriptionSession. Options are those of
+    TranscriptionSession.
+    """
+    if use_daemon and DAEMON_SUPPORTED:
+        info = daemon_info()
+        if info is not None and info.get('version') != PROTOCOL_VERSION:
+            # Left running by another version of the app; replace it only if asked to start one
+            if start_daemon_if_needed:
+                stop_daemon()
+            info = None
+        if info is None and start_daemon_if_needed:
+            info = start_daemon(idle_minutes)
+        if info is not None:
+            return RemoteSession(model_name, daemon=info, **options)
+    return TranscriptionSession(model_name, **options)
+
+
+def run_daemon(idle_minutes: float = DEFAULT_IDLE_MINUTES):
+    """Entry point for `app.py --daemon`: serve in the foreground until idle (never, for 0)."""
+    if not DAEMON_SUPPORTED:
+        print("The background service needs Unix domain sockets, which this system doesn't have.")
+        return
+    TranscriptionDaemon(idle_minutes * 60).serve()
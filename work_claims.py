@@ -0,0 +1,270 @@
+"""
+Shared-filesystem work claiming so several machines can process one folder.
+
+Workers claim a file by atomically creating a lease file in a `.claims`
+directory under the search directory. Leases are kept alive by a heartbeat
+that refreshes their modification time; a lease that has not been refreshed
+for `lease_seconds` belongs to a dead worker and may be taken over. A `.done`
+marker is written once a file has been processed so it is never claimed again.
+
+A file that fails is handed back rather than marked done, since the cause may
+be local to the worker (out of memory, a codec missing on that host). The
+failure is counted in a `.failures` file next to the lease, and only after
+`max_attempts` failures across workers is the file marked done as failed.
+A worker never retries a file it has failed itself.
+
+Lease ages are measured against the file server's clock, read from a probe
+file each worker touches in the claims directory, so clock differences
+between the machines don't make healthy leases look expired (or dead ones
+alive).
+
+Only operations that are atomic on local filesystems and NFSv3+ are relied on:
+exclusive create (O_CREAT | O_EXCL), rename and hard links.
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, List, Optional
+
+
+CLAIMS_DIR_NAME = ".claims"
+
+# A lease not refreshed for this long is considered abandoned
+DEFAULT_LEASE_SECONDS = 120
+
+# Workers that must fail a file before it is given up on
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+def default_worker_id() -> str:
+    """Unique id for this worker: host, process and a random suffix."""
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+class ClaimManager:
+    """Claims files in a shared directory using lease files with heartbeats."""
+
+    def __init__(self, search_dir: str, worker_id: Optional[str] = None,
+                 lease_seconds: float = DEFAULT_LEASE_SECONDS,
+                 heartbeat_seconds: Optional[float] = None, max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.search_dir = search_dir
+        self.claims_dir = os.path.join(search_dir, CLAIMS_DIR_NAME)
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = lease_seconds
+        self.heartbeat_seconds = heartbeat_seconds or lease_seconds / 4.0
+        self.max_attempts = max(1, max_attempts)
+        self.held = set()
+        self.lost = set()
+        # Files this worker failed; left to the other workers
+        self.failed_here = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._heartbeat_thread = None
+        os.makedirs(self.claims_dir, exist_ok=True)
+
+    def _lease_path(self, media_file: str) -> str:
+        return os.path.join(self.claims_dir, f"{media_file}.lease")
+
+    def _done_path(self, media_file: str) -> str:
+        return os.path.join(self.claims_dir, f"{media_file}.done")
+
+    def _failures_path(self, media_file: str) -> str:
+        return os.path.join(self.claims_dir, f"{media_file}.failures")
+
+    def _write_json(self, path: str, data: Dict):
+        tmp_path = f"{path}.{self.worker_id}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def failures(self, media_file: str) -> List[Dict]:
+        """Failed attempts at a file so far, by any worker."""
+        try:
+            with open(self._failures_path(media_file), "r") as f:
+                return json.load(f).get('attempts', [])
+        except (OSError, ValueError):
+            return []
+
+    def is_done(self, media_file: str) -> bool:
+        return os.path.exists(self._done_path(media_file))
+
+    def pending(self, files: Iterable[str]) -> List[str]:
+        """Files that no worker has finished yet, except those this worker has failed."""
+        return [f for f in files if f not in self.failed_here and not self.is_done(f)]
+
+    def _server_time(self) -> float:
+        """The file server's current time: the mtime it gives a file we touch now."""
+        probe = os.path.join(self.claims_dir, f".clock-{self.worker_id}")
+        try:
+            with open(probe, "a"):
+                pass
+            os.utime(probe)  # No explicit time, so the server sets its own
+            return os.stat(probe).st_mtime
+        except OSError:
+            return time.time()
+
+    def _lease_age(self, path: str) -> Optional[float]:
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return None
+        return self._server_time() - mtime
+
+    def _read_owner(self, path: str) -> Optional[str]:
+        try:
+            with open(path, "r") as f:
+                return json.load(f).get('worker')
+        except (OSError, ValueError):
+            return None
+
+    def _create_lease(self, path: str) -> bool:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w") as f:
+            json.dump({
+                'worker': self.worker_id,
+                'host': socket.gethostname(),
+                'pid': os.getpid(),
+                'claimed_at': time.time()
+            }, f)
+        return True
+
+    def _break_expired_lease(self, path: str) -> bool:
+        """Remove an abandoned lease. Returns True if it is gone afterwards."""
+        age = self._lease_age(path)
+        if age is None:
+            return True
+        if age < self.lease_seconds:
+            return False
+
+        # Renaming is atomic, so only one of several competing workers wins
+        tombstone = f"{path}.expired-{self.worker_id}"
+        try:
+            os.rename(path, tombstone)
+        except FileNotFoundError:
+            return False
+
+        age = self._lease_age(tombstone)
+        if age is not None and age < self.lease_seconds:
+            # The owner heartbeated between our check and the rename; give it back
+            try:
+                os.link(tombstone, path)
+            except OSError:
+                pass
+            os.unlink(tombstone)
+            return False
+
+        os.unlink(tombstone)
+        return True
+
+    def try_claim(self, media_file: str) -> bool:
+        """Try to claim a file. Returns True if this worker now owns it."""
+        if media_file in self.failed_here or self.is_done(media_file):
+            return False
+
+        path = self._lease_path(media_file)
+        if not self._create_lease(path):
+            if not self._break_expired_lease(path) or not self._create_lease(path):
+                return False
+
+        # Another worker may have finished it just before our lease appeared
+        if self.is_done(media_file):
+            os.unlink(path)
+            return False
+
+        with self._lock:
+            self.held.add(media_file)
+            self.lost.discard(media_file)
+        self._ensure_heartbeat()
+        return True
+
+    def owns(self, media_file: str) -> bool:
+        """Check that our lease on the file has not been taken over."""
+        return self._read_owner(self._lease_path(media_file)) == self.worker_id
+
+    def still_owns(self, media_file: str) -> bool:
+        """Check that the lease has been kept alive throughout and is still ours."""
+        with self._lock:
+            if media_file in self.lost:
+                return False
+        return self.owns(media_file)
+
+    def complete(self, media_file: str, success: bool = True, details: Optional[Dict] = None) -> bool:
+        """
+        Drop the lease on a claimed file and mark it processed. A failure is
+        only counted, and the file left for another worker, until it has
+        failed max_attempts times. Returns True if the file is now done.
+        """
+        attempts = []
+        if not success:
+            # Only the lease holder writes the failures file, so this can't race
+            attempts = self.failures(media_file) + [{'worker': self.worker_id, 'failed_at': time.time(),
+                                                     **(details or {})}]
+            self._write_json(self._failures_path(media_file), {'attempts': attempts})
+            if len(attempts) < self.max_attempts:
+                self.failed_here.add(media_file)
+                self.release(media_file)
+                return False
+
+        self._write_json(self._done_path(media_file), {
+            'worker': self.worker_id,
+            'success': success,
+            'finished_at': time.time(),
+            **(details or {}),
+            **({'attempts': attempts} if attempts else {})
+        })
+        self.release(media_file)
+        return True
+
+    def release(self, media_file: str):
+        """Give up a lease without marking the file done."""
+        with self._lock:
+            self.held.discard(media_file)
+        path = self._lease_path(media_file)
+        if self.owns(media_file):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def _ensure_heartbeat(self):
+        if self._heartbeat_thread and self._heartbeat_thread.is_alive():
+            return
+        self._stop.clear()
+        self._heartbeat_thread = threading.Thread(target=self._heartbeat_loop, daemon=True)
+        self._heartbeat_thread.start()
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(self.heartbeat_seconds):
+            with self._lock:
+                held = list(self.held)
+            for media_file in held:
+                if self.owns(media_file):
+                    try:
+                        os.utime(self._lease_path(media_file))
+                        continue
+                    except OSError:
+                        pass
+                with self._lock:
+                    self.held.discard(media_file)
+                    self.lost.add(media_file)
+
+    def close(self):
+        """Stop heartbeating and release any leases still held."""
+        self._stop.set()
+        if self._heartbeat_thread:
+            self._heartbeat_thread.join(timeout=self.heartbeat_seconds + 1)
+        with self._lock:
+            held = list(self.held)
+        for media_file in held:
+            self.release(media_file)
+        try:
+            os.unlink(os.path.join(self.claims_dir, f".clock-{self.worker_id}"))
+        except OSError:
+            pass
@@ -0,0 +1,78 @@
+"""
+Worker processes that each hold their own copy of the model.
+
+Whisper installs its key/value cache hooks on the model's modules for every
+decode, so one model can't safely run two transcriptions at once; concurrent
+work therefore goes to separate processes instead of threads.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict
+
+from inference_backends import BackendSpec, create_backend
+from memory_budget import PeakRSSSampler, current_rss_mb
+
+
+# Worker process state: each worker loads its own model once
+_worker_backend = None
+# RSS with the model loaded and no job run yet; job memory is measured from here
+_worker_baseline_mb = None
+
+
+def _init_worker(backend_spec: BackendSpec, threads: int):
+    global _worker_backend, _worker_baseline_mb
+    name, model_name, options = backend_spec
+    _worker_backend = create_backend(name, model_name, **options)
+    _worker_backend.set_threads(threads)
+    _worker_backend.load()
+    _worker_baseline_mb = current_rss_mb()
+
+
+def create_pool(backend_spec: BackendSpec, workers: int) -> ProcessPoolExecutor:
+    """
+    Start a pool of model-holding workers sharing the CPU cores evenly. Each
+    worker builds its own backend from backend_spec (see InferenceBackend.spec()).
+    """
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(backend_spec, threads)
+    )
+
+
+def terminate_pool(executor: ProcessPoolExecutor):
+    """
+    Stop a pool immediately, killing workers mid-transcription so their CPU and
+    memory are released at once (shutdown() alone waits for running jobs).
+    """
+    # ProcessPoolExecutor has no public way to kill running workers
+    processes = list((getattr(executor, '_processes', None) or {}).values())
+    for process in processes:
+        process.terminate()
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.join(timeout=1)
+
+
+def transcribe_chunk(audio, decode_options: Dict[str, Any], guard_repetition: bool = False) -> Dict[str, Any]:
+    """Transcribe an array of samples in a worker."""
+    from segment_array import compact_result
+    result = _worker_backend.transcribe(audio, guard_repetition=guard_repetition, **decode_options)
+    # Sent back as one binary blob instead of pickling a dict (and token list) per segment
+    return compact_result(result)
+
+
+def transcribe_file_job(file_path: str, decode_options: Dict[str, Any],
+                        guard_repetition: bool = False) -> Dict[str, Any]:
+    """
+    Transcribe and store one file in a worker. Returns the job's peak RSS above
+    the worker's RSS with just the model loaded ('memory_mb'), and the
+    repetition guard counts.
+    """
+    from audio_transcriber import transcribe_with_retry
+    with PeakRSSSampler(baseline_mb=_worker_baseline_mb) as sampler:
+        result = transcribe_with_retry(file_path, backend=_worker_backend, decode_options=decode_options,
+                                       guard_repetition=guard_repetition)
+    return {'memory_mb': sampler.growth_mb, 'repetition_guard': result.get('repetition_guard')}